@@ -1,7 +1,12 @@
+import sys
 
 import interface
 
 def main():
+	# Scripts given as arguments run without the console.
+	if len(sys.argv)>1:
+		import api
+		sys.exit(api.main(sys.argv[1:]))
 	interface.Interface().run()
 if __name__=="__main__":
 	main()
\ No newline at end of file
@@ -0,0 +1,256 @@
+"""
+Headless API: open a process and search it from code, with results returned
+instead of printed.
+
+Scripts of console-like commands run through run_script, which writes one
+JSON line per command. When a search is followed by another one, memory for
+the next search is read while the current one compares.
+"""
+import contextlib
+import json
+import sys
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Iterable, NamedTuple, TextIO
+
+import numpy as np
+
+import commands
+import scanner
+import system
+import watch
+from scanner import Scanner
+
+class SearchResult(NamedTuple):
+	""" Outcome of a start or a search. """
+	count:int
+	matches:tuple[Scanner.Match,...]
+	seconds:float
+	candidate_bytes:int
+
+class Session:
+	"""
+	A process being searched. Methods raise instead of printing: LookupError
+	for a process that isn't found, OSError when it can't be opened and
+	RuntimeError when searching before start.
+	"""
+	def __init__(self,workers:int=0,region_filter:system.RegionFilter|None=None)->None:
+		self.scanner=Scanner(workers)
+		self.region_filter=region_filter or system.RegionFilter()
+		# A third bank lets the next read go on while a search still compares
+		# the previous read against the start snapshot.
+		self.arena=system.Arena(3)
+		self.handle:system.ProcessHandle=None
+		self.procinfo:system.ProcessInfo|None=None
+		self.region_map:system.RegionMap|None=None
+		self.dirty_pages:system.DirtyPages|None=None
+		self.watches=watch.WatchList(lambda addresses,size:system.process_read_addresses(self.handle,addresses,size,"watch"))
+
+	def __enter__(self)->'Session':
+		return self
+
+	def __exit__(self,*_)->None:
+		self.close()
+
+	def close(self)->None:
+		self.watches.stop()
+		self.watches.clear()
+		if self.handle:
+			system.process_close(self.handle)
+		self.handle=None
+		self.procinfo=None
+		self.region_map=None
+		self.dirty_pages=None
+		self.scanner=Scanner(self.scanner.workers)
+
+	def matches(self)->tuple[Scanner.Match,...]:
+		return self.scanner.get_matches()
+
+	def open(self,target:int|str)->system.ProcessInfo:
+		""" Open a process by PID, or by name if a single process has it. """
+		self.close()
+		procs=system.get_process_list()
+		if isinstance(target,int):
+			pids=[target] if target in procs else []
+		else:
+			pids=system.pids_by_name(target,procs)
+		if len(pids)!=1:
+			raise LookupError(f"Process {target} not found." if not pids else f"Several processes are {target}: {pids}.")
+		handle=system.process_open(pids[0])
+		if not handle:
+			raise OSError(f"Can't open process {pids[0]}.")
+		self.handle=handle
+		self.procinfo=procs[pids[0]]
+		self.region_map=system.RegionMap(handle,self.region_filter)
+		self.dirty_pages=system.DirtyPages(handle)
+		return self.procinfo
+
+	def read(self,address:int,stype:str|type[Scanner.Type]=Scanner.Int32)->Scanner.SupportedType|None:
+		""" Read a value, None if its address can't be read. """
+		t=commands.parse_type(stype)
+		assert not isinstance(t,tuple),"Read needs a single type."
+		mem=system.process_read_addresses(self.handle,np.array([address],np.uint64),t.size,"value")
+		values,found=Scanner.gather(mem,np.array(sorted(mem),np.uint64),np.array([address],np.uint64),t)
+		return values[0].item() if found[0] else None
+
+	def read_memory(self,sparse:bool=True,changed_only:bool=False)->tuple[scanner.Memory,dict[int,np.ndarray]|None]:
+		"""
+		Read memory for a search, only pages with candidates if few are left.
+		Also return pages changed since the previous read, if the system
+		knows, and with changed_only only read candidates in those.
+		"""
+		assert self.region_map and self.dirty_pages,"No process open."
+		changed=self.dirty_pages.changes(self.region_map.blocks())
+		size=self.scanner.get_value_size() if self.scanner.is_started() else 0
+		if changed is not None and changed_only and self.scanner.is_searched():
+			return system.process_read_addresses(self.handle,self.scanner.get_candidate_addresses(changed),size),changed
+		if sparse and self.scanner.can_read_sparse():
+			return system.process_read_addresses(self.handle,self.scanner.get_candidate_addresses(),size),changed
+		return system.process_scan_memory(self.handle,self.arena,self.region_map),changed
+
+	def read_search_memory(self,criterion:str,*values:Scanner.SupportedType)->tuple[scanner.Memory,dict[int,np.ndarray]|None]:
+		""" Read memory for a search like refine does, to give it to refine. """
+		function,value=self._criterion(criterion,values)
+		return self.read_memory(changed_only=Scanner.unchanged_page_result(function,value) is not None)
+
+	def refine(self,criterion:str,*values:Scanner.SupportedType,mem:scanner.Memory|None=None,
+		changed:dict[int,np.ndarray]|None=None)->SearchResult:
+		"""
+		Search with a console criterion name, like "eq" or "gt", and its values.
+		Memory is read unless given, along with the pages changed since the
+		previous read.
+		"""
+		function,value=self._criterion(criterion,values)
+		if mem is None:
+			mem,changed=self.read_search_memory(criterion,*values)
+		self.scanner.dirty=changed
+		searched=self.scanner.search(mem,value,function)
+		return SearchResult(searched.count,self.scanner.get_matches(),searched.seconds,searched.candidate_bytes)
+
+	def start(self,stype:str|type[Scanner.Type]|tuple[type[Scanner.Type],...],unknown:bool=False,unaligned:bool=False)->SearchResult:
+		""" Start a search with a console type name or scanner types. """
+		types=commands.parse_type(stype)
+		mem,_=self.read_memory(sparse=False)
+		started=self.scanner.start(mem,types,unknown,unaligned)
+		return SearchResult(self.scanner.get_values_count(),(),started.seconds,0)
+
+	def undo(self)->bool:
+		return self.scanner.undo()
+
+	def watch(self,address:int,stype:str|type[Scanner.Type]=Scanner.Int32)->watch.Watch:
+		""" Watch an address in the background, polling starts with the first watch. """
+		t=commands.parse_type(stype)
+		assert not isinstance(t,tuple),"Watch needs a single type."
+		w=self.watches.add(address,t)
+		self.watches.start()
+		return w
+
+	def write(self,address:int,value:Scanner.SupportedType,stype:str|type[Scanner.Type]=Scanner.Int32)->bool:
+		""" Write a value. Raise OverflowError if it doesn't fit the type. """
+		t=commands.parse_type(stype)
+		assert not isinstance(t,tuple),"Write needs a single type."
+		data=np.array(value).astype(t.numpy_type)
+		if not np.issubdtype(data.dtype,np.floating) and data!=value:
+			raise OverflowError(f"{value} doesn't fit in {t.name}.")
+		return system.memory_write(self.handle,address,data.tobytes())
+
+	def _criterion(self,criterion:str,values:tuple)->tuple[scanner.Criterion,Any]:
+		""" Get the criterion of a search and the value it compares with. """
+		if not self.scanner.is_started():
+			raise RuntimeError("Search not started.")
+		return commands.criterion(criterion,values)
+
+def run_script(lines:Iterable[str],out:TextIO,session:Session|None=None)->bool:
+	"""
+	Run console-like commands, one per line, and write a JSON line for each.
+	Lines starting with # are skipped. Stop at the first failing command and
+	return whether all of them ran.
+	"""
+	session=session or Session()
+	script=[commands.parse(line) for line in lines if line.strip() and not line.lstrip().startswith("#")]
+	script=[["eq",*tokens] if isinstance(tokens[0],(int,float)) else [commands.ALIASES.get(str(tokens[0]).lower(),str(tokens[0]).lower()),*tokens[1:]] for tokens in script]
+	pool=ThreadPoolExecutor(1)
+	pending:Future|None=None
+	try:
+		for i,tokens in enumerate(script):
+			name=str(tokens[0])
+			try:
+				if name in commands.CRITERIA:
+					# Reads aren't made on two threads at once, they share the
+					# arena and clear the soft-dirty bits of each other.
+					mem,changed=pending.result() if pending else session.read_search_memory(name,*tokens[1:])
+					pending=None
+					# Read for the next search while this one compares, it only
+					# needs whole regions if there are too many candidates now.
+					if i+1<len(script) and script[i+1][0] in commands.CRITERIA and not session.scanner.can_read_sparse():
+						pending=pool.submit(session.read_memory,False)
+					result:Any=session.refine(name,*tokens[1:],mem=mem,changed=changed)
+				else:
+					result=_run_command(session,name,tokens[1:])
+			except (AssertionError,LookupError,OSError,OverflowError,RuntimeError,TypeError,ValueError) as e:
+				out.write(json.dumps({"command":" ".join(map(str,tokens)),"error":str(e) or type(e).__name__})+"\n")
+				return False
+			out.write(json.dumps({"command":" ".join(map(str,tokens)),"result":_json(result)})+"\n")
+			out.flush()
+		return True
+	finally:
+		if pending:
+			pending.cancel()
+		pool.shutdown()
+		session.close()
+
+def _run_command(session:Session,name:str,arguments:list)->Any:
+	match name:
+		case "open":
+			return session.open(arguments[0])
+		case "close":
+			session.close()
+			return None
+		case "start"|"unknown":
+			unaligned=len(arguments)>1 and str(arguments[1]).lower()=="unaligned"
+			return session.start(str(arguments[0]),name=="unknown",unaligned)
+		case "undo":
+			return session.undo()
+		case "matches":
+			return session.matches()
+		case "read":
+			return session.read(arguments[0],*arguments[1:2])
+		case "poke"|"write":
+			return session.write(arguments[0],arguments[1],*arguments[2:3])
+		case "watch":
+			return session.watch(arguments[0],*arguments[1:2]).address
+		case "watches":
+			return {w.address:w.history() for w in session.watches.watches()}
+		case "sleep":
+			time.sleep(arguments[0])
+			return None
+	raise ValueError(f"Unknown command: {name}.")
+
+def _json(value:Any)->Any:
+	""" Make results JSON serializable. """
+	if isinstance(value,Scanner.Match):
+		return {"address":value.address,"value":value.value.item(),"type":value.type.name}
+	if isinstance(value,SearchResult):
+		return {k:_json(v) for k,v in value._asdict().items()}
+	if isinstance(value,system.ProcessInfo):
+		return {"pid":value.pid,"name":value.name}
+	if isinstance(value,np.ndarray):
+		return value.tolist()
+	if isinstance(value,np.generic):
+		return value.item()
+	if isinstance(value,(list,tuple)):
+		return [_json(v) for v in value]
+	if isinstance(value,dict):
+		return {str(k):_json(v) for k,v in value.items()}
+	return value
+
+def main(paths:list[str])->int:
+	""" Run scripts, - for standard input. Return an exit status. """
+	for path in paths:
+		with (contextlib.nullcontext(sys.stdin) if path=="-" else open(path)) as f:
+			if not run_script(f,sys.stdout):
+				return 1
+	return 0
+
+if __name__=="__main__":
+	sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,259 @@
+"""
+Benchmark of Scanner on synthetic memory, or on a stand-in process holding it.
+"""
+import argparse
+import json
+import subprocess
+import sys
+import time
+from typing import Any
+
+import numpy as np
+
+import pretty
+import scanner
+
+# Value that synthetic memory holds at the match density.
+TARGET=1000
+
+# Stand-in process: holds synthetic regions and mutates them when asked.
+STAND_IN="""
+import sys
+import numpy as np
+import benchmark
+regions,region_size,density,mutation,fraction=int(sys.argv[1]),int(sys.argv[2]),float(sys.argv[3]),sys.argv[4],float(sys.argv[5])
+mem=[np.frombuffer(bytearray(v),np.int32) for v in benchmark.synthetic_memory(regions,region_size,density=density).values()]
+print("ready",flush=True)
+for seed,line in enumerate(sys.stdin,1):
+	for i,(k,v) in enumerate(benchmark.mutate({i:m.tobytes() for i,m in enumerate(mem)},seed,mutation,fraction).items()):
+		mem[i][:]=np.frombuffer(v,np.int32)
+	print("done",flush=True)
+"""
+
+def synthetic_memory(regions:int,region_size:int,seed:int=0,density:float=0.0)->scanner.Memory:
+	"""
+	Make regions of random int32 values in [0,100), where a fraction density
+	of them is TARGET instead.
+	"""
+	rng=np.random.default_rng(seed)
+	mem={}
+	for i in range(regions):
+		values=rng.integers(0,100,region_size//4,np.int32)
+		if density:
+			values[rng.random(len(values))<density]=TARGET
+		mem[(i+1)<<32]=values.tobytes()
+	return mem
+
+def synthetic_stream(regions:int,region_size:int,chunk_size:int,seed:int=0)->scanner.MemoryStream:
+	""" Yield chunks of random int32 values in [0,100), generated as if read. """
+	rng=np.random.default_rng(seed)
+	for i in range(regions):
+		for offset in range(0,region_size,chunk_size):
+			yield ((i+1)<<32)+offset,rng.integers(0,100,chunk_size//4,np.int32).tobytes()
+
+def mutate(mem:scanner.Memory,seed:int=1,pattern:str="drift",fraction:float=1.0)->scanner.Memory:
+	"""
+	Return a copy where values changed following pattern:
+	drift moves each value by -1, 0 or +1, sparse increments a fraction of
+	them, none copies.
+	"""
+	rng=np.random.default_rng(seed)
+	result={}
+	for k,v in mem.items():
+		values=np.frombuffer(v,np.int32)
+		match pattern:
+			case "drift":
+				values=values+rng.integers(-1,2,len(values),np.int32)
+			case "sparse":
+				values=values+(rng.random(len(values))<fraction).astype(np.int32)
+		result[k]=values.tobytes()
+	return result
+
+def time_first_search(mem:scanner.Memory,new_mem:scanner.Memory,workers:int,repeat:int)->float:
+	""" Return best time of a first increased-value search. """
+	best=float("inf")
+	for _ in range(repeat):
+		s=scanner.Scanner(workers)
+		s.start(mem,scanner.Scanner.Int32)
+		time_now=time.perf_counter()
+		s.continue_search_greater(new_mem)
+		best=min(best,time.perf_counter()-time_now)
+	return best
+
+def peak_rss()->int:
+	""" Return peak resident set size in bytes. """
+	try:
+		with open("/proc/self/status") as f:
+			for line in f:
+				if line.startswith("VmHWM:"):
+					return int(line.split()[1])*1024
+	except OSError:
+		pass
+	import resource
+	return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss*1024
+
+def reset_peak_rss()->None:
+	""" Make peak_rss start from current usage, where Linux allows it. """
+	try:
+		with open("/proc/self/clear_refs","w") as f:
+			f.write("5")
+	except OSError:
+		pass
+
+def time_stream_search(regions:int,region_size:int,chunk_size:int,stream:bool)->tuple[float,int]:
+	"""
+	Return latency and peak RSS of a full refinement reading chunks either all
+	at once or as a stream.
+	"""
+	s=scanner.Scanner()
+	s.start(synthetic_stream(regions,region_size,chunk_size),scanner.Scanner.Int32)
+	s.continue_search_equal(synthetic_stream(regions,region_size,chunk_size),50)
+	reset_peak_rss()
+	time_now=time.perf_counter()
+	source=synthetic_stream(regions,region_size,chunk_size,1)
+	s.continue_search_greater(source if stream else dict(source))
+	return time.perf_counter()-time_now,peak_rss()
+
+class SyntheticSource:
+	""" Memory read from dictionaries made in this process. """
+	def __init__(self,args:argparse.Namespace)->None:
+		self.args=args
+		self.mem=synthetic_memory(args.regions,args.region_size,density=args.density)
+		self.seed=0
+	def close(self)->None:
+		pass
+	def mutate(self)->None:
+		self.seed+=1
+		self.mem=mutate(self.mem,self.seed,self.args.mutation,self.args.fraction)
+	def read(self)->scanner.Memory:
+		# Copies, like reading another process would.
+		return {k:bytes(v) for k,v in self.mem.items()}
+
+class ProcessSource:
+	""" Memory read from a stand-in process, through the system facade. """
+	def __init__(self,args:argparse.Namespace)->None:
+		import system
+		self.system=system
+		self.process=subprocess.Popen([sys.executable,"-c",STAND_IN,str(args.regions),str(args.region_size),
+			str(args.density),args.mutation,str(args.fraction)],stdin=subprocess.PIPE,stdout=subprocess.PIPE,text=True,
+			cwd=sys.path[0] or None)
+		assert self.process.stdout and self.process.stdout.readline().strip()=="ready"
+		self.handle=system.process_open(self.process.pid)
+		# Only regions as big as the synthetic ones, not the interpreter's.
+		self.region_map=system.RegionMap(self.handle,system.RegionFilter(min_size=args.region_size))
+		self.arena=system.Arena()
+	def close(self)->None:
+		self.system.process_close(self.handle)
+		self.process.kill()
+		self.process.wait()
+	def mutate(self)->None:
+		assert self.process.stdin and self.process.stdout
+		self.process.stdin.write("mutate\n")
+		self.process.stdin.flush()
+		self.process.stdout.readline()
+	def read(self)->scanner.Memory:
+		return self.system.process_scan_memory(self.handle,self.arena,self.region_map)
+
+def time_phases(args:argparse.Namespace,workers:int)->dict[str,Any]:
+	"""
+	Time each phase of a search: read memory, convert it into the start
+	snapshot, compare for the target value, then read again after a mutation
+	and intersect with the unchanged values.
+	"""
+	source=ProcessSource(args) if args.source=="process" else SyntheticSource(args)
+	s=scanner.Scanner(workers)
+	times:dict[str,float]={}
+	result:dict[str,Any]={}
+	def timed(phase:str,function,*arguments):
+		time_now=time.perf_counter()
+		value=function(*arguments)
+		times[phase]=times.get(phase,0.0)+time.perf_counter()-time_now
+		return value
+	try:
+		reset_peak_rss()
+		mem=timed("read",source.read)
+		total=sum(len(v) for v in mem.values())
+		timed("convert",s.start,mem,scanner.Scanner.Int32)
+		mem=timed("read",source.read)
+		timed("compare",s.continue_search_equal,mem,TARGET)
+		result["candidates"]=s.get_matches_count()
+		result["candidate_bytes"]=s.get_candidates_nbytes()
+		del mem
+		source.mutate()
+		mem=timed("read",source.read)
+		timed("intersect",s.continue_search_unchanged,mem)
+		result["candidates_after"]=s.get_matches_count()
+		result["candidate_bytes_after"]=s.get_candidates_nbytes()
+		del mem
+	finally:
+		source.close()
+	result["bytes"]=total
+	result["seconds"]=times
+	result["gb_per_second"]={k:total*(3 if k=="read" else 1)/t/(1<<30) for k,t in times.items()}
+	result["peak_rss"]=peak_rss()
+	return result
+
+def compare_results(previous:dict[str,Any],current:dict[str,Any],tolerance:float)->list[str]:
+	""" Return phases that got slower than previous by more than tolerance. """
+	slower=[]
+	for phase,t in current["phases"]["seconds"].items():
+		before=previous.get("phases",{}).get("seconds",{}).get(phase)
+		if before and t>before*(1+tolerance):
+			slower.append(f"{phase}: {before:.4f} s -> {t:.4f} s")
+	return slower
+
+def main():
+	parser=argparse.ArgumentParser(description=__doc__)
+	parser.add_argument("--regions",type=int,default=16)
+	parser.add_argument("--region-size",type=int,default=16<<20)
+	parser.add_argument("--repeat",type=int,default=3)
+	parser.add_argument("--workers",type=int,nargs="+",default=[1,2,4,8,16])
+	parser.add_argument("--chunk-size",type=int,default=4<<20)
+	parser.add_argument("--source",choices=("synthetic","process"),default="synthetic",
+		help="memory made in this process, or read from a stand-in process")
+	parser.add_argument("--density",type=float,default=0.001,help="fraction of values that match")
+	parser.add_argument("--mutation",choices=("drift","sparse","none"),default="sparse")
+	parser.add_argument("--fraction",type=float,default=0.01,help="fraction of values a sparse mutation changes")
+	parser.add_argument("--json",help="write results to this file")
+	parser.add_argument("--baseline",help="compare phase times with results of an earlier run")
+	parser.add_argument("--tolerance",type=float,default=0.1,help="slowdown reported as a regression")
+	args=parser.parse_args()
+	results:dict[str,Any]={"config":vars(args)}
+	mem=synthetic_memory(args.regions,args.region_size)
+	new_mem=mutate(mem)
+	total=args.regions*args.region_size
+	print(f"First search over {pretty.pretty_size(total)}:")
+	baseline=0.0
+	results["workers"]={}
+	for workers in args.workers:
+		t=time_first_search(mem,new_mem,workers,args.repeat)
+		baseline=baseline or t
+		results["workers"][workers]=t
+		print(f"{workers:>3} workers: {t:.4f} s, {total/t/(1<<30):.2f} GB/s, x{baseline/t:.2f}")
+	del mem,new_mem
+	print(f"Refinement over {pretty.pretty_size(total)} read in {pretty.pretty_size(args.chunk_size)} chunks:")
+	results["stream"]={}
+	for stream in (False,True):
+		t,rss=time_stream_search(args.regions,args.region_size,args.chunk_size,stream)
+		results["stream"][["batch","stream"][stream]]={"seconds":t,"peak_rss":rss}
+		print(f"{['batch','stream'][stream]:>7}: {t:.4f} s, peak RSS {pretty.pretty_size(rss)}")
+	print(f"Phases over {pretty.pretty_size(total)} of {args.source} memory, density {args.density}, {args.mutation} mutation:")
+	phases=time_phases(args,max(args.workers))
+	results["phases"]=phases
+	for phase,t in phases["seconds"].items():
+		print(f"{phase:>9}: {t:.4f} s, {phases['gb_per_second'][phase]:.2f} GB/s")
+	print(f"{phases['candidates']} candidates in {pretty.pretty_size(phases['candidate_bytes'])}, "
+		f"{phases['candidates_after']} in {pretty.pretty_size(phases['candidate_bytes_after'])} after intersect, "
+		f"peak RSS {pretty.pretty_size(phases['peak_rss'])}")
+	if args.json:
+		with open(args.json,"w") as f:
+			json.dump(results,f,indent="\t")
+	if args.baseline:
+		with open(args.baseline) as f:
+			slower=compare_results(json.load(f),results,args.tolerance)
+		print("Slower than baseline:" if slower else "No regression against baseline.")
+		for line in slower:
+			print(f"\t{line}")
+
+if __name__=="__main__":
+	main()
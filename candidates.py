@@ -0,0 +1,140 @@
+"""
+Compact storage for search candidates.
+"""
+from typing import Iterator, TypeAlias
+
+import numpy as np
+
+NumpyArray:TypeAlias=np.ndarray
+
+def index_type(length:int)->type:
+	""" Smallest unsigned type that can index length elements. """
+	return np.uint32 if length<=0xFFFFFFFF else np.uint64
+
+class RegionCandidates:
+	"""
+	Surviving element indices of one region and their last seen values.
+	Indices are kept as a sorted array, or as a packed bitmap when the region
+	is dense enough for one bit per element to take less room.
+	"""
+	def __init__(self,length:int,count:int,values:NumpyArray,indices:NumpyArray|None=None,bitmap:NumpyArray|None=None)->None:
+		assert (indices is None)!=(bitmap is None)
+		self.length=length
+		self.count=count
+		self.values=values
+		self._indices=indices
+		self._bitmap=bitmap
+
+	@staticmethod
+	def is_dense(length:int,count:int)->bool:
+		return length//8<count*np.dtype(index_type(length)).itemsize
+
+	@classmethod
+	def from_storage(cls,length:int,values:NumpyArray,storage:NumpyArray,dense:bool)->'RegionCandidates':
+		""" Make candidates back from what storage() returned. """
+		if dense:
+			return cls(length,len(values),values,bitmap=storage)
+		return cls(length,len(values),values,indices=storage.view(index_type(length)))
+
+	@classmethod
+	def from_indices(cls,length:int,indices:NumpyArray,values:NumpyArray)->'RegionCandidates':
+		""" Make candidates from sorted indices and the values found there. """
+		count=len(indices)
+		if cls.is_dense(length,count):
+			mask=np.zeros(length,np.bool_)
+			mask[indices]=True
+			return cls(length,count,values,bitmap=np.packbits(mask))
+		return cls(length,count,values,indices=indices.astype(index_type(length),copy=False))
+
+	@classmethod
+	def from_mask(cls,mask:NumpyArray,data:NumpyArray)->'RegionCandidates':
+		""" Make candidates from a mask over a whole region and its data. """
+		length=len(mask)
+		count=int(np.count_nonzero(mask))
+		values=data[mask]
+		if cls.is_dense(length,count):
+			return cls(length,count,values,bitmap=np.packbits(mask))
+		return cls(length,count,values,indices=np.flatnonzero(mask).astype(index_type(length)))
+
+	@classmethod
+	def merge(cls,parts:list['RegionCandidates'])->'RegionCandidates':
+		"""
+		Join candidates of consecutive chunks of a region. All chunks but the
+		last must have a length that is a multiple of 8.
+		"""
+		if len(parts)==1:
+			return parts[0]
+		length=sum(p.length for p in parts)
+		count=sum(p.count for p in parts)
+		values=np.concatenate([p.values for p in parts])
+		if cls.is_dense(length,count):
+			bitmap=np.concatenate([p._bitmap if p._bitmap is not None else p._packed() for p in parts])
+			return cls(length,count,values,bitmap=bitmap)
+		offsets=np.cumsum([0]+[p.length for p in parts[:-1]])
+		indices=np.concatenate([p.indices().astype(index_type(length))+o for p,o in zip(parts,offsets)])
+		return cls(length,count,values,indices=indices.astype(index_type(length),copy=False))
+
+	def indices(self)->NumpyArray:
+		if self._indices is not None:
+			return self._indices
+		assert self._bitmap is not None
+		return np.flatnonzero(np.unpackbits(self._bitmap,count=self.length)).astype(index_type(self.length))
+
+	def nbytes(self)->int:
+		index_bytes=self._indices.nbytes if self._indices is not None else self._bitmap.nbytes # type: ignore
+		return index_bytes+self.values.nbytes
+
+	def refine(self,keep:NumpyArray,new_values:NumpyArray)->'RegionCandidates':
+		"""
+		Keep candidates where the keep mask is set and remember their new
+		values. Both arrays are aligned with indices().
+		"""
+		return RegionCandidates.from_indices(self.length,self.indices()[keep],new_values[keep])
+
+	def storage(self)->tuple[NumpyArray,bool]:
+		""" Return indices or bitmap as bytes, and whether it is the bitmap. """
+		if self._bitmap is not None:
+			return self._bitmap,True
+		assert self._indices is not None
+		return self._indices.view(np.uint8),False
+
+	def _packed(self)->NumpyArray:
+		mask=np.zeros(self.length,np.bool_)
+		mask[self.indices()]=True
+		return np.packbits(mask)
+
+class Candidates:
+	""" Candidates of all regions, keyed by base address. """
+	def __init__(self)->None:
+		self.regions:dict[int,RegionCandidates]={}
+
+	def __contains__(self,base:int)->bool:
+		return base in self.regions
+
+	def __getitem__(self,base:int)->RegionCandidates:
+		return self.regions[base]
+
+	def __iter__(self)->Iterator[int]:
+		return iter(self.regions)
+
+	def __len__(self)->int:
+		return len(self.regions)
+
+	def add(self,base:int,region:RegionCandidates)->None:
+		""" Store region candidates, dropping regions without any. """
+		if region.count>0:
+			self.regions[base]=region
+
+	def count(self)->int:
+		return sum(r.count for r in self.regions.values())
+
+	def items(self):
+		return self.regions.items()
+
+	def nbytes(self)->int:
+		return sum(r.nbytes() for r in self.regions.values())
+
+def bytes_per_candidate(lanes:list[Candidates])->float:
+	""" Memory candidates of all lanes use, per candidate. """
+	count=sum(c.count() for c in lanes)
+	return sum(c.nbytes() for c in lanes)/count if count else 0.0
@@ -0,0 +1,83 @@
+"""
+Names the console and scripts share: search types, search criteria and
+their aliases, and how a command line is split into tokens.
+"""
+from typing import Any, TypeAlias
+
+import scanner
+from scanner import Scanner
+
+TokenList:TypeAlias=list[float|int|str]
+
+# Scanner types by name, 'all' searches every type at once.
+SCANNER_TYPES:dict[str,type[Scanner.Type]|tuple[type[Scanner.Type],...]]={
+	"all":Scanner.ALL_TYPES,
+	"double":Scanner.Float64,
+	"float":Scanner.Float32,
+	"float32":Scanner.Float32,
+	"float64":Scanner.Float64,
+	"int":Scanner.Int32,
+	"int8":Scanner.Int8,
+	"int16":Scanner.Int16,
+	"int32":Scanner.Int32,
+	"int64":Scanner.Int64,
+	"uint8":Scanner.UInt8,
+	"uint16":Scanner.UInt16,
+	"uint32":Scanner.UInt32,
+	"uint64":Scanner.UInt64,
+	}
+
+# Criterion and number of values of each search, by command name.
+CRITERIA:dict[str,tuple[scanner.Criterion,int]]={
+	"approx":(Scanner.cmp_approx,2),
+	"changed":(Scanner.cmp_changed,0),
+	"decby":(Scanner.cmp_decreased_by,1),
+	"eq":(Scanner.cmp_eq,1),
+	"gt":(Scanner.cmp_gt,0),
+	"incby":(Scanner.cmp_increased_by,1),
+	"lt":(Scanner.cmp_lt,0),
+	"range":(Scanner.cmp_range,2),
+	"unchanged":(Scanner.cmp_unchanged,0),
+	}
+
+ALIASES={"=":"eq","~":"approx","in":"range","+":"gt","-":"lt","+=":"incby","-=":"decby","!=":"changed","==":"unchanged",
+	"s":"start","u":"unknown","p":"poke","w":"watch"}
+
+# Epsilon of approx searches that don't give one.
+DEFAULT_EPSILON=1e-3
+
+def criterion(name:str,values:tuple|list)->tuple[scanner.Criterion,Any]:
+	"""
+	Get the criterion of a search by name or alias, and the value it compares
+	with. Raise KeyError if unknown, ValueError if given the wrong values.
+	"""
+	function,arguments=CRITERIA[ALIASES.get(name,name)]
+	if function is Scanner.cmp_approx and len(values)==1:
+		values=(values[0],DEFAULT_EPSILON)
+	if len(values)!=arguments:
+		raise ValueError(f"{name} takes {arguments} values.")
+	return function,tuple(values) if arguments==2 else values[0] if values else 0
+
+def number_type(string:str)->type[float]|type[int]|type[str]:
+	""" Return number type or str if not a number. """
+	try:
+		_=int(string)
+		return int
+	except ValueError:
+		try:
+			_=float(string)
+			return float
+		except ValueError:
+			return str
+
+def parse(input_string:str)->TokenList:
+	""" Split input into numbers and strings, strings keep their case. """
+	return [number_type(x)(x) for x in input_string.split()]
+
+def parse_type(name:str|type[Scanner.Type]|tuple[type[Scanner.Type],...])->type[Scanner.Type]|tuple[type[Scanner.Type],...]:
+	""" Get a scanner type from a type name. Raise ValueError if unknown. """
+	if not isinstance(name,str):
+		return name
+	if name.lower() not in SCANNER_TYPES:
+		raise ValueError(f"Invalid type: {name}.")
+	return SCANNER_TYPES[name.lower()]
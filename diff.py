@@ -0,0 +1,94 @@
+"""
+Differences between two snapshots of process memory, to see what an action
+in the target wrote.
+
+Regions with the same base address are compared in chunks, 8 bytes at a
+time, and bytes are only looked at in words that changed. Changed bytes are
+coalesced into runs, kept as (offset,length) rows, and runs at most gap
+bytes apart are joined. Regions found in one snapshot only are reported
+whole. Regions are compared on threads and results come region by region,
+so they can be written out as they come.
+"""
+import json
+import os
+from collections.abc import Mapping
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Iterator, NamedTuple, TypeAlias
+
+import numpy as np
+
+NumpyArray:TypeAlias=np.ndarray
+
+Snapshot:TypeAlias=Mapping[int,Any] # key=base address, value=raw data bytes, like scanner.Memory or snapshot.Snapshot.
+
+# Bytes compared at a time, a multiple of 8. Bounds the memory that changed
+# bytes of a chunk take before they become runs.
+CHUNK_SIZE=4<<20
+
+class RegionDiff(NamedTuple):
+	""" Changes of a region: changed bytes and runs of them as (offset,length) rows. """
+	base:int
+	size:int
+	status:str # changed, added or removed.
+	changed:int
+	ranges:NumpyArray
+	def to_json(self)->str:
+		return json.dumps({"base":self.base,"size":self.size,"status":self.status,"changed":self.changed,"ranges":self.ranges.tolist()})
+
+def changed_ranges(before:Any,after:Any,gap:int=0)->tuple[int,NumpyArray]:
+	"""
+	Return how many bytes differ between before and after, and runs of
+	changed bytes joined when at most gap bytes apart. Bytes past the end
+	of the shorter one count as changed.
+	"""
+	a=np.frombuffer(before,np.uint8)
+	b=np.frombuffer(after,np.uint8)
+	common=min(len(a),len(b))
+	changed=0
+	runs:list[tuple[NumpyArray,NumpyArray]]=[]
+	for lo in range(0,common,CHUNK_SIZE):
+		hi=min(common,lo+CHUNK_SIZE)
+		end=lo+(hi-lo)//8*8
+		x,y=a[lo:end].reshape(-1,8),b[lo:end].reshape(-1,8)
+		words=np.flatnonzero(x.view(np.uint64).ravel()!=y.view(np.uint64).ravel())
+		if len(words)*16>len(x):
+			# Many changes, find where runs start and end in a mask of all bytes.
+			mask=a[lo:hi]!=b[lo:hi]
+			edges=np.diff(mask.view(np.int8),prepend=np.int8(0),append=np.int8(0))
+			changed+=int(np.count_nonzero(mask))
+			runs.append(_coalesce(lo+np.flatnonzero(edges==1),lo+np.flatnonzero(edges==-1),gap))
+			continue
+		rows,columns=np.nonzero(x[words]!=y[words])
+		offsets=np.concatenate((lo+words[rows]*8+columns,end+np.flatnonzero(a[end:hi]!=b[end:hi])))
+		if len(offsets):
+			changed+=len(offsets)
+			runs.append(_coalesce(offsets,offsets+1,gap))
+	if len(a)!=len(b):
+		changed+=abs(len(a)-len(b))
+		runs.append((np.array([common]),np.array([max(len(a),len(b))])))
+	if not runs:
+		return 0,np.empty((0,2),np.uint64)
+	starts,ends=_coalesce(np.concatenate([s for s,_ in runs]),np.concatenate([e for _,e in runs]),gap)
+	return changed,np.column_stack((starts,ends-starts)).astype(np.uint64)
+
+def compare(before:Snapshot,after:Snapshot,gap:int=0,workers:int=0)->Iterator[RegionDiff]:
+	""" Yield differences of regions that changed, sorted by base address. """
+	def region(base:int)->RegionDiff:
+		if base not in after:
+			size=len(np.frombuffer(before[base],np.uint8))
+			return RegionDiff(base,size,"removed",size,np.array([[0,size]],np.uint64))
+		data=after[base]
+		size=len(np.frombuffer(data,np.uint8))
+		if base not in before:
+			return RegionDiff(base,size,"added",size,np.array([[0,size]],np.uint64))
+		changed,ranges=changed_ranges(before[base],data,gap)
+		return RegionDiff(base,size,"changed",changed,ranges)
+	with ThreadPoolExecutor(workers or os.cpu_count() or 1) as pool:
+		for result in pool.map(region,sorted(set(before)|set(after))):
+			if result.changed:
+				yield result
+
+def _coalesce(starts:NumpyArray,ends:NumpyArray,gap:int)->tuple[NumpyArray,NumpyArray]:
+	""" Join sorted runs at most gap bytes apart. """
+	apart=starts[1:]-ends[:-1]>gap
+	return starts[np.r_[True,apart]],ends[np.r_[apart,True]]
@@ -0,0 +1,163 @@
+"""
+Search several processes at once, such as instances of the same executable.
+
+Each target gets its own worker process holding an api.Session, so searches
+run in parallel and candidates stay in the worker. Calls go to every worker
+at once and return a result per PID, or the exception the worker raised.
+Candidates can be intersected across targets, by address or by offset from
+a module, to find values laid out the same way in all of them.
+"""
+import multiprocessing
+import os
+from multiprocessing.connection import Connection
+from typing import Any, Callable
+
+import numpy as np
+
+import api
+import system
+
+# Workers are spawned, forking would copy the locks of threads running in
+# the parent, like watches and the scanner's pool, in whatever state they are.
+_CONTEXT=multiprocessing.get_context("spawn")
+
+# Errors a worker sends back instead of failing.
+ERRORS=(AssertionError,LookupError,OSError,OverflowError,RuntimeError,TypeError,ValueError)
+
+def _offsets(session:api.Session)->dict[str,np.ndarray]:
+	""" Candidate addresses inside modules, as sorted offsets by module name. """
+	addresses=session.scanner.get_candidate_addresses()
+	result:dict[str,np.ndarray]={}
+	for m in system.process_modules(session.handle):
+		a,b=np.searchsorted(addresses,[m.base,m.end])
+		if b>a and m.name not in result:
+			result[m.name]=addresses[a:b]-np.uint64(m.base)
+	return result
+
+# Calls a worker runs on its session.
+_CALLS:dict[str,Callable[...,Any]]={
+	"addresses":lambda s:s.scanner.get_candidate_addresses(),
+	"offsets":_offsets,
+	"refine":lambda s,criterion,values:s.refine(criterion,*values),
+	"start":lambda s,stype,unknown,unaligned:s.start(stype,unknown,unaligned),
+	"undo":lambda s:s.undo(),
+	}
+
+def _serve(pid:int,workers:int,conn:Connection)->None:
+	""" Worker: open pid, then run calls received until None. """
+	session=api.Session(workers)
+	try:
+		try:
+			conn.send(session.open(pid))
+		except ERRORS as e:
+			conn.send(e)
+			return
+		while (call:=conn.recv()) is not None:
+			name,args=call
+			try:
+				conn.send(_CALLS[name](session,*args))
+			except ERRORS as e:
+				conn.send(e)
+	finally:
+		session.close()
+
+class FanOut:
+	"""
+	Worker processes searching targets given by PID. Targets that couldn't be
+	opened are left out and their errors kept in failed.
+	"""
+	def __init__(self,pids:list[int],workers:int=0)->None:
+		"""
+		Threads each worker compares with default to the CPUs shared between
+		targets.
+		"""
+		workers=workers or max(1,(os.cpu_count() or 1)//max(1,len(pids)))
+		self.failed:dict[int,BaseException]={}
+		self.targets:dict[int,system.ProcessInfo]={}
+		self._workers:dict[int,tuple[multiprocessing.process.BaseProcess,Connection]]={}
+		for pid in pids:
+			conn,child=_CONTEXT.Pipe()
+			process=_CONTEXT.Process(target=_serve,args=(pid,workers,child),daemon=True)
+			process.start()
+			child.close()
+			self._workers[pid]=(process,conn)
+		for pid,info in self._receive().items():
+			if isinstance(info,BaseException):
+				self.failed[pid]=info
+				self._stop(pid)
+			else:
+				self.targets[pid]=info
+
+	def __enter__(self)->'FanOut':
+		return self
+
+	def __exit__(self,*_)->None:
+		self.close()
+
+	def __len__(self)->int:
+		return len(self._workers)
+
+	def addresses(self)->dict[int,np.ndarray]:
+		""" Sorted candidate addresses of each target. """
+		return self._call("addresses")
+
+	def close(self)->None:
+		for pid in list(self._workers):
+			self._stop(pid)
+
+	def common_addresses(self)->np.ndarray:
+		""" Candidate addresses found in every target that answered. """
+		found=[a for a in self.addresses().values() if isinstance(a,np.ndarray)]
+		if not found:
+			return np.empty(0,np.uint64)
+		common=found[0]
+		for a in found[1:]:
+			common=np.intersect1d(common,a,assume_unique=True)
+		return common
+
+	def common_offsets(self)->dict[str,np.ndarray]:
+		""" Candidate offsets from modules, for those found in every target that answered. """
+		found=[o for o in self._call("offsets").values() if isinstance(o,dict)]
+		if not found:
+			return {}
+		common=found[0]
+		for offsets in found[1:]:
+			common={k:np.intersect1d(v,offsets[k],assume_unique=True) for k,v in common.items() if k in offsets}
+		return {k:v for k,v in common.items() if len(v)}
+
+	def refine(self,criterion:str,*values:Any)->dict[int,api.SearchResult|BaseException]:
+		""" Search every target, like api.Session.refine. """
+		return self._call("refine",criterion,values)
+
+	def start(self,stype:str,unknown:bool=False,unaligned:bool=False)->dict[int,api.SearchResult|BaseException]:
+		""" Start a search in every target, like api.Session.start. """
+		return self._call("start",stype,unknown,unaligned)
+
+	def undo(self)->dict[int,bool|BaseException]:
+		return self._call("undo")
+
+	def _call(self,name:str,*args:Any)->dict[int,Any]:
+		for _,conn in self._workers.values():
+			conn.send((name,args))
+		return self._receive()
+
+	def _receive(self)->dict[int,Any]:
+		""" Get an answer from each worker, or the error of one that died. """
+		result={}
+		for pid,(_,conn) in self._workers.items():
+			try:
+				result[pid]=conn.recv()
+			except EOFError:
+				result[pid]=RuntimeError(f"Worker of {pid} stopped.")
+		return result
+
+	def _stop(self,pid:int)->None:
+		process,conn=self._workers.pop(pid)
+		try:
+			conn.send(None)
+		except OSError:
+			pass
+		process.join(5)
+		if process.is_alive():
+			process.kill()
+		conn.close()
@@ -0,0 +1,103 @@
+"""
+Frozen values, written again at a fixed rate so the target can't change them.
+
+Each poll reads all entries at once, like the watch list does, and only
+writes the ones that differ. Entries that follow each other in memory are
+written with a single call.
+"""
+import threading
+from typing import Callable, NamedTuple, TypeAlias
+
+import numpy as np
+
+from scanner import Scanner
+from watch import Poller, Reader
+
+NumpyArray:TypeAlias=np.ndarray
+
+# Writes data at an address, returns success.
+Writer:TypeAlias=Callable[[int,bytes],bool]
+
+class Entry(NamedTuple):
+	address:int
+	type:type[Scanner.Type]
+	data:bytes
+	@property
+	def value(self)->Scanner.SupportedType:
+		return np.frombuffer(self.data,self.type.numpy_type)[0]
+
+class FreezeList(Poller):
+	""" Entries written back rate times per second once started. """
+	def __init__(self,read:Reader,write:Writer,rate:float=30.0)->None:
+		super().__init__(rate)
+		self.read=read
+		self.write=write
+		self.writes=0
+		self.skipped=0
+		self.failures=0
+		self._entries:dict[int,Entry]={}
+		self._lock=threading.Lock()
+
+	def __contains__(self,address:int)->bool:
+		return address in self._entries
+
+	def __len__(self)->int:
+		return len(self._entries)
+
+	def add(self,address:int,stype:type[Scanner.Type],value:Scanner.SupportedType)->Entry:
+		""" Freeze value at address. Raise OverflowError if it doesn't fit the type. """
+		data=np.array(value).astype(stype.numpy_type)
+		# Floats may round, integers must keep their value.
+		if not np.issubdtype(data.dtype,np.floating) and data!=value:
+			raise OverflowError(f"{value} doesn't fit in {stype.name}.")
+		entry=Entry(address,stype,data.tobytes())
+		with self._lock:
+			self._entries[address]=entry
+		return entry
+
+	def clear(self)->None:
+		with self._lock:
+			self._entries.clear()
+
+	def entries(self)->list[Entry]:
+		with self._lock:
+			return sorted(self._entries.values())
+
+	def poll(self)->int:
+		""" Write entries that don't hold their value. Return write calls made. """
+		entries=self.entries()
+		if not entries:
+			return 0
+		mem=self.read(np.array([e.address for e in entries],np.uint64),max(e.type.size for e in entries))
+		starts=np.array(sorted(mem),np.uint64)
+		stale=[]
+		for stype in {e.type for e in entries}:
+			group=[e for e in entries if e.type is stype]
+			values,found=Scanner.gather(mem,starts,np.array([e.address for e in group],np.uint64),stype)
+			# Compare bits, a frozen NaN matches itself.
+			current=values.tobytes()
+			size=stype.size
+			stale+=[e for i,(e,ok) in enumerate(zip(group,found)) if not ok or current[i*size:(i+1)*size]!=e.data]
+		self.skipped+=len(entries)-len(stale)
+		calls=0
+		for address,data in FreezeList.group(sorted(stale)):
+			calls+=1
+			if not self.write(address,data):
+				self.failures+=1
+		self.writes+=calls
+		return calls
+
+	def remove(self,address:int)->bool:
+		with self._lock:
+			return self._entries.pop(address,None) is not None
+
+	@staticmethod
+	def group(entries:list[Entry])->list[tuple[int,bytes]]:
+		""" Join sorted entries that follow each other into (address,data) writes. """
+		writes:list[tuple[int,bytes]]=[]
+		for e in entries:
+			if writes and writes[-1][0]+len(writes[-1][1])==e.address:
+				writes[-1]=(writes[-1][0],writes[-1][1]+e.data)
+			else:
+				writes.append((e.address,e.data))
+		return writes
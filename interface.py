@@ -1,31 +1,39 @@
+import contextlib
 import struct
+import time
 from typing import Any, TypeAlias, cast
 
+import numpy as np
+
+import api
+import commands
+import diff
+import fanout
+import freeze
+import metrics
+import patterns
+import pointers
+import pretty
 import scanner
+import session
+import snapshot
+import stats
+import structs
 import system
+import watch
 
 
-def number_type(string:str)->type[float]|type[int]|type[str]:
-	""" Return number type or str if not a number. """
-	try:
-		_=int(string)
-		return int
-	except ValueError:
-		try:
-			_=float(string)
-			return float
-		except ValueError:
-			return str
-
 class Interface:
 
-	TokenList:TypeAlias=list[float|int|str]
+	TokenList:TypeAlias=commands.TokenList
 
 	class Command:
 		""" Base class for commands. """
 		alias:tuple[str,...]=('',)
 		arguments:str=""
 		description:str=""
+		# Arguments are given as typed, as strings, instead of parsed into numbers.
+		raw:bool=False
 		def __init__(self,interface:'Interface')->None:
 			self.interface=interface
 		def do(self,tokens:'Interface.TokenList')->bool:
@@ -46,60 +54,271 @@ class Interface:
 		def do(self,_:'Interface.TokenList')->bool:
 			if not self.interface.handle:
 				return True
+			self.interface.watches.stop()
+			self.interface.watches.clear()
+			self.interface.frozen.stop()
+			self.interface.frozen.clear()
 			close_ok=system.process_close(self.interface.handle)
 			if close_ok:
 				self.interface.handle=None
 				self.interface.scanner=scanner.Scanner()
+				self.interface.diff_mark=None
 			else:
 				print("Failed to close handle!")
 			return close_ok
 
-	class FindEqual(Command):
-		alias:tuple[str,...]=("eq","=")
-		arguments:str="<value>"
-		description:str="Search for exact value." # TODO: also unchanged values.
+	class Diff(Command):
+		alias:tuple[str,...]=("diff",)
+		arguments:str="[mark [file] | <snapshot> [snapshot]] [gap <bytes>] [> file]"
+		description:str="Mark memory, then show what changed since, or between snapshot files."
+		RANGES_SHOWN=4
 		def do(self,tokens:'Interface.TokenList')->bool:
-			if not self._validate_arguments(tokens,[float|int]):
+			words=[str(t).lower() for t in tokens]
+			out_path=None
+			if ">" in words:
+				i=words.index(">")
+				if i+1>=len(tokens):
+					print("Missing file after >.")
+					return False
+				out_path=str(tokens[i+1])
+				tokens=tokens[:i]+tokens[i+2:]
+				words=words[:i]+words[i+2:]
+			gap=0
+			if "gap" in words:
+				i=words.index("gap")
+				if i+1>=len(tokens) or not isinstance(tokens[i+1],int) or cast(int,tokens[i+1])<0:
+					print("Expected a number of bytes after gap.")
+					return False
+				gap=cast(int,tokens[i+1])
+				tokens=tokens[:i]+tokens[i+2:]
+				words=words[:i]+words[i+2:]
+			if words[:1]==["mark"]:
+				return self.mark(str(tokens[1]) if len(tokens)>1 else None)
+			try:
+				snapshots=[snapshot.Snapshot(str(t)) for t in tokens[:2]]
+			except (OSError,ValueError) as e:
+				print(f"Can't load snapshot: {e}")
 				return False
-			if not self.interface.scanner.is_started():
-				# User didn't start, so do it now with value type and try again.
-				self.interface.commands_dict["start"].do([type(tokens[0]).__name__])
-				self.interface.commands_dict["eq"].do(tokens)
-				return True
-			print(f"Searching for exact value {tokens[0]}...")
-			h=self.interface.handle
-			mem=system.process_scan_memory(h)
-			val=cast(scanner.Scanner.SupportedType,tokens[0])
-			self.interface.scanner.continue_search_equal(mem,val)
-			self.interface.print_matches()
+			if not snapshots and self.interface.diff_mark is None:
+				print("Use 'diff mark' first, or give snapshot files.")
+				return False
+			before=snapshots[0] if snapshots else self.interface.diff_mark
+			after=snapshots[1] if len(snapshots)>1 else system.process_scan_memory(self.interface.handle,self.interface.side_arena,self.interface.region_map())
+			time_now=time.time()
+			regions,changed,ranges=0,0,0
+			shown:list[diff.RegionDiff]=[]
+			try:
+				with open(out_path,"w") if out_path else contextlib.nullcontext() as out:
+					for d in diff.compare(before,after,gap,self.interface.scanner.workers):
+						if out:
+							out.write(d.to_json()+"\n")
+						regions+=1
+						changed+=d.changed
+						ranges+=len(d.ranges)
+						if len(shown)<Interface.PATTERN_MATCHES_SHOWN:
+							shown.append(d)
+			except OSError as e:
+				print(f"Can't write changes: {e}")
+				return False
+			print(f"{changed} bytes changed in {ranges} ranges of {regions} regions, in {time.time()-time_now:.5} seconds.")
+			for d in shown:
+				first=", ".join(f"+{offset:#x} ({length})" for offset,length in d.ranges[:self.RANGES_SHOWN].tolist())
+				more=", ..." if len(d.ranges)>self.RANGES_SHOWN else ""
+				print(f"[{d.base}] {d.status}, {d.changed} bytes: {first}{more}")
+			if out_path:
+				print(f"Wrote {out_path}.")
+			return True
+		def mark(self,path:str|None)->bool:
+			""" Keep memory as it is now to compare with later, in a snapshot file if given. """
+			mem=system.process_scan_memory(self.interface.handle,self.interface.side_arena,self.interface.region_map())
+			try:
+				# Copied, the arena gets read into again.
+				self.interface.diff_mark=snapshot.save(path,mem.items()) if path else {k:bytes(v) for k,v in mem.items()}
+			except OSError as e:
+				print(f"Can't write snapshot: {e}")
+				return False
+			print(f"Marked {pretty.pretty_size(sum(len(v) for v in mem.values()))}{' in '+path if path else ''}.")
 			return True
 
-	class FindGreater(Command):
-		alias:tuple[str,...]=("gt","+")
-		description:str="Search for values that increased."
-		def do(self,_:'Interface.TokenList')->bool:
-			if not self.interface.scanner.is_started(): # TODO: dedup.
+	class Find(Command):
+		"""
+		Base class for commands that refine a started search, with the
+		criterion commands.CRITERIA has for their first alias.
+		"""
+		types:list[type]=[]
+		message:str=""
+		# Values in pages that didn't change give a known result, so only
+		# changed pages need reading.
+		changed_only:bool=False
+		def do(self,tokens:'Interface.TokenList')->bool:
+			if not self._validate_arguments(tokens,self.types):
+				return False
+			if not self.interface.scanner.is_started():
 				print("Use 'start' first.")
 				return False
-			print(f"Searching for increased values...")
-			h=self.interface.handle
-			mem=system.process_scan_memory(h)
-			self.interface.scanner.continue_search_greater(mem)
+			# Extra values are ignored, as they always were.
+			criterion,value=commands.criterion(self.alias[0],tokens[:commands.CRITERIA[self.alias[0]][1]])
+			print(self.message.format(*tokens))
+			mem=self.interface.scan_memory(changed_only=self.changed_only)
+			self.interface.print_search(self.interface.scanner.search(mem,value,criterion))
 			self.interface.print_matches()
 			return True
 
-	class FindLess(Command):
+	class FindApprox(Find):
+		alias:tuple[str,...]=("approx","~")
+		arguments:str="<value> [epsilon]"
+		description:str="Search for values within epsilon of value."
+		types:list[type]=[float|int]
+		message:str="Searching for values close to {0}..."
+		def do(self,tokens:'Interface.TokenList')->bool:
+			if len(tokens)>1 and not self._validate_arguments(tokens,[float|int,float|int]):
+				return False
+			return super().do(tokens)
+
+	class FindBytes(Command):
+		alias:tuple[str,...]=("aob",)
+		arguments:str="<hex bytes>"
+		description:str="Search for a byte pattern, ?? matches any byte."
+		raw:bool=True
+		def do(self,tokens:'Interface.TokenList')->bool:
+			try:
+				pattern=patterns.Pattern.from_signature(" ".join(str(t) for t in tokens))
+			except ValueError as e:
+				print(e)
+				return False
+			self.interface.find_patterns([pattern])
+			return True
+
+	class FindChanged(Find):
+		alias:tuple[str,...]=("changed","!=")
+		description:str="Search for values that changed."
+		message:str="Searching for changed values..."
+		changed_only:bool=True
+
+	class FindDecreasedBy(Find):
+		alias:tuple[str,...]=("decby","-=")
+		arguments:str="<amount>"
+		description:str="Search for values that decreased by amount."
+		types:list[type]=[float|int]
+		message:str="Searching for values that decreased by {0}..."
+
+	class FindEqual(Find):
+		alias:tuple[str,...]=("eq","=")
+		arguments:str="[value]"
+		description:str="Search for exact value, or unchanged values without one."
+		types:list[type]=[float|int]
+		message:str="Searching for exact value {0}..."
+		def do(self,tokens:'Interface.TokenList')->bool:
+			if not tokens:
+				return self.interface.commands_dict["unchanged"].do(tokens)
+			if self._validate_arguments(tokens,self.types) and not self.interface.scanner.is_started():
+				# User didn't start, so do it now with value type and try again.
+				self.interface.commands_dict["start"].do([type(tokens[0]).__name__])
+			return super().do(tokens)
+
+	class FindGreater(Find):
+		alias:tuple[str,...]=("gt","+")
+		description:str="Search for values that increased."
+		message:str="Searching for increased values..."
+		changed_only:bool=True
+
+	class FindIncreasedBy(Find):
+		alias:tuple[str,...]=("incby","+=")
+		arguments:str="<amount>"
+		description:str="Search for values that increased by amount."
+		types:list[type]=[float|int]
+		message:str="Searching for values that increased by {0}..."
+
+	class FindLess(Find):
 		alias:tuple[str,...]=("lt","-")
 		description:str="Search for values that decreased."
-		def do(self,_:'Interface.TokenList')->bool:
-			if not self.interface.scanner.is_started(): # TODO: dedup.
-				print("Use 'start' first.")
+		message:str="Searching for decreased values..."
+		changed_only:bool=True
+
+	class FindRange(Find):
+		alias:tuple[str,...]=("range","in")
+		arguments:str="<low> <high>"
+		description:str="Search for values between low and high, inclusive."
+		types:list[type]=[float|int,float|int]
+		message:str="Searching for values from {0} to {1}..."
+
+	class FindText(Command):
+		alias:tuple[str,...]=("text",)
+		arguments:str="<text>"
+		description:str="Search for text encoded as UTF-8 or UTF-16."
+		raw:bool=True
+		def do(self,tokens:'Interface.TokenList')->bool:
+			if not self._validate_arguments(tokens,[str]):
 				return False
-			print(f"Searching for decreased values...")
-			h=self.interface.handle
-			mem=system.process_scan_memory(h)
-			self.interface.scanner.continue_search_less(mem)
-			self.interface.print_matches()
+			text=" ".join(str(t) for t in tokens)
+			self.interface.find_patterns([patterns.Pattern.from_string(text,e) for e in ("utf-8","utf-16")])
+			return True
+
+	class FindUnchanged(Find):
+		alias:tuple[str,...]=("unchanged","==")
+		description:str="Search for values that didn't change."
+		message:str="Searching for unchanged values..."
+		changed_only:bool=True
+
+	class Freeze(Command):
+		alias:tuple[str,...]=("freeze","f")
+		arguments:str="[<address|letter> [value] | rate <hz> | start | stop]"
+		description:str="Keep writing a value, the current one by default, or list frozen values."
+		def do(self,tokens:'Interface.TokenList')->bool:
+			frozen=self.interface.frozen
+			option=str(tokens[0]).lower() if tokens else ""
+			if not tokens:
+				state="running" if frozen.is_running() else f"stopped by {frozen.error!r}" if frozen.error else "stopped"
+				print(f"{len(frozen)} frozen values, {state}, written {frozen.rate:g} times per second.")
+				print(f"{frozen.polls} polls, {frozen.writes} writes, {frozen.skipped} values already set, "
+					f"{frozen.failures} failures, {frozen.missed} missed deadlines, worst {frozen.max_late*1000:.2f} ms late.")
+				for e in frozen.entries():
+					print(f"[{e.address}] {e.type.name}={e.value}")
+				return True
+			if option in ("start","stop"):
+				if option=="start":
+					frozen.start()
+				else:
+					frozen.stop()
+				print(f"Freezing {'started' if frozen.is_running() else 'stopped'}.")
+				return True
+			if option=="rate":
+				if not self._validate_arguments(tokens[1:],[int|float]) or tokens[1]<=0:
+					print("Rate must be positive.")
+					return False
+				frozen.rate=float(tokens[1])
+				print(f"Writing {frozen.rate:g} times per second.")
+				return True
+			target=self.interface.resolve_address(tokens[0])
+			if not target:
+				return False
+			address,stype=target
+			if len(tokens)>1:
+				if not self._validate_arguments(tokens[1:],[int|float]):
+					return False
+				value=tokens[1]
+			else:
+				mem=system.process_read_addresses(self.interface.handle,[address],stype.size,"value")
+				values,found=scanner.Scanner.gather(mem,np.array(sorted(mem),np.uint64),np.array([address],np.uint64),stype)
+				if not found[0]:
+					print(f"Can't read [{address}].")
+					return False
+				value=values[0]
+			try:
+				entry=frozen.add(address,stype,value)
+			except OverflowError as e:
+				print(e)
+				return False
+			frozen.start()
+			print(f"Freezing [{address}] {stype.name}={entry.value}.")
+			return True
+
+	class History(Command):
+		alias:tuple[str,...]=("history",)
+		description:str="List searches made since start, that undo goes back through."
+		def do(self,tokens:'Interface.TokenList')->bool:
+			for i,step in enumerate(self.interface.scanner.steps):
+				print(f"{i+1}: {step.description}, {step.count} matches")
 			return True
 
 	class Help(Command):
@@ -113,6 +332,76 @@ class Interface:
 				print("\t",a,args,"\t",c.description)
 			return True
 
+	class Load(Command):
+		alias:tuple[str,...]=("load",)
+		arguments:str="<file> <type> [unaligned]"
+		description:str="Start a new search from a saved snapshot."
+		def do(self,tokens:'Interface.TokenList')->bool:
+			if not self._validate_arguments(tokens,[str,str]):
+				return False
+			t=str(tokens[1]).lower()
+			if t not in commands.SCANNER_TYPES:
+				print(f"Invalid type: {t}.")
+				return False
+			unaligned=len(tokens)>2 and str(tokens[2]).lower()=="unaligned"
+			try:
+				snap=snapshot.Snapshot(str(tokens[0]))
+			except (OSError,ValueError) as e:
+				print(f"Can't load snapshot: {e}")
+				return False
+			print(f"Starting with type {t} from {tokens[0]}.")
+			self.interface.search_streaming=False
+			self.interface.print_start(self.interface.scanner.start(snap,commands.SCANNER_TYPES[t],unaligned=unaligned))
+			return True
+
+	class Metrics(Command):
+		alias:tuple[str,...]=("metrics",)
+		arguments:str="[reset|json <file>|prom <file>|log <file|off>]"
+		description:str="Show counters and timings of scans, or write them to a file."
+		def do(self,tokens:'Interface.TokenList')->bool:
+			registry=metrics.METRICS
+			if not tokens:
+				values=registry.to_dict()
+				for name,series in values["counters"].items():
+					for labels,value in series.items():
+						print(f"{name}{labels}: {value:.15g}")
+				for name,series in values["histograms"].items():
+					for labels,h in series.items():
+						print(f"{name}{labels}: {h['count']} times, {h['sum']:.5g} total")
+				return True
+			action=str(tokens[0]).lower()
+			if action=="reset":
+				registry.reset()
+				return True
+			if action not in ("json","prom","log") or len(tokens)<2:
+				print(f"Expected {self.arguments}.")
+				return False
+			path=str(tokens[1])
+			if action=="log":
+				if registry.log:
+					registry.log.close()
+					registry.log=None
+				if path.lower()=="off":
+					return True
+				try:
+					registry.log=open(path,"a")
+				except OSError as e:
+					print(f"Can't open log: {e}")
+					return False
+				print(f"Logging scans to {path}.")
+				return True
+			try:
+				with open(path,"a" if action=="json" else "w") as f:
+					if action=="json":
+						registry.write_json(f)
+					else:
+						f.write(registry.prometheus())
+			except OSError as e:
+				print(f"Can't write metrics: {e}")
+				return False
+			print(f"Wrote {path}.")
+			return True
+
 	class Poke(Command):
 		alias:tuple[str,...]=("poke","p")
 		arguments:str="<address> <value>"
@@ -120,54 +409,503 @@ class Interface:
 		def do(self,tokens:'Interface.TokenList')->bool:
 			if not self._validate_arguments(tokens,[int|str,int|float]):
 				return False
-			address=0
-			# Handle address as letter 'a' to 'h'
-			letters=tuple(chr(ord('a')+i) for i in range(8))
-			if tokens[0] in letters:
-				address=self.interface.scanner.get_matches()[letters.index(tokens[0])][0]
-			else:
-				address=cast(int,tokens[0])
+			target=self.interface.resolve_address(tokens[0])
+			if not target:
+				return False
+			address,stype=target
 			value=tokens[1]
+			try:
+				data=struct.pack(stype.code,value)
+			except struct.error as e:
+				print(f"Can't write {value} as {stype.name}: {e}.")
+				return False
 			print(f"Poke {address},{value}... ",end='')
-			data=struct.pack(self.interface.scanner.type.code,value)
 			ok=system.memory_write(self.interface.handle,address,data)
 			print(["ERROR","OK"][int(ok)])
 			return True
 
+	class Pointers(Command):
+		alias:tuple[str,...]=("pointers","ptr")
+		arguments:str="<address|letter> [depth] [max offset] | resolve"
+		description:str="Find pointer paths from modules to an address, or follow the paths found."
+		DEFAULT_DEPTH=4
+		DEFAULT_MAX_OFFSET=0x1000
+		def do(self,tokens:'Interface.TokenList')->bool:
+			if not self._validate_arguments(tokens,[int|str,int,int][:max(1,len(tokens))]):
+				return False
+			if str(tokens[0]).lower()=="resolve":
+				return self.resolve()
+			target=self.interface.resolve_address(tokens[0])
+			if not target:
+				return False
+			depth=cast(int,tokens[1]) if len(tokens)>1 else self.DEFAULT_DEPTH
+			max_offset=cast(int,tokens[2]) if len(tokens)>2 else self.DEFAULT_MAX_OFFSET
+			handle=self.interface.handle
+			region_map=self.interface.region_map()
+			time_now=time.time()
+			mem=system.process_scan_memory(handle,self.interface.side_arena,region_map)
+			# Pointers may point into any readable region, not only scanned ones.
+			index=pointers.PointerIndex.build(mem,[(r.address,r.size) for r in region_map.regions()])
+			print(f"Indexed {len(index)} pointers in {time.time()-time_now:.5} seconds.")
+			paths=pointers.scan(index,target[0],system.process_modules(handle),depth,max_offset,workers=self.interface.scanner.workers)
+			print(f"{len(paths)} paths found in {time.time()-time_now:.5} seconds.")
+			for path in paths[:Interface.PATTERN_MATCHES_SHOWN]:
+				print(path)
+			self.interface.pointer_paths=paths
+			return True
+		def resolve(self)->bool:
+			""" Follow the paths found last in the current process, which may have restarted since. """
+			paths=self.interface.pointer_paths
+			if not paths:
+				print("No paths, find some with 'pointers <address|letter>' first.")
+				return False
+			handle=self.interface.handle
+			def read_pointer(address:int)->int|None:
+				mem=system.process_read_addresses(handle,[address],8,"value")
+				values,found=scanner.Scanner.gather(mem,np.array(sorted(mem),np.uint64),np.array([address],np.uint64),scanner.Scanner.UInt64)
+				return int(values[0]) if found[0] else None
+			modules=system.process_modules(handle)
+			for path in paths[:Interface.PATTERN_MATCHES_SHOWN]:
+				address=pointers.resolve(path,modules,read_pointer)
+				print(f"{path} = {address:x}" if address is not None else f"{path} can't be followed")
+			return True
+
+	class Regions(Command):
+		alias:tuple[str,...]=("regions",)
+		arguments:str="[list | type <image|mapped|private|all>... | writable <on|off> | size <min> [max] | range <low> <high>|off | exclude|include <module>]"
+		description:str="Show or change which regions are scanned."
+		def do(self,tokens:'Interface.TokenList')->bool:
+			region_filter=self.interface.region_filter
+			option=str(tokens[0]).lower() if tokens else ""
+			values=[str(t) for t in tokens[1:]]
+			try:
+				match option:
+					case "":
+						pass
+					case "list":
+						for r in self.interface.region_map().regions(names=True):
+							if region_filter.accepts(r):
+								print(f"{r.address:x}-{r.end:x} {r.kind:<7} {'rw' if r.writable else 'r-'} {r.module}")
+					case "type":
+						kinds={v.lower() for v in values}-{"all"}
+						if not kinds<=set(system.REGION_KINDS):
+							print(f"Types are {', '.join(system.REGION_KINDS)} or all.")
+							return False
+						region_filter.kinds=kinds
+					case "writable":
+						region_filter.writable_only=values[0].lower()=="on"
+					case "size":
+						region_filter.min_size=int(values[0],0)
+						region_filter.max_size=int(values[1],0) if len(values)>1 else 0
+					case "range":
+						if values[0].lower()=="off":
+							region_filter.ranges=[]
+						else:
+							region_filter.ranges.append((int(values[0],0),int(values[1],0)))
+					case "exclude":
+						region_filter.exclude_modules|={v.lower() for v in values}
+					case "include":
+						region_filter.exclude_modules-={v.lower() for v in values}
+					case _:
+						print(f"Expected {self.arguments}.")
+						return False
+			except (IndexError,ValueError):
+				print(f"Expected {self.arguments}.")
+				return False
+			blocks=self.interface.region_map().blocks()
+			print(f"Scanning {len(blocks)} regions, {pretty.pretty_size(sum(size for _,size in blocks))}: {region_filter}.")
+			return True
+
+	class Save(Command):
+		alias:tuple[str,...]=("save",)
+		arguments:str="<file>"
+		description:str="Save start snapshot, before the first search."
+		def do(self,tokens:'Interface.TokenList')->bool:
+			if not self._validate_arguments(tokens,[str]):
+				return False
+			try:
+				ok=self.interface.scanner.save_snapshot(str(tokens[0]))
+			except (OSError,ValueError) as e:
+				print(f"Can't save snapshot: {e}")
+				return False
+			print(f"Saved {tokens[0]}." if ok else "Nothing to save, use 'start' first.")
+			return ok
+
+	class Struct(Command):
+		alias:tuple[str,...]=("struct",)
+		arguments:str="<[@offset] type [= value|in low high|~ value [epsilon]]>... [unaligned]"
+		description:str="Search for records with fields at offsets, apart from the current search."
+		# Criterion and number of values of field comparisons.
+		OPERATORS:dict[str,tuple[scanner.Criterion,int]]={
+			"=":(scanner.Scanner.cmp_eq,1),
+			"eq":(scanner.Scanner.cmp_eq,1),
+			"~":(scanner.Scanner.cmp_approx,1),
+			"approx":(scanner.Scanner.cmp_approx,1),
+			"in":(scanner.Scanner.cmp_range,2),
+			"range":(scanner.Scanner.cmp_range,2),
+			}
+		def do(self,tokens:'Interface.TokenList')->bool:
+			try:
+				struct=self.parse(tokens)
+			except ValueError as e:
+				print(e)
+				print(f"Expected {self.arguments}, like 'struct int = 100 @8 float float float'.")
+				return False
+			print(f"Searching for {struct}...")
+			mem=self.interface.read_all_memory()
+			time_now=time.time()
+			matches=structs.search(mem,struct,self.interface.scanner.workers)
+			print(f"{len(matches.addresses)} matches in {time.time()-time_now:.5} seconds.")
+			for i,address in enumerate(matches.addresses[:Interface.PATTERN_MATCHES_SHOWN]):
+				print(f"[{address}] "+", ".join(str(v[i].item()) for v in matches.values))
+			return True
+		def parse(self,tokens:'Interface.TokenList')->structs.Struct:
+			"""
+			Make a struct from fields, each at the given offset or right after the
+			previous one. Raise ValueError if it can't be made.
+			"""
+			fields=[]
+			offset=0
+			alignment=0
+			i=0
+			while i<len(tokens):
+				token=str(tokens[i]).lower()
+				i+=1
+				if token=="unaligned":
+					alignment=1
+					continue
+				if token.startswith("@"):
+					try:
+						offset=int(token[1:],0)
+					except ValueError:
+						raise ValueError(f"Invalid offset: {token}.") from None
+					if i>=len(tokens):
+						raise ValueError(f"Missing type after {token}.")
+					token=str(tokens[i]).lower()
+					i+=1
+				stype=commands.SCANNER_TYPES.get(token)
+				if stype is None or isinstance(stype,tuple):
+					raise ValueError(f"Invalid type: {token}.")
+				criterion,value=None,None
+				if i<len(tokens) and str(tokens[i]).lower() in self.OPERATORS:
+					operator=str(tokens[i]).lower()
+					criterion,count=self.OPERATORS[operator]
+					values=tokens[i+1:i+1+count]
+					i+=1+count
+					if len(values)<count or not all(isinstance(v,(int,float)) for v in values):
+						raise ValueError(f"Expected {count} number(s) after {token} {operator}.")
+					if criterion is scanner.Scanner.cmp_approx:
+						# Epsilon is optional, a number can't start the next field.
+						if i<len(tokens) and isinstance(tokens[i],(int,float)):
+							values.append(tokens[i])
+							i+=1
+						else:
+							values.append(commands.DEFAULT_EPSILON)
+					value=values[0] if criterion is scanner.Scanner.cmp_eq else tuple(values)
+				fields.append(structs.Field(offset,stype,criterion,value))
+				offset+=stype.size
+			if not fields:
+				raise ValueError("Struct has no fields.")
+			return structs.Struct(fields,alignment)
+
+	class Undo(Command):
+		alias:tuple[str,...]=("undo",)
+		description:str="Go back to the matches before the last search."
+		def do(self,tokens:'Interface.TokenList')->bool:
+			if not self.interface.scanner.undo():
+				print("Nothing to undo.")
+				return False
+			print(f"Back to {self.interface.scanner.steps[-1].description}.")
+			self.interface.print_matches()
+			return True
+
+	class Unfreeze(Command):
+		alias:tuple[str,...]=("unfreeze",)
+		arguments:str="<address|letter|all>"
+		description:str="Stop writing a frozen value."
+		def do(self,tokens:'Interface.TokenList')->bool:
+			if not self._validate_arguments(tokens,[int|str]):
+				return False
+			frozen=self.interface.frozen
+			if str(tokens[0]).lower()=="all":
+				frozen.clear()
+			else:
+				target=self.interface.resolve_address(tokens[0])
+				if not target or not frozen.remove(target[0]):
+					print("Not frozen.")
+					return False
+			if not frozen:
+				frozen.stop()
+			return True
+
+	class Unwatch(Command):
+		alias:tuple[str,...]=("unwatch",)
+		arguments:str="<address|letter|all>"
+		description:str="Stop watching an address."
+		def do(self,tokens:'Interface.TokenList')->bool:
+			if not self._validate_arguments(tokens,[int|str]):
+				return False
+			watches=self.interface.watches
+			if str(tokens[0]).lower()=="all":
+				watches.clear()
+			else:
+				target=self.interface.resolve_address(tokens[0])
+				if not target or not watches.remove(target[0]):
+					print("Not watched.")
+					return False
+			if not watches:
+				watches.stop()
+			return True
+
+	class Watch(Command):
+		alias:tuple[str,...]=("watch","w")
+		arguments:str="[<address|letter> [type] | rate <hz>]"
+		description:str="Watch an address in the background, or list watches."
+		def do(self,tokens:'Interface.TokenList')->bool:
+			watches=self.interface.watches
+			if not tokens:
+				state=f", stopped by {watches.error!r}" if watches.error else ""
+				print(f"{len(watches)} watches{state}, polled {watches.rate:g} times per second.")
+				for w in watches.watches():
+					history=", ".join(str(v) for v in w.history()[-8:])
+					print(f"[{w.address}] {w.type.name}={w.value} changed {w.changes} times: {history}")
+				return True
+			if str(tokens[0]).lower()=="rate":
+				if not self._validate_arguments(tokens[1:],[int|float]) or tokens[1]<=0:
+					print("Rate must be positive.")
+					return False
+				watches.rate=float(tokens[1])
+				print(f"Polling {watches.rate:g} times per second.")
+				return True
+			target=self.interface.resolve_address(tokens[0])
+			if not target:
+				return False
+			address,stype=target
+			if len(tokens)>1:
+				t=commands.SCANNER_TYPES.get(str(tokens[1]).lower())
+				if not isinstance(t,type):
+					print(f"Invalid type: {tokens[1]}.")
+					return False
+				stype=t
+			watches.add(address,stype)
+			watches.start()
+			print(f"Watching [{address}] as {stype.name}.")
+			return True
+
+	class Session(Command):
+		alias:tuple[str,...]=("session",)
+		arguments:str="<save|load> <file>"
+		description:str="Save search steps to a file, or resume them."
+		def do(self,tokens:'Interface.TokenList')->bool:
+			if not self._validate_arguments(tokens,[str,str]):
+				return False
+			if str(tokens[0]).lower() not in ("save","load"):
+				print(f"Expected {self.arguments}.")
+				return False
+			path=str(tokens[1])
+			region_map=self.interface.region_map()
+			if str(tokens[0]).lower()=="save":
+				if not self.interface.scanner.is_searched():
+					print("Nothing to save, search first. Use 'save' for a start snapshot.")
+					return False
+				try:
+					session.save(path,self.interface.scanner,region_map.regions(names=True))
+				except OSError as e:
+					print(f"Can't save session: {e}")
+					return False
+				print(f"Saved {path}.")
+				return True
+			try:
+				regions=session.load(path,self.interface.scanner)
+			except (OSError,ValueError) as e:
+				print(f"Can't load session: {e}")
+				return False
+			self.interface.search_streaming=False
+			current={(r.address,r.size) for r in region_map.regions()}
+			moved=sum((r.address,r.size) not in current for r in regions)
+			print(f"Resumed {self.interface.scanner.get_current_search_type()} search from {path}.")
+			if moved:
+				print(f"{moved} of {len(regions)} regions changed since it was saved.")
+			self.interface.print_matches()
+			return True
+
+	class Spill(Command):
+		alias:tuple[str,...]=("spill",)
+		arguments:str="<file|off> [compress]"
+		description:str="Keep start snapshots in a file instead of memory, compressed if asked."
+		def do(self,tokens:'Interface.TokenList')->bool:
+			if not self._validate_arguments(tokens,[str]):
+				return False
+			path=str(tokens[0])
+			self.interface.spill_path=None if path.lower()=="off" else path
+			self.interface.spill_compress=len(tokens)>1 and str(tokens[1]).lower()=="compress"
+			compressed=", compressed" if self.interface.spill_path and self.interface.spill_compress else ""
+			print(f"Start snapshots go to {self.interface.spill_path or 'memory'}{compressed}.")
+			return True
+
 	class Start(Command):
 		alias:tuple[str,...]=("start","s")
-		arguments:str="<type> (must be 'int' or 'float')"
-		description:str="Start a new search."
+		arguments:str="<type|all> [unaligned]"
+		description:str="Start a new search, for values of any type with 'all'."
+		unknown:bool=False
 		def do(self,tokens:list)->bool:
 			if not self._validate_arguments(tokens,[str]):
 				return False
-			t=tokens[0]
-			if t in Interface.SUPPORTED_TYPES:
-				print(f"Starting with type {t}.")
-				scanner_type={"float":scanner.Scanner.Float32,"int":scanner.Scanner.Int32}[t]
-				mem=system.process_scan_memory(self.interface.handle)
-				self.interface.scanner.start(mem,scanner_type)
+			t=str(tokens[0]).lower()
+			# Unaligned also finds values that don't start on a multiple of their size.
+			unaligned=len(tokens)>1 and str(tokens[1]).lower()=="unaligned"
+			if t in commands.SCANNER_TYPES:
+				print(f"Starting with type {t}{' unaligned' if unaligned else ''}.")
+				scanner_type=commands.SCANNER_TYPES[t]
+				self.interface.scanner.spill_path=self.interface.spill_path
+				self.interface.scanner.spill_compress=self.interface.spill_compress
+				self.interface.search_streaming=self.interface.streaming
+				mem=self.interface.scan_memory(sparse=False)
+				try:
+					started=self.interface.scanner.start(mem,scanner_type,self.unknown,unaligned)
+				except OSError as e:
+					print(f"Can't write start snapshot: {e}")
+					return False
+				self.interface.print_start(started)
 				return True
 			else:
 				print(f"Invalid type: {t}.")
-				print(f"Supported types are {', '.join([x for x in Interface.SUPPORTED_TYPES])}.")
+				print(f"Supported types are {', '.join(commands.SCANNER_TYPES)}.")
 			return False
 
-	SUPPORTED_TYPES="float","int"
+	class Stats(Command):
+		alias:tuple[str,...]=("stats",)
+		arguments:str="[full] [search and values]"
+		description:str="Show how values are distributed, or how many a search would keep."
+		BINS=8
+		TOP=8
+		def do(self,tokens:'Interface.TokenList')->bool:
+			if not self.interface.scanner.is_started():
+				print("Use 'start' first.")
+				return False
+			full=bool(tokens) and str(tokens[0]).lower()=="full"
+			tokens=tokens[1:] if full else tokens
+			criterion=None
+			if tokens:
+				name=commands.ALIASES.get(str(tokens[0]).lower(),str(tokens[0]).lower())
+				criterion,_=commands.CRITERIA.get(name,(None,0))
+				if criterion is None or not stats.Distribution.is_estimable(criterion):
+					print("Only eq, approx and range can be estimated.")
+					return False
+				if criterion is scanner.Scanner.cmp_approx and len(tokens)==2:
+					tokens=[*tokens,commands.DEFAULT_EPSILON]
+				if not self._validate_arguments(tokens[1:],[float|int]*(1 if criterion is scanner.Scanner.cmp_eq else 2)):
+					return False
+				values=tokens[1:3]
+			time_now=time.time()
+			found=stats.distributions(self.interface.scanner,0 if full else stats.SAMPLE)
+			if criterion:
+				value=values[0] if criterion is scanner.Scanner.cmp_eq else tuple(values)
+				kept=sum(d.estimate(criterion,value) for d in found.values())
+				print(f"{' '.join(map(str,tokens))} would keep about {kept} of {sum(d.total for d in found.values())} values.")
+				return True
+			for d in found.values():
+				print(f"{d.type.name}: {d.total} values, {d.read} read, from {d.minimum()} to {d.maximum()}.")
+				print("Most frequent: "+", ".join(f"{v} ({c})" for v,c in d.top(self.TOP)))
+				counts,edges=d.histogram(self.BINS)
+				for i,c in enumerate(counts):
+					print(f"\t{edges[i]:.6g} to {edges[i+1]:.6g}: {int(c)}")
+				for r in d.regions[:Interface.PATTERN_MATCHES_SHOWN]:
+					print(f"\t[{r.base}] {r.count} values from {r.minimum} to {r.maximum}")
+				if len(d.regions)>Interface.PATTERN_MATCHES_SHOWN:
+					print(f"\t{len(d.regions)-Interface.PATTERN_MATCHES_SHOWN} more regions.")
+			print(f"Done in {time.time()-time_now:.5} seconds.")
+			return True
+
+	class Stream(Command):
+		alias:tuple[str,...]=("stream",)
+		arguments:str="<on|off>"
+		description:str="Compare full scans while they are read."
+		def do(self,tokens:'Interface.TokenList')->bool:
+			mode=str(tokens[0]).lower() if tokens else ""
+			if mode not in ("on","off"):
+				print(f"Expected {self.arguments}.")
+				return False
+			self.interface.streaming=mode=="on"
+			# Streamed blocks are keyed differently, so a search keeps its mode.
+			later=" from next start" if self.interface.scanner.is_started() else ""
+			print(f"Streaming is {mode}{later}.")
+			return True
+
+	class StartUnknown(Start):
+		alias:tuple[str,...]=("unknown","u")
+		description:str="Start a search for an unknown value, then use gt or lt."
+		unknown:bool=True
+
+	# Pattern matches and pointer paths shown at most.
+	PATTERN_MATCHES_SHOWN=16
 
 	def __init__(self)->None:
 		self.scanner=scanner.Scanner()
+		# Regions are read into this buffer, reused between scans.
+		self.arena=system.Arena()
+		# Reads apart from the search, which would otherwise reuse the bank
+		# holding the start snapshot.
+		self.side_arena=system.Arena(1)
+		# Stream full scans instead of reading everything first.
+		self.streaming=False
+		self.search_streaming=False
+		# File for start snapshots, None keeps them in memory.
+		self.spill_path:str|None=None
+		self.spill_compress=False
+		# Which regions to scan, kept when another process is opened.
+		self.region_filter=system.RegionFilter()
+		self._region_map:system.RegionMap|None=None
+		self._dirty_pages:system.DirtyPages|None=None
+		# Addresses polled in the background, read from the current process.
+		self.watches=watch.WatchList(lambda addresses,size:system.process_read_addresses(self.handle,addresses,size,"watch"))
+		# Values written back to the current process.
+		self.frozen=freeze.FreezeList(
+			lambda addresses,size:system.process_read_addresses(self.handle,addresses,size,"freeze"),
+			lambda address,data:system.memory_write(self.handle,address,data))
 		self.handle:system.ProcessHandle=None
 		self.procinfo:system.ProcessInfo|None=None
+		# Processes searched together instead of a single one.
+		self.fanout:Any=None
+		# Paths found by the last pointer scan, to follow after a restart.
+		self.pointer_paths:list[pointers.PointerPath]=[]
+		# Memory to compare with, from diff mark.
+		self.diff_mark:diff.Snapshot|None=None
 		# Create list command objects and fill dictionary.
 		self.commands:list['Interface.Command']=[x(self) for x in (
 			Interface.Close,
+			Interface.Diff,
+			Interface.FindApprox,
+			Interface.FindBytes,
+			Interface.FindChanged,
+			Interface.FindDecreasedBy,
 			Interface.FindEqual,
 			Interface.FindGreater,
+			Interface.FindIncreasedBy,
 			Interface.FindLess,
+			Interface.FindRange,
+			Interface.FindText,
+			Interface.FindUnchanged,
+			Interface.Freeze,
 			Interface.Help,
+			Interface.History,
+			Interface.Load,
+			Interface.Metrics,
 			Interface.Poke,
+			Interface.Pointers,
+			Interface.Regions,
+			Interface.Save,
+			Interface.Session,
+			Interface.Spill,
 			Interface.Start,
+			Interface.StartUnknown,
+			Interface.Stats,
+			Interface.Stream,
+			Interface.Struct,
+			Interface.Undo,
+			Interface.Unfreeze,
+			Interface.Unwatch,
+			Interface.Watch,
 			)]
 		self.commands_dict:dict[str,'Interface.Command']={}
 		for c in self.commands:
@@ -185,17 +923,97 @@ class Interface:
 				if user_input in ("exit","quit","q"):
 					return
 				if user_input:
-					tokens=Interface._parse(user_input)
-					if self.handle:
-						self._command(tokens)
+					tokens=commands.parse(user_input)
+					if self.fanout:
+						self._fanout_command(tokens)
+					elif self.handle:
+						self._command(user_input)
+					elif str(tokens[0]).lower()=="all" and len(tokens)>1:
+						self._fanout_assign(str(tokens[1]))
 					else:
 						self._process_assign(tokens[0])
-				elif not self.handle:
+				elif not self.handle and not self.fanout:
 					# Show list of processes.
 					for k,v in system.get_process_list().items():
 						print(f"{k:>8}: {v.name}")
 		except KeyboardInterrupt:
 			print("Bye!")
+		finally:
+			if self.fanout:
+				self.fanout.close()
+
+	def scan_memory(self,sparse:bool=True,changed_only:bool=False)->scanner.Memory|scanner.MemoryStream:
+		"""
+		Read memory for a search, only pages with candidates if few are left.
+		The scanner is told which pages changed since the previous read, if the
+		system knows, and with changed_only only candidates in those are read.
+		"""
+		if not self._dirty_pages or self._dirty_pages.handle is not self.handle:
+			self._dirty_pages=system.DirtyPages(self.handle)
+		changed=self._dirty_pages.changes(self.region_map().blocks())
+		self.scanner.dirty=changed
+		if changed is not None and changed_only and self.scanner.is_searched():
+			addresses=self.scanner.get_candidate_addresses(changed)
+			return system.process_read_addresses(self.handle,addresses,self.scanner.get_value_size())
+		if sparse and self.scanner.can_read_sparse():
+			addresses=self.scanner.get_candidate_addresses()
+			return system.process_read_addresses(self.handle,addresses,self.scanner.get_value_size())
+		if self.search_streaming:
+			return system.process_stream_memory(self.handle,region_map=self.region_map())
+		return system.process_scan_memory(self.handle,self.arena,self.region_map())
+
+	def find_patterns(self,pattern_list:list[patterns.Pattern])->list[patterns.Match]:
+		""" Search all memory for byte patterns, apart from the current search. """
+		mem=self.read_all_memory()
+		time_now=time.time()
+		matches=patterns.search(mem,pattern_list)
+		print(f"{len(matches)} matches in {time.time()-time_now:.5} seconds.")
+		for m in matches[:Interface.PATTERN_MATCHES_SHOWN]:
+			print(f"[{m.address}] {m.pattern.name}")
+		return matches
+
+	def read_all_memory(self)->scanner.Memory|scanner.MemoryStream:
+		""" Read all scanned regions for a search apart from the current one, as a stream if streaming. """
+		if self.streaming:
+			return system.process_stream_memory(self.handle,region_map=self.region_map())
+		return system.process_scan_memory(self.handle,self.side_arena,self.region_map())
+
+	def resolve_address(self,token:float|int|str)->tuple[int,type[scanner.Scanner.Type]]|None:
+		"""
+		Get address and type from a letter 'a' to 'h' of the matches shown, or
+		from an address, decimal or hex. An address is taken with the search
+		type, or Int32 before a start or when the search has several types.
+		"""
+		letters=tuple(chr(ord('a')+i) for i in range(8))
+		if str(token).lower() in letters:
+			matches=self.scanner.get_matches()
+			i=letters.index(str(token).lower())
+			if i>=len(matches):
+				print(f"No match {token}.")
+				return None
+			return matches[i].address,matches[i].type
+		try:
+			address=token if isinstance(token,int) else int(str(token),0)
+		except ValueError:
+			print(f"Invalid address: {token}.")
+			return None
+		types={lane.type for lane in self.scanner.lanes}
+		return address,types.pop() if len(types)==1 else scanner.Scanner.Int32
+
+	def region_map(self)->system.RegionMap:
+		""" Get cached regions of the current process. """
+		if self._region_map is None or self._region_map.handle is not self.handle:
+			self._region_map=system.RegionMap(self.handle,self.region_filter)
+		return self._region_map
+
+	def print_search(self,result:scanner.Scanner.Searched)->None:
+		for base_address in result.resized:
+			print(f"Region {base_address} had different size.")
+		print(f"Search completed in {result.seconds:.5} seconds.")
+		print(f"Candidates use {pretty.pretty_size(result.candidate_bytes)} ({result.bytes_per_candidate:.2f} bytes per candidate).")
+
+	def print_start(self,result:scanner.Scanner.Started)->None:
+		print(f"Scanned {pretty.pretty_size(result.nbytes)}.")
 
 	def print_matches(self):
 		matches=self.scanner.get_matches()
@@ -203,27 +1021,87 @@ class Interface:
 		print(f"{num_matches} matches.")
 		if num_matches>8:
 			return
-		for i,(a,v) in enumerate(matches):
-			print(f"{chr(ord('a')+i)}:[{a}]={v}")
+		# Several lanes can match at one address, tell which type did.
+		show_type=len(self.scanner.lanes)>1
+		for i,(a,v,t) in enumerate(matches):
+			print(f"{chr(ord('a')+i)}:[{a}]={v}"+(f" ({t.name})" if show_type else ""))
 
 	#---------------------------------------------------------------------------
 
-	def _command(self,tokens:list):
+	def _command(self,user_input:str):
 		assert self.handle
+		tokens=commands.parse(user_input)
 		# Invoke FindEqual if user typed a number.
-		if type(tokens[0]).__name__ in Interface.SUPPORTED_TYPES:
+		if isinstance(tokens[0],(int,float)):
 			self.commands_dict["eq"].do(tokens)
 			return
 		# Invoke command from first token.
 		try:
-			cmd=self.commands_dict[tokens[0]]
-			cmd.do(tokens[1:])
+			cmd=self.commands_dict[str(tokens[0]).lower()]
+			cmd.do(cast(Interface.TokenList,user_input.split()[1:]) if cmd.raw else tokens[1:])
 		except KeyError:
 			print(f"Unknown command: {tokens[0]}.")
 
+	def _fanout_assign(self,name:str)->None:
+		""" Open every process with a name, to search them together. """
+		pids=system.pids_by_name(name,system.get_process_list())
+		if not pids:
+			print(f"Process {name} not found.")
+			return
+		self.fanout=fanout.FanOut(pids)
+		for pid,error in self.fanout.failed.items():
+			print(f"Can't open {pid}: {error}")
+		if not self.fanout.targets:
+			self.fanout.close()
+			self.fanout=None
+			return
+		print(f"Searching {len(self.fanout.targets)} processes named {name}.")
+		print("Commands are start, unknown, searches, undo, common and close.")
+
+	def _fanout_command(self,tokens:TokenList)->None:
+		""" Run a command in all processes searched together, print a line for each. """
+		assert self.fanout
+		name=commands.ALIASES.get(str(tokens[0]).lower(),str(tokens[0]).lower())
+		if isinstance(tokens[0],(int,float)):
+			name,tokens="eq",["eq",*tokens]
+		arguments=tokens[1:]
+		match name:
+			case "close":
+				self.fanout.close()
+				self.fanout=None
+				return
+			case "common":
+				print(f"{len(self.fanout.common_addresses())} addresses found in all processes.")
+				for module,offsets in self.fanout.common_offsets().items():
+					shown=", ".join(f"{o:#x}" for o in offsets[:8])+(", ..." if len(offsets)>8 else "")
+					print(f'"{module}"+ {shown} ({len(offsets)})')
+				return
+			case "start"|"unknown":
+				if not arguments or str(arguments[0]).lower() not in commands.SCANNER_TYPES:
+					print(f"Supported types are {', '.join(commands.SCANNER_TYPES)}.")
+					return
+				unaligned=len(arguments)>1 and str(arguments[1]).lower()=="unaligned"
+				results=self.fanout.start(str(arguments[0]).lower(),name=="unknown",unaligned)
+			case "undo":
+				results=self.fanout.undo()
+			case _ if name in commands.CRITERIA:
+				results=self.fanout.refine(name,*arguments)
+			case _:
+				print(f"Unknown command: {tokens[0]}.")
+				return
+		for pid,result in sorted(results.items()):
+			if isinstance(result,BaseException):
+				print(f"{pid:>8}: {result}")
+			elif isinstance(result,api.SearchResult):
+				print(f"{pid:>8}: {result.count} {'values' if name in ('start','unknown') else 'matches'}.")
+			else:
+				print(f"{pid:>8}: {'OK' if result else 'Nothing to undo.'}")
+
 	def _input(self)->str:
 		""" Get a string from user. """
 		prompt=">"
+		if self.fanout:
+			return input(f"<all:{len(self.fanout)}>")
 		if not self.handle:
 			print("Enter PID or process name.")
 		if self.handle and self.procinfo:
@@ -244,8 +1122,8 @@ class Interface:
 			else:
 				print("Invalid PID.")
 		else:
-			name=str(entry).removesuffix(".exe")+".exe"
-			pids=Interface._pids_from_process_name(name,procs)
+			name=str(entry).lower()
+			pids=system.pids_by_name(name,procs)
 			match len(pids):
 				case 0:
 					print(f"Process {name} not found.")
@@ -257,15 +1135,7 @@ class Interface:
 				case _:
 					print(f"PID's for {name} are:")
 					print(pids)
-
-	@staticmethod
-	def _parse(input_string:str)->TokenList:
-		return [number_type(x)(x.lower()) for x in input_string.split()]
-
-	@staticmethod
-	def _pids_from_process_name(name:str,proc_dict:dict[system.Pid,system.ProcessInfo])->list[system.Pid]:
-		""" Get PID(s) that match a process name. """
-		return [k for k,v in proc_dict.items() if v.name.lower()==name]
+					print(f"Enter 'all {name}' to search all of them together.")
 
 def main():
 	Interface().run()
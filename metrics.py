@@ -0,0 +1,125 @@
+"""
+Counters and histograms of what scans do, to see where their time goes
+without a profiler.
+
+Scanner and the system facade record into a shared registry. It can be read
+as a dictionary, dumped as a JSON line or as Prometheus text, and searches
+can also be logged one JSON line each as they complete.
+"""
+import bisect
+import contextlib
+import json
+import threading
+import time
+from typing import Any, Iterator, TextIO, TypeAlias
+
+Labels:TypeAlias=tuple[tuple[str,str],...]
+
+# Upper bounds of histogram buckets, in seconds and in counts or bytes.
+TIME_BUCKETS=(1e-4,1e-3,1e-2,0.1,1.0,10.0,100.0)
+SIZE_BUCKETS=tuple(float(1<<n) for n in range(0,41,4))
+
+PREFIX="memoryscanner_"
+
+class Histogram:
+	""" Counts of observed values per bucket upper bound, with their sum. """
+	def __init__(self,bounds:tuple[float,...])->None:
+		self.bounds=bounds
+		self.counts=[0]*(len(bounds)+1)
+		self.sum=0.0
+		self.count=0
+	def observe(self,value:float)->None:
+		self.counts[bisect.bisect_left(self.bounds,value)]+=1
+		self.sum+=value
+		self.count+=1
+	def to_dict(self)->dict[str,Any]:
+		return {"buckets":dict(zip([*map(str,self.bounds),"+Inf"],self.counts)),"sum":self.sum,"count":self.count}
+
+class Metrics:
+	""" Registry of labelled counters and histograms, safe to use from threads. """
+	def __init__(self)->None:
+		self.log:TextIO|None=None
+		self._counters:dict[tuple[str,Labels],float]={}
+		self._histograms:dict[tuple[str,Labels],Histogram]={}
+		self._lock=threading.Lock()
+
+	def count(self,name:str,amount:float=1,**labels:Any)->None:
+		key=(name,Metrics._labels(labels))
+		with self._lock:
+			self._counters[key]=self._counters.get(key,0)+amount
+
+	def event(self,name:str,**fields:Any)->None:
+		""" Log a JSON line about something that happened, if there is a log. """
+		if self.log:
+			with self._lock:
+				self.log.write(json.dumps({"time":time.time(),"event":name,**fields})+"\n")
+				self.log.flush()
+
+	def observe(self,name:str,value:float,bounds:tuple[float,...]=TIME_BUCKETS,**labels:Any)->None:
+		""" Add value to a histogram, made with bounds the first time. """
+		key=(name,Metrics._labels(labels))
+		with self._lock:
+			if key not in self._histograms:
+				self._histograms[key]=Histogram(bounds)
+			self._histograms[key].observe(value)
+
+	def prometheus(self)->str:
+		""" Return metrics in the Prometheus text format. """
+		lines=[]
+		with self._lock:
+			counters=sorted(self._counters.items())
+			histograms=sorted(self._histograms.items(),key=lambda x:x[0])
+		for name in sorted({n for (n,_),_ in counters}):
+			lines.append(f"# TYPE {PREFIX}{name}_total counter")
+			lines+=[f"{PREFIX}{name}_total{Metrics._format(labels)} {value:.15g}" for (n,labels),value in counters if n==name]
+		for name in sorted({n for (n,_),_ in histograms}):
+			lines.append(f"# TYPE {PREFIX}{name} histogram")
+			for (n,labels),h in histograms:
+				if n!=name:
+					continue
+				total=0
+				for bound,count in zip([*map(str,h.bounds),"+Inf"],h.counts):
+					total+=count
+					lines.append(f"{PREFIX}{name}_bucket{Metrics._format(labels+(('le',bound),))} {total}")
+				lines.append(f"{PREFIX}{name}_sum{Metrics._format(labels)} {h.sum:.15g}")
+				lines.append(f"{PREFIX}{name}_count{Metrics._format(labels)} {h.count}")
+		return "\n".join(lines)+"\n"
+
+	def reset(self)->None:
+		with self._lock:
+			self._counters.clear()
+			self._histograms.clear()
+
+	@contextlib.contextmanager
+	def timer(self,name:str,**labels:Any)->Iterator[None]:
+		""" Observe how long a with block takes, in seconds. """
+		time_now=time.perf_counter()
+		try:
+			yield
+		finally:
+			self.observe(name,time.perf_counter()-time_now,**labels)
+
+	def to_dict(self)->dict[str,Any]:
+		""" Return counters and histograms keyed by name, then by labels. """
+		result:dict[str,Any]={"counters":{},"histograms":{}}
+		with self._lock:
+			for (name,labels),value in sorted(self._counters.items()):
+				result["counters"].setdefault(name,{})[Metrics._format(labels)]=value
+			for (name,labels),h in sorted(self._histograms.items(),key=lambda x:x[0]):
+				result["histograms"].setdefault(name,{})[Metrics._format(labels)]=h.to_dict()
+		return result
+
+	def write_json(self,f:TextIO)->None:
+		""" Write all metrics as one JSON line. """
+		f.write(json.dumps({"time":time.time(),**self.to_dict()})+"\n")
+
+	@staticmethod
+	def _format(labels:Labels)->str:
+		return "{"+",".join(f'{k}="{v}"' for k,v in labels)+"}" if labels else ""
+
+	@staticmethod
+	def _labels(labels:dict[str,Any])->Labels:
+		return tuple(sorted((k,str(v)) for k,v in labels.items()))
+
+# Registry that the scanner and the system facade record into.
+METRICS=Metrics()
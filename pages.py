@@ -0,0 +1,52 @@
+"""
+Page arithmetic shared by the scanner and the system facade.
+"""
+from typing import TypeAlias
+
+import numpy as np
+
+NumpyArray:TypeAlias=np.ndarray
+
+PAGE_SIZE=0x1000
+
+# Odd weights per word of a page, so changing any single word changes the
+# page checksum.
+_WEIGHTS=np.random.default_rng(0x5CA4).integers(0,1<<63,PAGE_SIZE//8,np.uint64)*np.uint64(2)+np.uint64(1)
+
+def checksums(data:bytes|memoryview|NumpyArray)->NumpyArray:
+	""" Return a uint64 weighted sum of words for each page of data. """
+	raw=np.frombuffer(data,np.uint8)
+	tail=len(raw)%PAGE_SIZE
+	if tail:
+		raw=np.concatenate((raw,np.zeros(PAGE_SIZE-tail,np.uint8)))
+	return raw.view(np.uint64).reshape(-1,PAGE_SIZE//8)@_WEIGHTS
+
+def coalesce(addresses:NumpyArray,size:int,gap:int=PAGE_SIZE)->list[tuple[int,int]]:
+	"""
+	Group values of size bytes at sorted addresses into page-aligned
+	(address,length) ranges. Ranges separated by at most gap bytes are merged.
+	"""
+	if len(addresses)==0:
+		return []
+	addresses=np.asarray(addresses,np.uint64)
+	first=addresses//PAGE_SIZE
+	last=(addresses+np.uint64(size-1))//PAGE_SIZE
+	# A new range starts where a value begins past the previous end plus gap.
+	ends=np.maximum.accumulate(last)
+	breaks=np.flatnonzero(first[1:]>ends[:-1]+np.uint64(1+gap//PAGE_SIZE))+1
+	starts=np.concatenate(([0],breaks))
+	stops=np.concatenate((breaks-1,[len(addresses)-1]))
+	return [(int(first[a])*PAGE_SIZE,(int(ends[b])-int(first[a])+1)*PAGE_SIZE) for a,b in zip(starts,stops)]
+
+def runs(page_numbers:NumpyArray)->list[tuple[int,int]]:
+	""" Group sorted page numbers into (first,count) runs of consecutive pages. """
+	if len(page_numbers)==0:
+		return []
+	breaks=np.flatnonzero(np.diff(page_numbers)!=1)+1
+	firsts=np.concatenate(([0],breaks))
+	lasts=np.concatenate((breaks,[len(page_numbers)]))
+	return [(int(page_numbers[a]),int(b-a)) for a,b in zip(firsts,lasts)]
+
+def split(ranges:list[tuple[int,int]],size:int)->list[tuple[int,int]]:
+	""" Split (address,length) ranges into pieces of at most size bytes. """
+	return [(address+i,min(size,length-i)) for address,length in ranges for i in range(0,length,size)]
@@ -0,0 +1,131 @@
+"""
+Byte pattern search, for signatures with wildcards and strings.
+
+Each pattern has a fixed anchor byte. A single comparison pass over a block
+finds where an anchor byte sits, shared by all patterns with that anchor,
+then the other fixed bytes of each pattern are checked at those positions
+only. Blocks that follow each other in memory are searched as one, so
+matches that span two blocks are found too.
+"""
+from collections.abc import Mapping
+from typing import Iterable, NamedTuple, TypeAlias
+
+import numpy as np
+
+NumpyArray:TypeAlias=np.ndarray
+
+Memory:TypeAlias=Mapping[int,bytes|memoryview] # key=base address, value=raw data bytes.
+
+# Bytes too frequent in memory to make good anchors.
+_COMMON_BYTES=b"\x00\xff"
+
+class Pattern:
+	""" Bytes to find, where mask tells which ones must match. """
+	def __init__(self,data:bytes,mask:bytes|None=None,name:str="")->None:
+		assert data,"Empty pattern."
+		self.data=data
+		self.mask=mask if mask is not None else b"\x01"*len(data)
+		assert len(self.mask)==len(data)
+		self.name=name or data.hex(" ")
+		fixed=[i for i,m in enumerate(self.mask) if m]
+		if not fixed:
+			raise ValueError("Pattern has only wildcards.")
+		# Anchor on the first fixed byte that isn't too common.
+		self.anchor=next((i for i in fixed if data[i] not in _COMMON_BYTES),fixed[0])
+		self.checks=[(i,data[i]) for i in fixed if i!=self.anchor]
+	def __len__(self)->int:
+		return len(self.data)
+	def __repr__(self)->str:
+		return f"Pattern({self.name})"
+
+	@classmethod
+	def from_signature(cls,signature:str)->'Pattern':
+		"""
+		Make a pattern from hex bytes, like "48 8B ?? ?? 05", where ?? or ?
+		matches any byte. Bytes can also be written without spaces.
+		"""
+		tokens=signature.split()
+		if len(tokens)==1 and len(tokens[0])>2:
+			if len(tokens[0])%2:
+				raise ValueError(f"Odd number of hex digits: {tokens[0]}.")
+			tokens=[tokens[0][i:i+2] for i in range(0,len(tokens[0]),2)]
+		data=bytearray()
+		mask=bytearray()
+		for token in tokens:
+			if token in ("?","??"):
+				data.append(0)
+				mask.append(0)
+				continue
+			try:
+				if len(token)>2:
+					raise ValueError
+				data.append(int(token,16))
+			except ValueError:
+				raise ValueError(f"Invalid byte: {token}.") from None
+			mask.append(1)
+		if not data:
+			raise ValueError("Empty pattern.")
+		return cls(bytes(data),bytes(mask)," ".join(f"{d:02X}" if m else "??" for d,m in zip(data,mask)))
+
+	@classmethod
+	def from_string(cls,text:str,encoding:str="utf-8")->'Pattern':
+		""" Make a pattern from text, utf-16 is searched little endian and without BOM. """
+		if encoding.lower().replace("-","") in ("utf16","utf16le"):
+			encoding="utf-16-le"
+		return cls(text.encode(encoding),None,f"{text!r} {encoding}")
+
+class Match(NamedTuple):
+	address:int
+	pattern:Pattern
+
+def find(raw:bytes|memoryview|NumpyArray,patterns:list[Pattern],start:int=0)->list[tuple[int,Pattern]]:
+	"""
+	Find all patterns in raw. Only matches that end past start are returned,
+	bytes before it were searched already.
+	Return (offset,pattern) pairs.
+	"""
+	data=np.frombuffer(raw,np.uint8)
+	found=[]
+	by_anchor:dict[int,list[Pattern]]={}
+	for p in patterns:
+		by_anchor.setdefault(p.data[p.anchor],[]).append(p)
+	for anchor_byte,group in by_anchor.items():
+		# One pass for every pattern with this anchor byte.
+		anchored=np.flatnonzero(data==anchor_byte)
+		for p in group:
+			positions=anchored-p.anchor
+			# Keep matches that fit in raw and reach new bytes.
+			lo=max(0,start-len(p)+1)
+			positions=positions[(positions>=lo)&(positions<=len(data)-len(p))]
+			for offset,value in p.checks:
+				if len(positions)==0:
+					break
+				positions=positions[data[positions+offset]==value]
+			found+=[(int(x),p) for x in positions]
+	return found
+
+def search(mem:Memory|Iterable[tuple[int,bytes|memoryview]],patterns:list[Pattern])->list[Match]:
+	"""
+	Find patterns in memory blocks, or in a stream of them.
+	Return matches sorted by address.
+	"""
+	if not patterns:
+		return []
+	items=sorted(mem.items()) if isinstance(mem,Mapping) else mem
+	carry=max(len(p) for p in patterns)-1
+	matches:list[Match]=[]
+	tail=b""
+	tail_end=-1
+	for base_address,raw in items:
+		if base_address!=tail_end:
+			tail=b""
+		if tail and carry:
+			# Block continues the previous one, search across the boundary.
+			# Only matches starting in the tail are new, the rest are in raw.
+			window=tail+bytes(raw[:carry])
+			address=base_address-len(tail)
+			matches+=[Match(address+offset,p) for offset,p in find(window,patterns,len(tail)) if offset<len(tail)]
+		matches+=[Match(base_address+offset,p) for offset,p in find(raw,patterns)]
+		tail=(tail+bytes(raw[-carry:]))[-carry:] if carry else b""
+		tail_end=base_address+len(raw)
+	return sorted(matches,key=lambda m:m.address)
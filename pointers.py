@@ -0,0 +1,146 @@
+"""
+Pointer scan: find chains of pointers from module bases to an address, so it
+can be found again after the target restarts.
+
+A reverse index holds every aligned 8-byte value of a snapshot that points
+into a readable region, as two arrays sorted by value: the values and the
+addresses they were found at. Looking up what points near an address is a
+binary search. The search goes back from the target one level at a time,
+each level handled with array operations over all of its addresses at once.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, NamedTuple, TypeAlias
+
+import numpy as np
+
+from scanner import Memory
+from system.regions import Module
+
+NumpyArray:TypeAlias=np.ndarray
+
+class PointerIndex:
+	""" Pointer values sorted, with the addresses holding them. """
+	def __init__(self,values:NumpyArray,addresses:NumpyArray)->None:
+		self.values=values
+		self.addresses=addresses
+
+	def __len__(self)->int:
+		return len(self.values)
+
+	@classmethod
+	def build(cls,mem:Memory,targets:list[tuple[int,int]]|None=None)->'PointerIndex':
+		"""
+		Index pointers found in memory blocks that point into targets, sorted
+		(address,size) ranges. Targets default to the blocks themselves.
+		"""
+		if targets is None:
+			targets=sorted((k,len(v)) for k,v in mem.items())
+		starts=np.array([a for a,_ in targets],np.uint64)
+		ends=np.array([a+s for a,s in targets],np.uint64)
+		values=[]
+		addresses=[]
+		for base_address,raw in mem.items():
+			# Blocks are page aligned, so words from their start are aligned.
+			words=np.frombuffer(raw,np.uint64,len(raw)//8)
+			i=np.searchsorted(starts,words,"right")-1
+			ok=(i>=0)&(words<ends[np.maximum(i,0)])
+			found=np.flatnonzero(ok)
+			values.append(words[found])
+			addresses.append(np.uint64(base_address)+found.astype(np.uint64)*np.uint64(8))
+		if not values:
+			return cls(np.empty(0,np.uint64),np.empty(0,np.uint64))
+		all_values=np.concatenate(values)
+		order=np.argsort(all_values,kind="stable")
+		return cls(all_values[order],np.concatenate(addresses)[order])
+
+	def find(self,low:NumpyArray,high:NumpyArray)->tuple[NumpyArray,NumpyArray]:
+		"""
+		For each low,high pair, find pointers with values in [low,high].
+		Return the pair each pointer belongs to and the pointer's index.
+		"""
+		first=np.searchsorted(self.values,low,"left")
+		last=np.searchsorted(self.values,high,"right")
+		counts=last-first
+		pair=np.repeat(np.arange(len(low)),counts)
+		# Index of each pointer: its pair's first plus its rank in the pair.
+		rank=np.arange(len(pair))-np.repeat(np.cumsum(counts)-counts,counts)
+		return pair,first[pair]+rank
+
+class PointerPath(NamedTuple):
+	"""
+	Address of a pointer as an offset from a module, then the offsets added
+	to each pointer read along the way. The last one gives the target.
+	"""
+	module:str
+	offset:int
+	offsets:tuple[int,...]
+	def __str__(self)->str:
+		return f'"{self.module}"+{self.offset:#x}'+"".join(f" -> {o:#x}" for o in self.offsets)
+
+def scan(index:PointerIndex,target:int,modules:list[Module],depth:int=4,max_offset:int=0x1000,
+	max_results:int=1000,max_nodes:int=1<<20,workers:int=1)->list[PointerPath]:
+	"""
+	Find pointer paths from module bases to target, at most depth pointers
+	long, where each pointer points at most max_offset bytes below the
+	next address. Each level keeps at most max_nodes addresses. Lookups of a
+	level are split over workers threads.
+	"""
+	bases=np.array([m.base for m in modules],np.uint64)
+	ends=np.array([m.base+m.size for m in modules],np.uint64)
+	# Each level: addresses, index of the address they lead to in the
+	# previous level, and offset added to the pointer value to get there.
+	levels:list[tuple[NumpyArray,NumpyArray,NumpyArray]]=[(np.array([target],np.uint64),np.empty(0,np.intp),np.empty(0,np.uint64))]
+	results:list[PointerPath]=[]
+	pool=ThreadPoolExecutor(workers) if workers>1 else None
+	try:
+		for _ in range(depth):
+			nodes=levels[-1][0]
+			if len(nodes)==0 or len(results)>=max_results:
+				break
+			low=nodes-np.minimum(nodes,np.uint64(max_offset))
+			pair,pointer=_find(index,low,nodes,pool,workers)
+			addresses=index.addresses[pointer]
+			offsets=nodes[pair]-index.values[pointer]
+			if len(addresses)>max_nodes:
+				addresses,pair,offsets=addresses[:max_nodes],pair[:max_nodes],offsets[:max_nodes]
+			levels.append((addresses,pair,offsets))
+			# Pointers inside modules end a path, the others are looked up next.
+			m=np.searchsorted(bases,addresses,"right")-1
+			static=(m>=0)&(addresses<ends[np.maximum(m,0)])
+			for i in np.flatnonzero(static)[:max_results-len(results)]:
+				module=modules[m[i]]
+				results.append(PointerPath(module.name,int(addresses[i])-module.base,_offsets(levels,i)))
+			levels[-1]=(addresses[~static],pair[~static],offsets[~static])
+	finally:
+		if pool:
+			pool.shutdown()
+	return results
+
+def resolve(path:PointerPath,modules:list[Module],read_pointer:Callable[[int],int|None])->int|None:
+	""" Follow a path in a running process. Return the address it gives or None. """
+	module=next((m for m in modules if m.name==path.module),None)
+	if module is None:
+		return None
+	address=module.base+path.offset
+	for offset in path.offsets:
+		pointer=read_pointer(address)
+		if pointer is None:
+			return None
+		address=pointer+offset
+	return address
+
+def _find(index:PointerIndex,low:NumpyArray,high:NumpyArray,pool:ThreadPoolExecutor|None,workers:int)->tuple[NumpyArray,NumpyArray]:
+	if pool is None or len(low)<workers*1024:
+		return index.find(low,high)
+	bounds=np.linspace(0,len(low),workers+1).astype(np.intp)
+	parts=list(pool.map(lambda ab:index.find(low[ab[0]:ab[1]],high[ab[0]:ab[1]]),zip(bounds[:-1],bounds[1:])))
+	return np.concatenate([p+a for (p,_),a in zip(parts,bounds[:-1])]),np.concatenate([q for _,q in parts])
+
+def _offsets(levels:list[tuple[NumpyArray,NumpyArray,NumpyArray]],i:int)->tuple[int,...]:
+	""" Offsets from the pointer at index i of the last level down to the target. """
+	offsets=[]
+	for k in range(len(levels)-1,0,-1):
+		_,pair,level_offsets=levels[k]
+		offsets.append(int(level_offsets[i]))
+		i=int(pair[i])
+	return tuple(offsets)
@@ -1,15 +1,24 @@
+import os
+import queue
+import threading
 import time
-from typing import Any, Callable, TypeAlias
+from collections.abc import Mapping
+from concurrent.futures import ThreadPoolExecutor
+from itertools import groupby
+from typing import Any, Callable, Iterable, Iterator, NamedTuple, TypeAlias
 
 import numpy as np
 
-import pretty
+import pages
+import snapshot
+from candidates import Candidates, RegionCandidates, bytes_per_candidate
+from metrics import METRICS, SIZE_BUCKETS
 
 NumpyArray:TypeAlias=np.ndarray
 
-Memory:TypeAlias=dict[int,bytes] # key=base address, value=raw data bytes.
+Memory:TypeAlias=dict[int,bytes|memoryview] # key=base address, value=raw data bytes.
 
-Matches:TypeAlias=dict[int,NumpyArray] # key=base address, value=converted data.
+MemoryStream:TypeAlias=Iterable[tuple[int,bytes|memoryview]] # (base address,raw data bytes) items.
 
 Criterion:TypeAlias=Callable[[NumpyArray,NumpyArray,Any],NumpyArray]
 
@@ -17,15 +26,63 @@ class Scanner:
 
 	SupportedType:TypeAlias=float|int
 
+	# Above this many candidates, re-reading whole regions is cheaper than
+	# reading the pages that hold them.
+	SPARSE_READ_LIMIT=1<<20
+
+	# Elements compared per task. A multiple of 8 so chunk bitmaps can be
+	# joined, small enough to spread big regions over workers.
+	CHUNK_SIZE=1<<18
+
+	# Blocks read ahead of comparisons when searching a stream.
+	STREAM_DEPTH=4
+
+	# Searches kept to undo.
+	STEPS_LIMIT=16
+
 	class Type:
 		code:str=""
 		name:str="Base Type"
 		numpy_type=None
 		size:int=4
+	class Int8(Type):
+		code="b"
+		name="Int8"
+		numpy_type=np.int8
+		size=1
+	class Int16(Type):
+		code="h"
+		name="Int16"
+		numpy_type=np.int16
+		size=2
 	class Int32(Type):
 		code="i"
 		name="Int32"
 		numpy_type=np.int32
+	class Int64(Type):
+		code="q"
+		name="Int64"
+		numpy_type=np.int64
+		size=8
+	class UInt8(Type):
+		code="B"
+		name="UInt8"
+		numpy_type=np.uint8
+		size=1
+	class UInt16(Type):
+		code="H"
+		name="UInt16"
+		numpy_type=np.uint16
+		size=2
+	class UInt32(Type):
+		code="I"
+		name="UInt32"
+		numpy_type=np.uint32
+	class UInt64(Type):
+		code="Q"
+		name="UInt64"
+		numpy_type=np.uint64
+		size=8
 	class Float32(Type):
 		code="f"
 		name="Float32"
@@ -36,105 +93,614 @@ class Scanner:
 		numpy_type=np.double
 		size=8
 
-	def __init__(self)->None:
+	class Lane:
+		""" One way to read region bytes: values of a type from a byte offset. """
+		def __init__(self,stype:type['Scanner.Type'],offset:int=0)->None:
+			self.type=stype
+			self.offset=offset
+			self.candidates:Candidates|None=None
+		def addresses(self,base_address:int,indices:NumpyArray)->NumpyArray:
+			return np.uint64(base_address+self.offset)+indices.astype(np.uint64)*np.uint64(self.type.size)
+		def count(self,num_bytes:int)->int:
+			""" Number of values in num_bytes of a region. """
+			return max(0,(num_bytes-self.offset)//self.type.size)
+		def view(self,raw:bytes|memoryview|NumpyArray)->NumpyArray:
+			""" View region bytes as values without copying, unaligned if need be. """
+			count=self.count(len(raw))
+			if count==0:
+				return np.empty(0,self.type.numpy_type)
+			return np.frombuffer(raw,self.type.numpy_type,count,self.offset)
+
+	class Step:
+		""" A search that was made and the candidates of each lane it left, loaded when needed. """
+		def __init__(self,description:str,count:int,candidates:list[Candidates]|Callable[[],list[Candidates]])->None:
+			self.description=description
+			self.count=count
+			self._candidates=candidates
+		def candidates(self)->list[Candidates]:
+			if callable(self._candidates):
+				self._candidates=self._candidates()
+			return self._candidates
+
+	class Match(NamedTuple):
+		address:int
+		value:'Scanner.SupportedType'
+		type:type['Scanner.Type']
+
+	class Started(NamedTuple):
+		""" Outcome of a start: size of the start snapshot. """
+		nbytes:int
+		seconds:float
+
+	class Searched(NamedTuple):
+		"""
+		Outcome of a search: candidates left and memory they use. Regions
+		whose size changed since start weren't compared, resized has their
+		base addresses.
+		"""
+		count:int
+		seconds:float
+		candidate_bytes:int
+		bytes_per_candidate:float
+		resized:tuple[int,...]
+
+	# All types, for searches that don't know the type of a value.
+	ALL_TYPES:tuple[type[Type],...]=(Int8,Int16,Int32,Int64,UInt8,UInt16,UInt32,UInt64,Float32,Float64)
+
+	def __init__(self,workers:int=0,spill_path:str|None=None,spill_compress:bool=False)->None:
+		"""
+		Comparisons are spread over workers threads, NumPy releases the GIL
+		while it runs them. Default is one per CPU.
+		With spill_path, the start snapshot is written to that file instead of
+		being kept in memory.
+		"""
 		self.type:type[Scanner.Type]=Scanner.Type
+		self.lanes:list[Scanner.Lane]=[]
+		self.steps:list[Scanner.Step]=[]
+		self.matches:Memory={} # Start snapshot, raw.
+		self.snapshot:snapshot.Snapshot|None=None
+		self.checksums:dict[int,NumpyArray]={} # key=base address, value=page checksums.
+		# Pages written since memory was last read for a search, set by the
+		# caller right before searching: key=base address, value=mask per
+		# page-sized piece. Without it, page checksums are compared.
+		self.dirty:dict[int,NumpyArray]|None=None
+		# Candidate values are the ones of the last read, which pages that
+		# didn't change since still hold. Not so after undo or resuming.
+		self._values_current=False
+		self.workers=workers or os.cpu_count() or 1
+		self.spill_path=spill_path
+		self.spill_compress=spill_compress
+		self._pool:ThreadPoolExecutor|None=None
+
+	def continue_search_approx(self,mem:Memory|MemoryStream,value:SupportedType,epsilon:SupportedType)->'Scanner.Searched':
+		return self.search(mem,(value,epsilon),Scanner.cmp_approx)
+
+	def continue_search_changed(self,mem:Memory|MemoryStream)->'Scanner.Searched':
+		return self.search(mem,0,Scanner.cmp_changed)
+
+	def continue_search_decreased_by(self,mem:Memory|MemoryStream,amount:SupportedType)->'Scanner.Searched':
+		return self.search(mem,amount,Scanner.cmp_decreased_by)
 
-	def continue_search_equal(self,mem:Memory,value:SupportedType):
-		self.search(mem,value,Scanner.cmp_eq)
+	def continue_search_equal(self,mem:Memory|MemoryStream,value:SupportedType)->'Scanner.Searched':
+		return self.search(mem,value,Scanner.cmp_eq)
 
-	def continue_search_greater(self,mem:Memory):
-		self.search(mem,0,Scanner.cmp_gt)
+	def continue_search_greater(self,mem:Memory|MemoryStream)->'Scanner.Searched':
+		return self.search(mem,0,Scanner.cmp_gt)
 
-	def continue_search_less(self,mem:Memory):
-		self.search(mem,0,Scanner.cmp_lt)
+	def continue_search_increased_by(self,mem:Memory|MemoryStream,amount:SupportedType)->'Scanner.Searched':
+		return self.search(mem,amount,Scanner.cmp_increased_by)
+
+	def continue_search_less(self,mem:Memory|MemoryStream)->'Scanner.Searched':
+		return self.search(mem,0,Scanner.cmp_lt)
+
+	def continue_search_range(self,mem:Memory|MemoryStream,low:SupportedType,high:SupportedType)->'Scanner.Searched':
+		return self.search(mem,(low,high),Scanner.cmp_range)
+
+	def continue_search_unchanged(self,mem:Memory|MemoryStream)->'Scanner.Searched':
+		return self.search(mem,0,Scanner.cmp_unchanged)
+
+	def can_read_sparse(self)->bool:
+		""" Tell if next search can be given only the pages holding candidates. """
+		return self.is_searched() and self.get_matches_count()<=Scanner.SPARSE_READ_LIMIT
+
+	def get_candidate_addresses(self,changed:dict[int,NumpyArray]|None=None)->NumpyArray:
+		"""
+		Get sorted addresses of all candidates, or of those in changed pages
+		only when the others hold the values candidates have.
+		"""
+		changed=changed if self._values_current else None
+		addresses=[lane.addresses(k,Scanner._select(lane,lane.candidates[k].indices(),changed,k))
+			for lane in self.lanes if lane.candidates for k in sorted(lane.candidates)]
+		if not addresses:
+			return np.empty(0,np.uint64)
+		# Lanes overlap, only a single lane is sorted already.
+		return np.concatenate(addresses) if len(self.lanes)==1 else np.unique(np.concatenate(addresses))
+
+	def get_candidates_nbytes(self)->int:
+		return sum(lane.candidates.nbytes() for lane in self.lanes if lane.candidates)
 
 	def get_current_search_type(self)->str:
-		return self.type.name
+		types={lane.type for lane in self.lanes}
+		name=self.type.name if len(types)==1 else "All"
+		return name+" unaligned" if len(self.lanes)>len(types) else name
 
 	def get_matches_count(self)->int:
-		if not self.matches_offsets:
-			return 0
-		return sum([len(v) for v in self.matches_offsets.values()])
+		return sum(lane.candidates.count() for lane in self.lanes if lane.candidates)
 
-	def get_matches(self)->tuple[tuple[int,SupportedType],...]:
+	def get_matches(self)->tuple['Scanner.Match',...]:
 		""" Get up to 8 first matches. """
-		if not self.matches_offsets:
-			return ()
 		ret=[]
-		size=self.type.size
-		for k,offs in self.matches_offsets.items():
-			abs_addr=[int(k+x*size) for x in offs]
-			value=[self.matches[k][off] for off in offs]
-			ret+=(list(zip(abs_addr,value)))
-			if len(ret)>=8:
-				ret=ret[:8]
-				break
-		return tuple(sorted(ret))
+		for lane in self.lanes:
+			if not lane.candidates:
+				continue
+			found=0
+			for k in sorted(lane.candidates):
+				region=lane.candidates[k]
+				offs=region.indices()[:8-found]
+				abs_addr=[int(a) for a in lane.addresses(k,offs)]
+				ret+=[Scanner.Match(a,v,lane.type) for a,v in zip(abs_addr,region.values[:len(offs)])]
+				found+=len(offs)
+				if found>=8:
+					break
+		return tuple(sorted(ret,key=lambda m:m.address)[:8])
+
+	def get_value_size(self)->int:
+		""" Get largest value size, in bytes. """
+		return max(lane.type.size for lane in self.lanes)
+
+	def get_values_count(self)->int:
+		""" Count candidates, or values of the start snapshot before the first search. """
+		if self.is_searched():
+			return self.get_matches_count()
+		if self.snapshot is not None:
+			sizes=[self.snapshot.region_size(k) for k in self.snapshot]
+		else:
+			sizes=[len(raw) for raw in self.matches.values()]
+		return sum(lane.count(size) for lane in self.lanes for size in sizes)
+
+	def is_searched(self)->bool:
+		""" Tell if candidates exist, which happens after the first search. """
+		return bool(self.lanes) and self.lanes[0].candidates is not None
 
 	def is_started(self)->bool:
 		return self.type!=Scanner.Type
 
-	def start(self,mem:Memory,stype:type[Type]):
-		""" Initiate a search with given type. """
-		assert stype!=Scanner.Type,f"Invalid search type: {stype}"
+	def resume(self,lanes:list['Scanner.Lane'],steps:list['Scanner.Step'])->None:
+		""" Continue a search with candidates of its last step, as saved by session. """
+		assert lanes and steps
+		self.type=lanes[0].type
+		self.lanes=lanes
+		self.steps=steps
+		self.matches={}
+		self.checksums={}
+		self._values_current=False
+		self._close_snapshot()
+		for lane,lane_candidates in zip(self.lanes,self.steps[-1].candidates()):
+			lane.candidates=lane_candidates
+
+	def save_snapshot(self,path:str)->bool:
+		"""
+		Save start snapshot so the search can be resumed from it. Raise
+		OSError if it can't be written, ValueError if path is the file the
+		snapshot is mapped from.
+		"""
+		if not self.is_started() or self.is_searched():
+			return False
+		if self.snapshot is not None and os.path.exists(path) and os.path.samefile(path,self.snapshot.path):
+			raise ValueError(f"{path} holds the start snapshot.")
+		source=self.snapshot.items() if self.snapshot is not None else self.matches.items()
+		snapshot.save(path,source,self.spill_compress).close()
+		return True
+
+	def start(self,mem:Memory|MemoryStream,stype:type[Type]|tuple[type[Type],...],unknown:bool=False,unaligned:bool=False)->'Scanner.Started':
+		"""
+		Initiate a search with given type, or several types at once.
+		Unaligned also looks for values at every byte offset. All of these
+		are views of the same region bytes.
+		A snapshot.Snapshot is used as is, to resume from a saved file.
+		With unknown, page checksums are recorded too so that a first search
+		for changes skips pages that stayed the same.
+		Return the size of the start snapshot. Raise OSError if it can't be
+		written to spill_path.
+		"""
+		types=stype if isinstance(stype,tuple) else (stype,)
+		assert types and Scanner.Type not in types,f"Invalid search type: {stype}"
 		#print(f"Starting search for type {stype.name}.")
-		self.type=stype
+		time_now=time.perf_counter()
+		self.type=types[0]
+		self.lanes=[Scanner.Lane(t,offset) for t in types for offset in range(t.size if unaligned else 1)]
+		self.steps=[]
+		self.matches={}
+		self.checksums={}
+		self.dirty=None
+		# A saved snapshot wasn't read from the process right before.
+		self._values_current=not isinstance(mem,snapshot.Snapshot)
+		self._close_snapshot()
 		# Initialize matches to everything.
-		self.matches=Scanner._convert(mem,stype)
-		self.matches_offsets=None
-		num_bytes=Scanner._count_matches(self.matches)*self.type.size
-		print(f"Scanned {pretty.pretty_size(num_bytes)}.")
+		if isinstance(mem,snapshot.Snapshot):
+			self.snapshot=mem
+			if unknown:
+				self.checksums={k:pages.checksums(v) for k,v in mem.items()}
+		else:
+			items=mem.items() if isinstance(mem,Mapping) else Scanner.prefetch(mem,Scanner.STREAM_DEPTH)
+			if unknown:
+				items=self._record_checksums(items)
+			if self.spill_path:
+				try:
+					self.snapshot=snapshot.save(self.spill_path,items,self.spill_compress)
+				except OSError:
+					# Not started without its snapshot.
+					self.type=Scanner.Type
+					self.lanes=[]
+					raise
+			else:
+				self.matches=dict(items)
+		if self.snapshot is not None:
+			num_bytes=self.snapshot.nbytes()
+		else:
+			num_bytes=Scanner._count_bytes(self.matches)
+		seconds=time.perf_counter()-time_now
+		METRICS.observe("convert_seconds",seconds)
+		METRICS.count("bytes_converted",num_bytes)
+		METRICS.event("start",type=self.get_current_search_type(),bytes=num_bytes,seconds=seconds)
+		return Scanner.Started(num_bytes,seconds)
+
+	def undo(self)->bool:
+		""" Go back to the candidates before the last search, if it wasn't the first. """
+		if len(self.steps)<2:
+			return False
+		self.steps.pop()
+		for lane,lane_candidates in zip(self.lanes,self.steps[-1].candidates()):
+			lane.candidates=lane_candidates
+		self.checksums={}
+		self._values_current=False
+		return True
 
 	#---------------------------------------------------------------------------
 
-	# Criteria used in _search.
+	# Criteria used in search, they return a mask of values to keep.
+	# They only get candidate values once a search has narrowed them.
+	@staticmethod
+	def cmp_approx(old:NumpyArray,new:NumpyArray,val)->NumpyArray:
+		value,epsilon=val
+		# Comparisons rather than a difference, which unsigned types wrap.
+		return (new>=value-epsilon)&(new<=value+epsilon)
+
+	@staticmethod
+	def cmp_changed(old:NumpyArray,new:NumpyArray,val)->NumpyArray:
+		return old!=new
+
+	@staticmethod
+	def cmp_decreased_by(old:NumpyArray,new:NumpyArray,val)->NumpyArray:
+		return old-new==val
+
 	@staticmethod
 	def cmp_eq(old:NumpyArray,new:NumpyArray,val)->NumpyArray:
-		return np.where(new==val)[0]
+		return new==val
 
 	@staticmethod
 	def cmp_gt(old:NumpyArray,new:NumpyArray,val)->NumpyArray:
-		return np.where(old<new)[0]
+		return old<new
+
+	@staticmethod
+	def cmp_increased_by(old:NumpyArray,new:NumpyArray,val)->NumpyArray:
+		return new-old==val
 
 	@staticmethod
 	def cmp_lt(old:NumpyArray,new:NumpyArray,val)->NumpyArray:
+		return old>new
+
+	@staticmethod
+	def cmp_range(old:NumpyArray,new:NumpyArray,val)->NumpyArray:
+		low,high=val
+		return (new>=low)&(new<=high)
+
+	@staticmethod
+	def cmp_unchanged(old:NumpyArray,new:NumpyArray,val)->NumpyArray:
+		return old==new
+
+	@staticmethod
+	def describe(criterion:Criterion,value:Any)->str:
+		""" Describe a search like the command that makes it. """
+		name=criterion.__name__.removeprefix("cmp_")
+		if criterion in (Scanner.cmp_approx,Scanner.cmp_range):
+			return f"{name} {value[0]} {value[1]}"
+		if criterion in (Scanner.cmp_decreased_by,Scanner.cmp_eq,Scanner.cmp_increased_by):
+			return f"{name} {value}"
+		return name
+
+	@staticmethod
+	def unchanged_page_result(criterion:Criterion,value:Any)->bool|None:
+		"""
+		Tell what a criterion keeps on pages that didn't change, or None if it
+		depends on more than changes.
+		"""
+		if criterion in (Scanner.cmp_increased_by,Scanner.cmp_decreased_by):
+			return value==0
+		return {
+			Scanner.cmp_changed:False,
+			Scanner.cmp_gt:False,
+			Scanner.cmp_lt:False,
+			Scanner.cmp_unchanged:True,
+			}.get(criterion)
+
+	@staticmethod
+	def gather(mem:Memory,starts:NumpyArray,addresses:NumpyArray,stype:type[Type])->tuple[NumpyArray,NumpyArray]:
+		"""
+		Gather values at sorted addresses from memory blocks whose sorted base
+		addresses are starts. Return values and mask of addresses found.
+		"""
+		size=stype.size
+		values=np.zeros(len(addresses),stype.numpy_type)
+		found=np.zeros(len(addresses),np.bool_)
+		if len(starts)==0 or len(addresses)==0:
+			return values,found
+		block=np.searchsorted(starts,addresses,"right")-1
+		bounds=np.flatnonzero(np.diff(block))+1
+		for a,b in zip(np.concatenate(([0],bounds)),np.concatenate((bounds,[len(addresses)]))):
+			if block[a]<0:
+				continue
+			start=int(starts[block[a]])
+			raw=np.frombuffer(mem[start],np.uint8)
+			offsets=(addresses[a:b]-np.uint64(start)).astype(np.intp)
+			ok=offsets+size<=len(raw)
+			sel=offsets[ok]
+			values[a:b][ok]=raw[sel[:,None]+np.arange(size)].view(stype.numpy_type).ravel()
+			found[a:b]=ok
+		return values,found
+
+	@staticmethod
+	def prefetch(stream:MemoryStream,depth:int)->Iterator[tuple[int,bytes|memoryview]]:
+		"""
+		Iterate stream from a background thread that stays at most depth items
+		ahead, so reading overlaps with whatever consumes the items.
+		"""
+		items:queue.Queue=queue.Queue(depth)
+		stop=threading.Event()
+		end=object()
+		def put(item)->bool:
+			while not stop.is_set():
+				try:
+					items.put(item,timeout=0.1)
+					return True
+				except queue.Full:
+					pass
+			return False
+		def produce():
+			try:
+				for item in stream:
+					if not put(item):
+						return
+				put(end)
+			except BaseException as e:
+				put(e)
+		thread=threading.Thread(target=produce,daemon=True)
+		thread.start()
 		try:
-			return np.where(old>new)[0]
-		except ValueError:
-			print("old=",old,old.size)
-			print("new=",new,new.size)
-			raise
+			while (item:=items.get()) is not end:
+				if isinstance(item,BaseException):
+					raise item
+				yield item
+		finally:
+			stop.set()
+			thread.join()
 
-	def search(self,mem:Memory,value:SupportedType,criterion:Criterion):
+	def search(self,mem:Memory|MemoryStream,value:SupportedType,criterion:Criterion)->'Scanner.Searched':
+		"""
+		Keep candidates that meet criterion, and tell how many are left.
+		Memory holds whole regions or only the pages with candidates. A stream
+		is compared block by block as it is read, its blocks must be keyed like
+		the ones given to start.
+		"""
 		assert self.type!=Scanner.Type,"Search type not provided."
-		time_now=time.time()
-		keys_in_common=self.matches.keys() & mem.keys()
-		intersection={k:mem[k] for k in keys_in_common}
-		matches={}
-		matching_offsets={}
- 		# TODO: Optimize memory usage.
-		for base_address,region_bytes in intersection.items():
-			data:NumpyArray=np.frombuffer(region_bytes,self.type.numpy_type)
-			previous=self.matches[base_address]
-			#assert len(previous)==len(data)
-			if len(previous)!=len(data):
-				print(f"Region {base_address} had different size.")
-				continue
-			indices=criterion(previous,data,value)
-			if len(indices)>0:
-				matches[base_address]=data
-				if self.matches_offsets:
-					matching_offsets[base_address]=self.matches_offsets[base_address] & set(indices)
-				else:
-					matching_offsets[base_address]=set(indices)
-		print(f"Search completed in {time.time()-time_now:.5} seconds.")
-		self.matches=matches
-		self.matches_offsets=matching_offsets
+		time_now=time.perf_counter()
+		before=self.get_values_count()
+		candidates=[Candidates() for _ in self.lanes]
+		checksums:dict[int,NumpyArray]={}
+		resized:list[int]=[]
+		if isinstance(mem,Mapping):
+			resized+=self._search_blocks(candidates,mem,value,criterion,True,checksums)
+		else:
+			for base_address,raw in Scanner.prefetch(mem,Scanner.STREAM_DEPTH):
+				resized+=self._search_blocks(candidates,{base_address:raw},value,criterion,False,checksums)
+		# The start snapshot is no longer needed once candidates exist.
+		self.matches={}
+		self._close_snapshot()
+		for lane,lane_candidates in zip(self.lanes,candidates):
+			lane.candidates=lane_candidates
+		count=self.get_matches_count()
+		# With many candidates left the next search reads whole regions again,
+		# their checksums let it skip pages that don't change until then.
+		if self.dirty is None and isinstance(mem,Mapping) and count>Scanner.SPARSE_READ_LIMIT:
+			self.checksums={k:checksums[k] if k in checksums else pages.checksums(v) for k,v in mem.items()}
+		else:
+			self.checksums={}
+		self.dirty=None
+		self._values_current=True
+		seconds=time.perf_counter()-time_now
+		self.steps.append(Scanner.Step(Scanner.describe(criterion,value),count,candidates))
+		del self.steps[:-Scanner.STEPS_LIMIT]
+		nbytes=self.get_candidates_nbytes()
+		name=criterion.__name__.removeprefix("cmp_")
+		METRICS.observe("compare_seconds",seconds,criterion=name)
+		METRICS.observe("candidates_before",before,SIZE_BUCKETS)
+		METRICS.observe("candidates_after",count,SIZE_BUCKETS)
+		METRICS.observe("candidate_bytes",nbytes,SIZE_BUCKETS)
+		METRICS.event("search",step=self.steps[-1].description,seconds=seconds,before=before,after=count,candidate_bytes=nbytes)
+		return Scanner.Searched(count,seconds,nbytes,bytes_per_candidate(candidates),tuple(resized))
+
+	def _search_blocks(self,candidates:list[Candidates],mem:Memory,value:SupportedType,criterion:Criterion,gather:bool,checksums:dict[int,NumpyArray])->list[int]:
+		"""
+		Add candidates of each lane found in memory blocks. With gather,
+		candidate regions missing from mem are looked up by address in the
+		blocks. Page checksums computed on the way are added to checksums.
+		Return base addresses of regions whose size changed since start.
+		"""
+		chunk=Scanner.CHUNK_SIZE
+		# Result of values in pages that didn't change, None to compare them all.
+		unchanged=Scanner.unchanged_page_result(criterion,value)
+		resized=[]
+		if not self.is_searched():
+			# First search compares whole regions against the start snapshot.
+			# Pages that didn't change aren't compared.
+			tasks=[]
+			start_snapshot=self.snapshot if self.snapshot is not None else self.matches
+			for base_address in sorted(start_snapshot.keys() & mem.keys()):
+				raw=mem[base_address]
+				previous_raw=start_snapshot[base_address]
+				if len(raw)!=len(previous_raw):
+					resized.append(base_address)
+					continue
+				changed=None
+				if unchanged is not None and (mask:=self._changed_pages(base_address,raw,checksums)) is not None:
+					changed=pages.runs(np.flatnonzero(mask))
+				for i,lane in enumerate(self.lanes):
+					data=lane.view(raw)
+					previous=lane.view(previous_raw)
+					for a,b,fill in Scanner._spans(lane,len(data),changed,unchanged):
+						tasks+=[(i,base_address,previous[j:min(j+chunk,b)],data[j:min(j+chunk,b)],fill) for j in range(a,b,chunk)]
+			def compare_chunk(i:int,base_address:int,old:NumpyArray,new:NumpyArray,fill:bool|None)->tuple[int,int,RegionCandidates]:
+				if fill is not None:
+					return i,base_address,RegionCandidates.from_mask(np.full(len(new),fill),new)
+				return i,base_address,RegionCandidates.from_mask(criterion(old,new,value),new)
+			for (i,base_address),group in groupby(self._map(compare_chunk,tasks),key=lambda x:x[:2]):
+				candidates[i].add(base_address,RegionCandidates.merge([part for _,_,part in group]))
+		else:
+			# Later searches only compare values at surviving indices.
+			# Memory holds either whole regions or only the pages with candidates.
+			# Values in pages that didn't change aren't read again.
+			starts=np.array(sorted(mem),np.uint64)
+			tasks=[]
+			masks:dict[int,NumpyArray|None]={}
+			for i,lane in enumerate(self.lanes):
+				assert lane.candidates is not None
+				regions=lane.candidates.items() if gather else [(k,lane.candidates[k]) for k in mem if k in lane.candidates]
+				for base_address,region in sorted(regions):
+					indices=region.indices()
+					whole=base_address in mem and lane.count(len(mem[base_address]))==region.length
+					# Positions of the values to read, None for all of them.
+					dirty=None
+					if unchanged is not None:
+						if base_address not in masks:
+							masks[base_address]=self._changed_pages(base_address,mem[base_address] if whole else None,checksums)
+						if (mask:=masks[base_address]) is not None:
+							dirty=Scanner._dirty_positions(lane,indices,mask)
+							# Reading most values of a whole region anyway is faster
+							# without positions. Pages read may only hold changed ones.
+							dirty=None if whole and len(dirty)>=len(indices)//2 else dirty
+					if whole:
+						data=lane.view(mem[base_address])
+						bounds=np.searchsorted(dirty,np.arange(0,len(indices)+chunk,chunk)) if dirty is not None else None
+						tasks+=[(i,base_address,region.values[j:j+chunk],None if dirty is None else dirty[bounds[k]:bounds[k+1]]-j,data,indices[j:j+chunk])
+							for k,j in enumerate(range(0,len(indices),chunk))]
+					else:
+						tasks.append((i,base_address,region.values,dirty,mem,starts,lane.addresses(base_address,indices),lane.type))
+			def refine_chunk(i:int,base_address:int,old:NumpyArray,dirty:NumpyArray|None,*source)->tuple[int,int,NumpyArray,NumpyArray]:
+				if dirty is not None:
+					# Values in unchanged pages keep theirs, only the others are read.
+					keep=np.full(len(old),bool(unchanged))
+					new=old.copy() if unchanged else np.empty_like(old)
+					if len(source)==2:
+						source=(source[0],source[1][dirty])
+					else:
+						source=(source[0],source[1],source[2][dirty],source[3])
+					_,_,keep[dirty],new[dirty]=refine_chunk(i,base_address,old[dirty],None,*source)
+					return i,base_address,keep,new
+				if len(source)==2:
+					data,indices=source
+					new=data[indices]
+					return i,base_address,criterion(old,new,value),new
+				new,found=Scanner.gather(*source)
+				return i,base_address,found&criterion(old,new,value),new
+			for (i,base_address),group in groupby(self._map(refine_chunk,tasks),key=lambda x:x[:2]):
+				parts=list(group)
+				keep=np.concatenate([k for _,_,k,_ in parts])
+				new_values=np.concatenate([n for _,_,_,n in parts])
+				lane_candidates=self.lanes[i].candidates
+				assert lane_candidates is not None
+				candidates[i].add(base_address,lane_candidates[base_address].refine(keep,new_values))
+		return resized
+
+	@staticmethod
+	def _spans(lane:'Scanner.Lane',count:int,changed:list[tuple[int,int]]|None,unchanged:bool|None)->list[tuple[int,int,bool|None]]:
+		"""
+		Split count values of a lane into (start,stop,fill) spans to compare,
+		where fill is None, or the result of spans lying in unchanged pages.
+		Spans start on multiples of 8 so chunk bitmaps can be joined.
+		"""
+		if changed is None:
+			return [(0,count,None)]
+		size=lane.type.size
+		spans:list[tuple[int,int,bool|None]]=[]
+		end=0
+		for first,pages_count in changed:
+			# Values overlapping the changed bytes, widened to multiples of 8.
+			a=max(0,(first*pages.PAGE_SIZE-lane.offset)//size)//8*8
+			b=-(-((first+pages_count)*pages.PAGE_SIZE-lane.offset)//size)
+			b=min(count,-(-b//8)*8)
+			if a>end:
+				spans.append((end,a,unchanged))
+			if b>max(a,end):
+				spans.append((max(a,end),b,None))
+				end=b
+		if end<count:
+			spans.append((end,count,unchanged))
+		return spans
+
+	def _changed_pages(self,base_address:int,raw:bytes|memoryview|None,checksums:dict[int,NumpyArray])->NumpyArray|None:
+		"""
+		Tell which page-sized pieces of a region changed since candidate values
+		were read, from dirty pages or else from page checksums of the whole
+		region raw, which are added to checksums. None if that can't be told.
+		"""
+		if self.dirty is not None:
+			return self.dirty.get(base_address) if self._values_current else None
+		if raw is None or base_address not in self.checksums:
+			return None
+		checksums[base_address]=pages.checksums(raw)
+		previous=self.checksums[base_address]
+		return checksums[base_address]!=previous if len(previous)==len(checksums[base_address]) else None
 
 	@staticmethod
-	def _count_matches(matches:Matches)->int:
-		return sum(len(x) for x in matches.values())
+	def _dirty_positions(lane:'Scanner.Lane',indices:NumpyArray,changed:NumpyArray)->NumpyArray:
+		"""
+		Positions in sorted indices of values overlapping changed page-sized
+		pieces, found by run of changed pieces rather than by value.
+		"""
+		size=lane.type.size
+		runs=np.array(pages.runs(np.flatnonzero(changed)),np.int64).reshape(-1,2)
+		# Values from the first one ending in a run to the last one starting in it.
+		low=np.maximum(0,-(-(runs[:,0]*pages.PAGE_SIZE-lane.offset-size+1)//size))
+		high=-(-((runs[:,0]+runs[:,1])*pages.PAGE_SIZE-lane.offset)//size)
+		first=np.searchsorted(indices,low)
+		counts=np.maximum(np.searchsorted(indices,high)-first,0)
+		return np.repeat(first-np.cumsum(counts)+counts,counts)+np.arange(counts.sum())
+
+	def _close_snapshot(self)->None:
+		if self.snapshot is not None:
+			self.snapshot.close()
+			self.snapshot=None
+
+	def _map(self,function:Callable,tasks:list[tuple])->list:
+		""" Run function over argument tuples, in parallel if there are workers. """
+		if self.workers<=1 or len(tasks)<=1:
+			return [function(*t) for t in tasks]
+		if not self._pool:
+			self._pool=ThreadPoolExecutor(self.workers)
+		return list(self._pool.map(lambda t:function(*t),tasks))
 
 	@staticmethod
-	def _convert(mem:Memory,type:type[Type])->dict:
-		return {k:np.frombuffer(v,type.numpy_type) for k,v in mem.items()}
\ No newline at end of file
+	def _count_bytes(mem:Memory)->int:
+		return sum(len(x) for x in mem.values())
+
+	@staticmethod
+	def _select(lane:'Scanner.Lane',indices:NumpyArray,changed:dict[int,NumpyArray]|None,base_address:int)->NumpyArray:
+		""" Keep indices of values in changed pages, if they are known for the region. """
+		if changed is None or base_address not in changed:
+			return indices
+		return indices[Scanner._dirty_positions(lane,indices,changed[base_address])]
+
+	def _record_checksums(self,items:Iterable[tuple[int,bytes|memoryview]])->Iterator[tuple[int,bytes|memoryview]]:
+		for base_address,raw in items:
+			self.checksums[base_address]=pages.checksums(raw)
+			yield base_address,raw
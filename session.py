@@ -0,0 +1,92 @@
+"""
+Search sessions saved to a NumPy .npz file, so a search can be resumed after
+the scanner exits or the process is closed.
+
+A session holds the lanes searched, the candidates each search step left
+and the region table of the process. Candidates of a step and lane are
+stored as a few arrays: region bases, lengths, whether each region is a
+bitmap, the byte size of its indices or bitmap, then all values and all
+indices or bitmaps joined. Only the last step is read when loading, the
+others when undo gets back to them.
+"""
+import json
+import zipfile
+from typing import Any, TypeAlias
+
+import numpy as np
+
+from candidates import Candidates, RegionCandidates
+from scanner import Scanner
+from system.regions import Region
+
+NumpyArray:TypeAlias=np.ndarray
+
+VERSION=1
+
+def save(path:str,scanner:Scanner,regions:list[Region]|None=None)->None:
+	""" Save steps of a search that has candidates, and the region table. """
+	assert scanner.is_searched()
+	meta={
+		"version":VERSION,
+		"lanes":[[lane.type.code,lane.offset] for lane in scanner.lanes],
+		"steps":[[step.description,step.count] for step in scanner.steps],
+		"regions":[[r.address,r.size,r.kind,r.writable,r.module] for r in regions or []],
+		}
+	arrays:dict[str,NumpyArray]={"meta":np.frombuffer(json.dumps(meta).encode(),np.uint8)}
+	for k,step in enumerate(scanner.steps):
+		for i,(lane,lane_candidates) in enumerate(zip(scanner.lanes,step.candidates())):
+			arrays.update(_step_arrays(f"s{k}l{i}",lane,lane_candidates))
+	with open(path,"wb") as f:
+		np.savez(f,**arrays)
+
+def load(path:str,scanner:Scanner)->list[Region]:
+	"""
+	Resume the search saved in path with scanner. Return the region table of
+	the process it was saved from.
+	Raise OSError or ValueError if the file can't be read.
+	"""
+	try:
+		data=np.load(path)
+		meta=json.loads(data["meta"].tobytes())
+	except (KeyError,TypeError,json.JSONDecodeError,zipfile.BadZipFile) as e:
+		raise ValueError(f"{path} is not a session.") from e
+	if meta.get("version")!=VERSION:
+		raise ValueError(f"{path} has unsupported version {meta.get('version')}.")
+	types={t.code:t for t in Scanner.ALL_TYPES}
+	lanes=[Scanner.Lane(types[code],offset) for code,offset in meta["lanes"]]
+	def loader(k:int):
+		return lambda:[_load_candidates(data,f"s{k}l{i}",lane) for i,lane in enumerate(lanes)]
+	steps=[Scanner.Step(description,count,loader(k)) for k,(description,count) in enumerate(meta["steps"])]
+	scanner.resume(lanes,steps)
+	return [Region(*r) for r in meta["regions"]]
+
+def _load_candidates(data:Any,key:str,lane:Scanner.Lane)->Candidates:
+	bases=data[f"{key}.bases"]
+	lengths=data[f"{key}.lengths"]
+	counts=data[f"{key}.counts"]
+	sizes=data[f"{key}.sizes"]
+	dense=data[f"{key}.dense"]
+	values=data[f"{key}.values"]
+	storage=data[f"{key}.storage"]
+	value_ends=np.cumsum(counts)
+	storage_ends=np.cumsum(sizes)
+	result=Candidates()
+	for j,base in enumerate(bases):
+		region_values=values[value_ends[j]-counts[j]:value_ends[j]]
+		region_storage=storage[storage_ends[j]-sizes[j]:storage_ends[j]]
+		result.add(int(base),RegionCandidates.from_storage(int(lengths[j]),region_values,region_storage,bool(dense[j])))
+	return result
+
+def _step_arrays(key:str,lane:Scanner.Lane,lane_candidates:Candidates)->dict[str,NumpyArray]:
+	bases=sorted(lane_candidates)
+	regions=[lane_candidates[b] for b in bases]
+	storages=[r.storage() for r in regions]
+	return {
+		f"{key}.bases":np.array(bases,np.uint64),
+		f"{key}.lengths":np.array([r.length for r in regions],np.uint64),
+		f"{key}.counts":np.array([r.count for r in regions],np.int64),
+		f"{key}.sizes":np.array([len(st) for st,_ in storages],np.int64),
+		f"{key}.dense":np.array([d for _,d in storages],np.bool_),
+		f"{key}.values":np.concatenate([r.values for r in regions]) if regions else np.empty(0,lane.type.numpy_type),
+		f"{key}.storage":np.concatenate([st for st,_ in storages]) if storages else np.empty(0,np.uint8),
+		}
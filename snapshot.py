@@ -0,0 +1,110 @@
+"""
+On-disk snapshots of process memory.
+
+A file holds raw region data followed by an index and a footer:
+
+	magic | data... | index entries | entry count, index offset | magic
+
+Each index entry is (base address, offset, length, stored length, flags).
+Uncompressed regions are read back through np.memmap, compressed ones are
+inflated one region at a time when accessed.
+"""
+import struct
+import zlib
+from collections.abc import Mapping
+from typing import Iterable, Iterator, TypeAlias
+
+import numpy as np
+
+NumpyArray:TypeAlias=np.ndarray
+
+MAGIC=b"MSSNAP01"
+ENTRY=struct.Struct("<QQQQI4x")
+FOOTER=struct.Struct("<QQ8s")
+ALIGNMENT=64
+COMPRESSED=0x1
+
+class SnapshotWriter:
+	""" Write regions to a snapshot file as they come. """
+	def __init__(self,path:str,compress:bool=False,level:int=1)->None:
+		self.path=path
+		self.compress=compress
+		self.level=level
+		self.entries:list[tuple[int,int,int,int,int]]=[]
+		self.file=open(path,"wb")
+		self.file.write(MAGIC)
+	def __enter__(self)->'SnapshotWriter':
+		return self
+	def __exit__(self,*_)->None:
+		self.close()
+	def add(self,base:int,data:bytes|memoryview)->None:
+		flags=0
+		stored=data
+		if self.compress:
+			packed=zlib.compress(data,self.level)
+			# Keep raw data when it doesn't compress, so it can be mapped.
+			if len(packed)<len(data):
+				stored=packed
+				flags|=COMPRESSED
+		offset=self._align()
+		self.file.write(stored)
+		self.entries.append((base,offset,len(data),len(stored),flags))
+	def close(self)->None:
+		if self.file.closed:
+			return
+		index_offset=self._align()
+		for entry in self.entries:
+			self.file.write(ENTRY.pack(*entry))
+		self.file.write(FOOTER.pack(len(self.entries),index_offset,MAGIC))
+		self.file.close()
+	def _align(self)->int:
+		offset=self.file.tell()
+		padding=-offset%ALIGNMENT
+		self.file.write(bytes(padding))
+		return offset+padding
+
+class Snapshot(Mapping):
+	"""
+	Read-only mapping of base address to region data of a snapshot file.
+	Values are uint8 arrays that np.frombuffer accepts without copying.
+	"""
+	def __init__(self,path:str)->None:
+		self.path=path
+		with open(path,"rb") as f:
+			if f.read(len(MAGIC))!=MAGIC:
+				raise ValueError(f"{path} is not a snapshot.")
+			f.seek(-FOOTER.size,2)
+			count,index_offset,magic=FOOTER.unpack(f.read(FOOTER.size))
+			if magic!=MAGIC:
+				raise ValueError(f"{path} is truncated.")
+			f.seek(index_offset)
+			raw=f.read(count*ENTRY.size)
+		self.index:dict[int,tuple[int,int,int,int]]={}
+		for base,offset,length,stored,flags in ENTRY.iter_unpack(raw):
+			self.index[base]=(offset,length,stored,flags)
+		self._map:NumpyArray|None=np.memmap(path,np.uint8,"r") if index_offset>len(MAGIC) else None
+	def __getitem__(self,base:int)->NumpyArray:
+		offset,length,stored,flags=self.index[base]
+		assert self._map is not None
+		data=self._map[offset:offset+stored]
+		if flags&COMPRESSED:
+			return np.frombuffer(zlib.decompress(data),np.uint8)
+		return data
+	def __iter__(self)->Iterator[int]:
+		return iter(self.index)
+	def __len__(self)->int:
+		return len(self.index)
+	def close(self)->None:
+		self._map=None
+	def nbytes(self)->int:
+		""" Size of region data once uncompressed. """
+		return sum(length for _,length,_,_ in self.index.values())
+	def region_size(self,base:int)->int:
+		return self.index[base][1]
+
+def save(path:str,mem:Iterable[tuple[int,bytes|memoryview]],compress:bool=False)->Snapshot:
+	""" Write (base address,data) items to path and open the result. """
+	with SnapshotWriter(path,compress) as writer:
+		for base,data in mem:
+			writer.add(base,data)
+	return Snapshot(path)
@@ -0,0 +1,153 @@
+"""
+Distribution of the values a search holds, to choose a first search when a
+value isn't known exactly.
+
+Values are those of the start snapshot before the first search, then the
+last seen values of candidates. Each region is reduced to its distinct
+values and their counts, with bincount for 1 and 2 byte types and unique for
+wider ones, spread over threads. Counts of all regions are then merged once,
+and the histogram, most frequent values and estimates of how many values a
+search keeps all come from them without reading values again.
+A sample reads every nth value only, n chosen so about sample values are read.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, NamedTuple, TypeAlias
+
+import numpy as np
+
+import scanner
+from scanner import Scanner
+
+NumpyArray:TypeAlias=np.ndarray
+
+# Values read by default, for all lanes of a type.
+SAMPLE=1<<22
+
+class RegionRange(NamedTuple):
+	base:int
+	count:int
+	minimum:Scanner.SupportedType
+	maximum:Scanner.SupportedType
+
+class Distribution:
+	""" Values of one type: distinct values read and how many times each was. """
+	def __init__(self,stype:type[Scanner.Type],total:int,read:int,values:NumpyArray,counts:NumpyArray,regions:list[RegionRange])->None:
+		self.type=stype
+		self.total=total
+		# Values read, which counts leave floats that aren't finite out of.
+		self.read=read
+		self.values=values
+		self.counts=counts
+		self.count=int(counts.sum())
+		self.regions=regions
+
+	def estimate(self,criterion:scanner.Criterion,value:Any)->int:
+		"""
+		Estimate how many values a search keeps, for criteria that only look at
+		the new value: eq, approx and range.
+		"""
+		assert Distribution.is_estimable(criterion),f"Can't estimate {criterion.__name__} without reading memory again."
+		if not self.read:
+			return 0
+		kept=int(self.counts[criterion(self.values,self.values,value)].sum())
+		return round(kept*self.total/self.read)
+
+	def histogram(self,bins:int=16)->tuple[NumpyArray,NumpyArray]:
+		""" Return counts of values read in bins of equal width, and bin edges. """
+		if not self.count:
+			return np.zeros(bins,np.int64),np.zeros(bins+1)
+		values=self.values.astype(np.float64)
+		low,high=values.min(),values.max()
+		if low==high:
+			return np.histogram(values,bins,weights=self.counts)
+		# Halved, so that the width of bins spanning all floats doesn't overflow.
+		edges=np.linspace(low/2,high/2,bins+1)*2
+		edges[0],edges[-1]=low,high
+		return np.histogram(values,edges,weights=self.counts)
+
+	@staticmethod
+	def is_estimable(criterion:scanner.Criterion)->bool:
+		return criterion in (Scanner.cmp_approx,Scanner.cmp_eq,Scanner.cmp_range)
+
+	def maximum(self)->Scanner.SupportedType|None:
+		return self.values.max().item() if self.count else None
+
+	def minimum(self)->Scanner.SupportedType|None:
+		return self.values.min().item() if self.count else None
+
+	def top(self,k:int=10)->list[tuple[Scanner.SupportedType,int]]:
+		""" Return the k most frequent values read and their counts. """
+		k=min(k,len(self.counts))
+		if k==0:
+			return []
+		best=np.argpartition(self.counts,-k)[-k:]
+		best=best[np.argsort(self.counts[best],kind="stable")[::-1]]
+		return [(self.values[i].item(),int(self.counts[i])) for i in best]
+
+def distributions(s:Scanner,sample:int=SAMPLE)->dict[type[Scanner.Type],Distribution]:
+	"""
+	Return distribution of values by type for a started search, from about
+	sample values of each type or from all of them when sample is 0.
+	"""
+	result={}
+	with ThreadPoolExecutor(s.workers) as pool:
+		for stype in dict.fromkeys(lane.type for lane in s.lanes):
+			regions=[(lane,base,count) for lane in s.lanes if lane.type is stype for base,count in _region_counts(s,lane)]
+			total=sum(count for _,_,count in regions)
+			step=max(1,-(-total//sample)) if sample else 1
+			parts=list(pool.map(lambda r:_reduce(stype,r[1],_region_values(s,r[0],r[1])[::step]),regions))
+			read=sum(n for _,n,_,_ in parts)
+			parts=[p for p in parts if p[0].count]
+			values,counts=_merge(stype,[(v,c) for _,_,v,c in parts])
+			result[stype]=Distribution(stype,total,read,values,counts,sorted((r for r,_,_,_ in parts),key=lambda r:r.base))
+	return result
+
+def _merge(stype:type[Scanner.Type],parts:list[tuple[NumpyArray,NumpyArray]])->tuple[NumpyArray,NumpyArray]:
+	""" Add up counts of distinct values of regions. """
+	if not parts:
+		return np.empty(0,stype.numpy_type),np.empty(0,np.int64)
+	if stype.size<=2:
+		# Counts of every possible value, indexed by the value as unsigned.
+		counts=np.sum([c for _,c in parts],axis=0)
+		indices=np.flatnonzero(counts)
+		return indices.astype(f"u{stype.size}").view(stype.numpy_type),counts[indices]
+	values,inverse=np.unique(np.concatenate([v for v,_ in parts]),return_inverse=True)
+	return values,np.bincount(inverse,np.concatenate([c for _,c in parts])).astype(np.int64)
+
+def _reduce(stype:type[Scanner.Type],base:int,values:NumpyArray)->tuple[RegionRange,int,NumpyArray|None,NumpyArray]:
+	"""
+	Return range of values of a region, how many were read, and its distinct
+	values with their counts, or counts of every possible value for 1 and 2
+	byte types. Floats that aren't finite are left out.
+	"""
+	read=len(values)
+	if np.issubdtype(values.dtype,np.floating):
+		values=values[np.isfinite(values)]
+	if len(values)==0:
+		return RegionRange(base,0,0,0),read,None,np.empty(0,np.int64)
+	region=RegionRange(base,len(values),values.min().item(),values.max().item())
+	if stype.size<=2:
+		# By chunks, bincount converts values to indices first.
+		values=values.view(f"u{stype.size}")
+		counts=np.zeros(1<<8*stype.size,np.int64)
+		for i in range(0,len(values),Scanner.CHUNK_SIZE):
+			counts+=np.bincount(values[i:i+Scanner.CHUNK_SIZE],minlength=len(counts))
+		return region,read,None,counts
+	distinct,counts=np.unique(values,return_counts=True)
+	return region,read,distinct,counts
+
+def _region_counts(s:Scanner,lane:Scanner.Lane)->list[tuple[int,int]]:
+	""" Return base address and number of values of each region of a lane, without reading them. """
+	if s.is_searched():
+		assert lane.candidates is not None
+		return [(base,lane.candidates[base].count) for base in sorted(lane.candidates)]
+	if s.snapshot is not None:
+		return [(base,lane.count(s.snapshot.region_size(base))) for base in sorted(s.snapshot)]
+	return [(base,lane.count(len(raw))) for base,raw in sorted(s.matches.items(),key=lambda item:item[0])]
+
+def _region_values(s:Scanner,lane:Scanner.Lane,base:int)->NumpyArray:
+	""" Return values of a region of a lane, read from a snapshot file if need be. """
+	if s.is_searched():
+		assert lane.candidates is not None
+		return lane.candidates[base].values
+	return lane.view(s.snapshot[base] if s.snapshot is not None else s.matches[base])
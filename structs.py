@@ -0,0 +1,133 @@
+"""
+Struct search: find records where fields at offsets from the record start
+each hold a value, like an Int32 health followed by Float32 x, y and z at +8.
+
+Records start at multiples of the alignment. Each field is read as a view of
+block bytes with the alignment as stride, so one comparison gives a mask over
+every record. Masks of fields are combined, exact values first as they keep
+the fewest records, and once few records are left the remaining fields are
+only compared at those. Blocks are split into chunks of records compared in
+parallel, and records spanning two blocks that follow each other in memory
+are found too.
+"""
+import os
+from collections.abc import Mapping
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Iterable, NamedTuple, TypeAlias
+
+import numpy as np
+
+import scanner
+from scanner import Scanner
+
+NumpyArray:TypeAlias=np.ndarray
+
+class Field(NamedTuple):
+	""" Value of a type at an offset, compared like a search, or any value without a criterion. """
+	offset:int
+	type:type[Scanner.Type]
+	criterion:scanner.Criterion|None=None
+	value:Any=None
+	def __str__(self)->str:
+		s=f"+{self.offset} {self.type.name}"
+		return s+" "+Scanner.describe(self.criterion,self.value) if self.criterion else s
+	def matches(self,values:NumpyArray)->NumpyArray:
+		assert self.criterion
+		return self.criterion(values,values,self.value)
+
+class Struct:
+	""" Fields of a record, which starts at addresses that are a multiple of alignment. """
+	def __init__(self,fields:list[Field],alignment:int=0)->None:
+		"""
+		Alignment defaults to the size of the largest field type. Raise
+		ValueError if no field has a value to compare.
+		"""
+		assert fields and all(f.offset>=0 for f in fields)
+		if not any(f.criterion for f in fields):
+			raise ValueError("Struct has no field with a value.")
+		self.fields=fields
+		self.alignment=alignment or max(f.type.size for f in fields)
+		self.size=max(f.offset+f.type.size for f in fields)
+		# Exact values keep the fewest records, compare them first.
+		self.checks=sorted((f for f in fields if f.criterion),key=lambda f:f.criterion is not Scanner.cmp_eq)
+	def __len__(self)->int:
+		return self.size
+	def __repr__(self)->str:
+		return f"Struct({', '.join(map(str,self.fields))})"
+
+	def count(self,num_bytes:int,first:int=0)->int:
+		""" Number of records that fit in num_bytes, the first one at byte first. """
+		return max(0,(num_bytes-first-self.size)//self.alignment+1)
+
+	def view(self,data:NumpyArray,field:Field,first:int,count:int)->NumpyArray:
+		""" View a field of count records from byte first of data, without copying. """
+		return np.ndarray((count,),field.type.numpy_type,data,first+field.offset,(self.alignment,))
+
+class Matches(NamedTuple):
+	""" Addresses of matching records and values of each field there, in field order. """
+	addresses:NumpyArray
+	values:tuple[NumpyArray,...]
+
+# Records compared per task.
+CHUNK_RECORDS=Scanner.CHUNK_SIZE
+
+def find(raw:bytes|memoryview|NumpyArray,struct:Struct,base_address:int,pool:ThreadPoolExecutor|None=None)->Matches:
+	""" Find records of struct in raw, read from base_address. """
+	data=np.frombuffer(raw,np.uint8)
+	first=-base_address%struct.alignment
+	count=struct.count(len(data),first)
+	chunks=[(lo,min(lo+CHUNK_RECORDS,count)) for lo in range(0,count,CHUNK_RECORDS)]
+	task=lambda chunk:_find_records(data,struct,first,*chunk)
+	found=list(pool.map(task,chunks) if pool and len(chunks)>1 else map(task,chunks))
+	indices=np.concatenate(found) if found else np.empty(0,np.int64)
+	addresses=np.uint64(base_address+first)+indices.astype(np.uint64)*np.uint64(struct.alignment)
+	return Matches(addresses,tuple(struct.view(data,f,first,count)[indices] for f in struct.fields))
+
+def search(mem:scanner.Memory|Iterable[tuple[int,bytes|memoryview]],struct:Struct,workers:int=0)->Matches:
+	"""
+	Find records of struct in memory blocks, or in a stream of them.
+	Return matches sorted by address.
+	"""
+	items=sorted(mem.items(),key=lambda item:item[0]) if isinstance(mem,Mapping) else mem
+	carry=struct.size-1
+	found:list[Matches]=[]
+	tail=b""
+	tail_end=-1
+	with ThreadPoolExecutor(workers or os.cpu_count() or 1) as pool:
+		for base_address,raw in items:
+			if base_address!=tail_end:
+				tail=b""
+			if tail and carry:
+				# Block continues the previous one, only records that start in
+				# the tail and end in this block are new.
+				address=base_address-len(tail)
+				m=find(tail+bytes(raw[:carry]),struct,address)
+				keep=(m.addresses<np.uint64(base_address))&(m.addresses+np.uint64(struct.size)>np.uint64(base_address))
+				found.append(Matches(m.addresses[keep],tuple(v[keep] for v in m.values)))
+			found.append(find(raw,struct,base_address,pool))
+			tail=(tail+bytes(raw[-carry:]))[-carry:] if carry else b""
+			tail_end=base_address+len(raw)
+	if not found:
+		return Matches(np.empty(0,np.uint64),tuple(np.empty(0,f.type.numpy_type) for f in struct.fields))
+	addresses=np.concatenate([m.addresses for m in found])
+	order=np.argsort(addresses,kind="stable")
+	return Matches(addresses[order],tuple(np.concatenate(v)[order] for v in zip(*(m.values for m in found))))
+
+def _find_records(data:NumpyArray,struct:Struct,first:int,lo:int,hi:int)->NumpyArray:
+	""" Return indices of records lo to hi that match. """
+	mask:NumpyArray|None=None
+	positions:NumpyArray|None=None
+	for f in struct.checks:
+		values=struct.view(data,f,first,hi)[lo:]
+		if positions is None:
+			result=f.matches(values)
+			mask=result if mask is None else np.logical_and(mask,result,out=mask)
+			# Few records left, compare the next fields at those only.
+			if np.count_nonzero(mask)*16<len(mask):
+				positions=np.flatnonzero(mask)
+		else:
+			positions=positions[f.matches(values[positions])]
+	if positions is None:
+		assert mask is not None
+		positions=np.flatnonzero(mask)
+	return positions+lo
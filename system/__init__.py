@@ -2,45 +2,192 @@
 Facade to system stuff.
 """
 import sys
+import time
 from dataclasses import dataclass
-from typing import Any, TypeAlias,cast
+from typing import Any, Iterator, TypeAlias,cast
 
-from . import windows
-from .windows import memory, processes, win32
+import pages
+from metrics import METRICS, SIZE_BUCKETS
 
-if not sys.platform.startswith("win"):
+from .arena import Arena
+from .regions import KINDS as REGION_KINDS
+from .regions import Module, Region, RegionFilter
+
+if sys.platform.startswith("win"):
+	from . import windows
+	from .windows import memory, processes, win32
+elif sys.platform.startswith("linux"):
+	from . import linux
+	from .linux import memory, processes
+else:
 	raise ImportError("Sorry, your OS is not supported.")
 
-MemoryBlocks:TypeAlias=dict[int,bytes]
+MemoryBlocks:TypeAlias=dict[int,bytes|memoryview]
+MemoryStream:TypeAlias=Iterator[tuple[int,bytes]]
 Pid:TypeAlias=int
 ProcessHandle:TypeAlias=Any
 
+class DirtyPages:
+	"""
+	Pages a process wrote between reads, from the soft-dirty bits the Linux
+	kernel can keep. Where they aren't available, changes gives None and
+	the scanner compares page checksums instead.
+	"""
+	def __init__(self,handle:ProcessHandle)->None:
+		self.handle=handle
+		self._tracking=False
+	def changes(self,blocks:list[tuple[int,int]])->dict[int,Any]|None:
+		"""
+		Return pages of (address,size) blocks written since the previous call,
+		as a mask per page-sized piece of each block, and track writes again.
+		Call it right before reading memory. None until a previous call
+		started tracking. A write landing between looking at the bits and
+		clearing them is missed, the kernel has no way to do both at once.
+		"""
+		changed=memory.soft_dirty_pages(self.handle,blocks) if self._tracking else None
+		self._tracking=memory.clear_soft_dirty(self.handle)
+		METRICS.count("dirty_pages_queries",source="soft-dirty" if changed is not None else "none")
+		return changed
+
 @dataclass
 class ProcessInfo:
 	name:str
 	pid:Pid
 
+class RegionMap:
+	"""
+	Readable regions of a process, kept between scans. They are queried again
+	when the layout token of the process changes, when a read found a region
+	gone, or after max_age seconds.
+	"""
+	MAX_AGE=30.0
+	def __init__(self,handle:ProcessHandle,region_filter:RegionFilter|None=None,max_age:float=MAX_AGE)->None:
+		self.handle=handle
+		self.filter=region_filter or RegionFilter()
+		self.max_age=max_age
+		self._regions:list[Region]|None=None
+		self._names=False
+		self._token:Any=None
+		self._time=0.0
+	def blocks(self)->list[tuple[int,int]]:
+		""" Return (address,size) blocks to read, as the filter allows. """
+		return self.filter.blocks(self.regions())
+	def invalidate(self)->None:
+		self._regions=None
+	def regions(self,names:bool=False)->list[Region]:
+		"""
+		Return readable regions. Names of the files they map, slow to find on
+		Windows, are only looked up when asked for or when the filter needs them.
+		"""
+		names=names or bool(self.filter.exclude_modules)
+		token=memory.layout_token(self.handle)
+		if self._regions is None or token!=self._token or time.monotonic()-self._time>self.max_age or names and not self._names:
+			with METRICS.timer("region_query_seconds"):
+				self._regions=memory.regions(self.handle,names)
+			self._names=names
+			METRICS.count("region_queries")
+			METRICS.count("regions_queried",len(self._regions))
+			self._token=token
+			self._time=time.monotonic()
+		return self._regions
+
+class ProcessTable:
+	"""
+	Running processes, kept between listings. A refresh only looks up names
+	of PIDs it hasn't seen, or whose start time changed because the PID was
+	reused, which is what makes listing slow on Windows.
+	"""
+	def __init__(self)->None:
+		# Start time and process by PID, with an empty name when it couldn't be found.
+		self._entries:dict[Pid,tuple[int,ProcessInfo]]={}
+	def refresh(self)->dict[Pid,ProcessInfo]:
+		""" Return running processes that have a name, by PID. """
+		entries={}
+		resolved=0
+		for pid,start in processes.process_starts().items():
+			entry=self._entries.get(pid)
+			if entry is None or entry[0]!=start:
+				entry=(start,ProcessInfo(processes.process_name(pid),pid))
+				resolved+=1
+			entries[pid]=entry
+		self._entries=entries
+		METRICS.count("process_lists")
+		METRICS.count("process_names_resolved",resolved)
+		return {pid:info for pid,(_,info) in sorted(entries.items()) if info.name}
+
+_process_table=ProcessTable()
+
 def get_process_list()->dict[Pid,ProcessInfo]:
-	d=windows.processes.processes()
-	d={Pid(k):ProcessInfo(v,k) for k,v in d.items()}
-	return d
+	""" Return running processes by PID, from a table kept between calls. """
+	return _process_table.refresh()
+
+def pids_by_name(name:str,procs:dict[Pid,ProcessInfo])->list[Pid]:
+	""" Get PIDs of processes with a name, with or without extension, ignoring case. """
+	name=name.lower()
+	return [k for k,v in procs.items() if v.name.lower() in (name,name+".exe")]
 
 def memory_write(handle:ProcessHandle,address:int,data:bytes)->bool:
 	return memory.write(data,handle,address)
 
 def process_close(handle:ProcessHandle)->bool:
-	#print(f"win32.CloseProcess({handle})")
-	return windows.win32.CloseHandle(handle)
+	if sys.platform.startswith("win"):
+		#print(f"win32.CloseProcess({handle})")
+		return windows.win32.CloseHandle(handle)
+	return handle.close()
+
+def process_modules(handle:ProcessHandle)->list[Module]:
+	""" Return executable and libraries of a process, sorted by base address. """
+	return memory.modules(handle)
 
 def process_open(pid:Pid)->ProcessHandle:
-	#print(f"win32.OpenProcess({pid})")
-	PROCESS_ALL_ACCESS=0x001F0FFF
-	return windows.win32.OpenProcess(PROCESS_ALL_ACCESS,False,pid)
+	if sys.platform.startswith("win"):
+		#print(f"win32.OpenProcess({pid})")
+		PROCESS_ALL_ACCESS=0x001F0FFF
+		return windows.win32.OpenProcess(PROCESS_ALL_ACCESS,False,pid)
+	return processes.open_process(pid)
+
+def process_read_addresses(handle:ProcessHandle,addresses:Any,size:int,kind:str="sparse")->MemoryBlocks:
+	"""
+	Read only the pages holding values of size bytes at sorted addresses.
+	Nearby addresses are coalesced into page-aligned ranges, the result is
+	keyed by range address. Metrics are labelled with kind, so that polling
+	by watches and freezes can be told apart from searches.
+	"""
+	ranges=pages.coalesce(addresses,size)
+	with METRICS.timer("read_seconds",kind=kind):
+		result=cast(MemoryBlocks,memory.read_ranges(handle,ranges))
+	_count_read(ranges,result,kind)
+	return result
+
+def process_scan_memory(handle:ProcessHandle,arena:Arena|None=None,region_map:RegionMap|None=None)->MemoryBlocks:
+	"""
+	Read regions that the region map lets through, into arena if provided.
+	Without a map, all writable regions are read.
+	"""
+	region_map=region_map or RegionMap(handle)
+	blocks=region_map.blocks()
+	with METRICS.timer("read_seconds",kind="full"):
+		result=cast(MemoryBlocks,memory.scan_memory(handle,blocks,arena))
+	_count_read(blocks,result,"full")
+	if len(result)<len(blocks):
+		region_map.invalidate()
+	return result
+
+def process_stream_memory(handle:ProcessHandle,chunk_size:int=4<<20,region_map:RegionMap|None=None)->MemoryStream:
+	""" Read regions like process_scan_memory, as a stream of (address,data) chunks. """
+	for address,raw in memory.stream_memory(handle,(region_map or RegionMap(handle)).blocks(),chunk_size):
+		METRICS.count("blocks_read",kind="stream")
+		METRICS.count("bytes_read",len(raw),kind="stream")
+		yield address,raw
 
-def process_scan_memory(handle:ProcessHandle)->MemoryBlocks:
-	return cast(MemoryBlocks,memory.scan_memory(handle))
+def _count_read(blocks:list[tuple[int,int]],result:MemoryBlocks,kind:str)->None:
+	read=sum(len(v) for v in result.values())
+	METRICS.count("blocks_read",len(result),kind=kind)
+	METRICS.count("blocks_failed",len(blocks)-len(result),kind=kind)
+	METRICS.count("bytes_read",read,kind=kind)
+	METRICS.observe("read_bytes",read,SIZE_BUCKETS,kind=kind)
 
 def main():
 	print(get_process_list())
 if __name__=="__main__":
-	main()
\ No newline at end of file
+	main()
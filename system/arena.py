@@ -0,0 +1,30 @@
+class Arena:
+	"""
+	Long-lived buffer that regions are read into, reused between scans.
+	Banks are used in turn, so views returned by the previous scan stay valid
+	while the next one is read into another bank.
+	"""
+	def __init__(self,banks:int=2)->None:
+		assert banks>0
+		self.banks:list[bytearray]=[bytearray() for _ in range(banks)]
+		self.bank=0
+		self.used=0
+
+	def allocate(self,size:int)->int:
+		""" Reserve size bytes in the current bank and return their offset. """
+		offset=self.used
+		assert offset+size<=len(self.banks[self.bank]),"Arena is full."
+		self.used+=size
+		return offset
+
+	def begin(self,size:int)->None:
+		""" Switch to the next bank and make room for size bytes. """
+		self.bank=(self.bank+1)%len(self.banks)
+		if len(self.banks[self.bank])<size:
+			# A bytearray with exported views can't be resized, so replace it.
+			# Old views keep the previous buffer alive until they are released.
+			self.banks[self.bank]=bytearray(size+size//8)
+		self.used=0
+
+	def view(self,offset:int,length:int)->memoryview:
+		return memoryview(self.banks[self.bank])[offset:offset+length]
@@ -0,0 +1,40 @@
+import ctypes
+import errno
+from ctypes import POINTER, Structure, c_size_t, c_ssize_t, c_ulong, c_void_p
+
+# Types
+# -----
+
+pid_t=ctypes.c_int
+
+class iovec(Structure):
+	_fields_=[
+		("iov_base",c_void_p),
+		("iov_len",c_size_t)
+	]
+
+# Constants
+# ---------
+
+# Maximum number of iovec elements accepted by a single call.
+IOV_MAX=1024
+
+def ErrorCodeString(error):
+	return errno.errorcode.get(error,str(error))
+
+def PrintLastError(function_name):
+	error=ctypes.get_errno()
+	print(f"{function_name} failed with error {ErrorCodeString(error)}.")
+
+# Functions
+# ---------
+
+_libc=ctypes.CDLL(None,use_errno=True)
+
+process_vm_readv=_libc.process_vm_readv
+process_vm_readv.argtypes=[pid_t,POINTER(iovec),c_ulong,POINTER(iovec),c_ulong,c_ulong]
+process_vm_readv.restype=c_ssize_t
+
+process_vm_writev=_libc.process_vm_writev
+process_vm_writev.argtypes=[pid_t,POINTER(iovec),c_ulong,POINTER(iovec),c_ulong,c_ulong]
+process_vm_writev.restype=c_ssize_t
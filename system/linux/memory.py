@@ -0,0 +1,267 @@
+import errno
+import functools
+import os
+from ctypes import addressof, c_char, get_errno
+from typing import Iterator
+
+import numpy as np
+
+import pages
+from metrics import METRICS
+
+from ..arena import Arena
+from ..regions import IMAGE, MAPPED, PRIVATE, Module, Region
+from .libc import (IOV_MAX, PrintLastError, iovec, process_vm_readv,
+                   process_vm_writev)
+from .processes import Process
+
+# Bytes process_vm_readv transfers at most in a call, INT_MAX rounded down
+# to pages. Iovecs past that are left unread.
+MAX_RW_COUNT=0x7FFFF000
+
+# Pseudo-mappings that can't be read through process_vm_readv.
+SPECIAL_MAPPINGS=("[vvar]","[vvar_vclock]","[vsyscall]")
+
+# Bit of a /proc/<pid>/pagemap entry set when the page was written since
+# soft-dirty bits were last cleared.
+SOFT_DIRTY_BIT=np.uint64(1<<55)
+
+class MapsEntry:
+	""" One line of /proc/<pid>/maps. """
+	def __init__(self,line:str)->None:
+		fields=line.split(maxsplit=5)
+		start,end=fields[0].split("-")
+		self.start=int(start,16)
+		self.end=int(end,16)
+		self.perms=fields[1]
+		self.offset=int(fields[2],16)
+		self.dev=fields[3]
+		self.inode=int(fields[4])
+		self.pathname=fields[5].strip() if len(fields)>5 else ""
+	def __repr__(self)->str:
+		return f"{self.start:x}-{self.end:x} {self.perms} {self.pathname}"
+	@property
+	def size(self)->int:
+		return self.end-self.start
+	def can_read(self)->bool:
+		return self.perms.startswith("r") and self.pathname not in SPECIAL_MAPPINGS
+	def region(self)->Region:
+		""" Private file mappings are taken as images, like libraries are. """
+		if not self.pathname.startswith("/"):
+			kind=PRIVATE
+		else:
+			kind=MAPPED if self.perms[3]=="s" else IMAGE
+		module=os.path.basename(self.pathname) if kind!=PRIVATE else ""
+		return Region(self.start,self.size,kind,self.perms[1]=="w",module)
+
+def layout_token(handle:Process)->int:
+	"""
+	Return a value that changes when mappings are added, removed or resized:
+	the virtual memory size from /proc/<pid>/stat.
+	"""
+	try:
+		with open(f"/proc/{handle.pid}/stat") as f:
+			# Fields follow the name in parentheses, vsize is the 23rd.
+			return int(f.read().rpartition(")")[2].split()[20])
+	except (OSError,IndexError,ValueError):
+		return -1
+
+def maps(handle:Process)->list[MapsEntry]:
+	try:
+		with open(f"/proc/{handle.pid}/maps") as f:
+			return [MapsEntry(line) for line in f]
+	except OSError as e:
+		print(f"Reading maps failed with error {errno.errorcode.get(e.errno or 0,e)}.")
+		return []
+
+def modules(handle:Process)->list[Module]:
+	"""
+	Return images, each spanning all mappings of its file. The anonymous
+	mapping holding .bss isn't included, the kernel merges it with any
+	mapping that happens to follow.
+	"""
+	spans:dict[str,tuple[int,int]]={}
+	for m in maps(handle):
+		if m.region().kind==IMAGE:
+			start,end=spans.get(m.pathname,(m.start,m.end))
+			spans[m.pathname]=(min(start,m.start),max(end,m.end))
+	return sorted((Module(os.path.basename(path),start,end-start) for path,(start,end) in spans.items()),key=lambda x:x.base)
+
+def regions(handle:Process,names:bool=True)->list[Region]:
+	""" Return readable regions. Names of mapped files come with them, whether asked for or not. """
+	return [m.region() for m in maps(handle) if m.can_read()]
+
+def read_regions(handle:Process,blocks:list[tuple[int,int]],buffers:list[bytearray|memoryview])->dict[int,bytearray|memoryview]:
+	"""
+	Read (address,size) blocks into writable buffers with as few
+	process_vm_readv calls as possible.
+	Blocks that can't be read are left out of the result.
+	"""
+	result={}
+	i=0
+	done=0 # Bytes of block i read already.
+	while i<len(blocks):
+		# Unread pieces of blocks from block i on, as many bytes as a call transfers.
+		pieces=[]
+		total=0
+		for j in range(i,min(len(blocks),i+IOV_MAX)):
+			offset=done if j==i else 0
+			length=min(blocks[j][1]-offset,MAX_RW_COUNT-total)
+			pieces.append((j,offset,length))
+			total+=length
+			if total>=MAX_RW_COUNT:
+				break
+		local=(iovec*len(pieces))()
+		remote=(iovec*len(pieces))()
+		for k,(j,offset,length) in enumerate(pieces):
+			local[k].iov_base=addressof((c_char*length).from_buffer(buffers[j],offset))
+			local[k].iov_len=length
+			remote[k].iov_base=blocks[j][0]+offset
+			remote[k].iov_len=length
+		x=process_vm_readv(handle.pid,local,len(pieces),remote,len(pieces),0)
+		if x<0:
+			error=get_errno()
+			METRICS.count("read_failures",error=errno.errorcode.get(error,error))
+			if error in (errno.EPERM,errno.ENOSYS,errno.EACCES):
+				# Not allowed, read the rest through procfs.
+				result.update(_read_regions_procfs(handle,blocks[i:],buffers[i:]))
+				return result
+			if error==errno.ESRCH:
+				PrintLastError("process_vm_readv")
+				return result
+		if x<=0:
+			# First block is unreadable.
+			i+=1
+			done=0
+			continue
+		# A transfer stops at the first page that can't be read, or once it
+		# reaches MAX_RW_COUNT. Go on from there, a page that can't be read
+		# then fails the call and its block is skipped.
+		for j,offset,length in pieces:
+			read=min(x,length)
+			x-=read
+			i,done=j,offset+read
+			if done<blocks[j][1]:
+				break
+			result[blocks[j][0]]=buffers[j]
+			i,done=j+1,0
+	return result
+
+def read_ranges(handle:Process,ranges:list[tuple[int,int]])->dict[int,bytes]:
+	""" Read (address,size) ranges, leaving out those that can't be read. """
+	return dict(read_regions(handle,ranges,[bytearray(size) for _,size in ranges]))
+
+def scan_memory(handle:Process,blocks:list[tuple[int,int]],arena:Arena|None=None)->dict[int,bytes|memoryview]:
+	"""
+	Read (address,size) blocks.
+	With an arena, blocks are read into its next bank and the result holds
+	views into it.
+	"""
+	if not arena:
+		return dict(read_regions(handle,blocks,[bytearray(size) for _,size in blocks]))
+	arena.begin(sum(size for _,size in blocks))
+	offsets=[arena.allocate(size) for _,size in blocks]
+	buffers=[arena.view(offset,size) for offset,(_,size) in zip(offsets,blocks)]
+	return read_regions(handle,blocks,buffers)
+
+def clear_soft_dirty(handle:Process)->bool:
+	""" Start tracking writes to the pages of a process, tell if it can be done. """
+	if not soft_dirty_supported():
+		return False
+	try:
+		with open(f"/proc/{handle.pid}/clear_refs","w") as f:
+			f.write("4")
+		return True
+	except OSError:
+		return False
+
+def soft_dirty_pages(handle:Process,blocks:list[tuple[int,int]])->dict[int,np.ndarray]|None:
+	"""
+	Tell which pages of (address,size) blocks were written since soft-dirty
+	bits were cleared, as a mask per page-sized piece from each block address.
+	Return None if pagemap can't be read.
+	"""
+	result={}
+	entry_size=SOFT_DIRTY_BIT.itemsize
+	try:
+		with open(f"/proc/{handle.pid}/pagemap","rb") as f:
+			for address,size in blocks:
+				first=address//pages.PAGE_SIZE
+				last=(address+size-1)//pages.PAGE_SIZE
+				f.seek(first*entry_size)
+				entries=np.frombuffer(f.read((last-first+1)*entry_size),np.uint64)
+				if len(entries)!=last-first+1:
+					return None
+				dirty=(entries&SOFT_DIRTY_BIT)!=0
+				# Pieces of unaligned blocks straddle two pages.
+				starts=(address%pages.PAGE_SIZE+np.arange(0,size,pages.PAGE_SIZE))//pages.PAGE_SIZE
+				ends=np.minimum(starts+int(address%pages.PAGE_SIZE!=0),len(dirty)-1)
+				result[address]=dirty[starts]|dirty[ends]
+	except OSError:
+		return None
+	return result
+
+@functools.cache
+def soft_dirty_supported()->bool:
+	""" Tell if the kernel keeps soft-dirty bits: a page just written has it. """
+	page=np.ones(2*pages.PAGE_SIZE,np.uint8)
+	address=-(-page.ctypes.data//pages.PAGE_SIZE)*pages.PAGE_SIZE
+	try:
+		with open("/proc/self/pagemap","rb") as f:
+			f.seek(address//pages.PAGE_SIZE*SOFT_DIRTY_BIT.itemsize)
+			entry=np.frombuffer(f.read(SOFT_DIRTY_BIT.itemsize),np.uint64)
+	except OSError:
+		return False
+	return len(entry)==1 and bool(entry[0]&SOFT_DIRTY_BIT)
+
+def stream_memory(handle:Process,blocks:list[tuple[int,int]],chunk_size:int)->Iterator[tuple[int,bytes]]:
+	"""
+	Read (address,size) blocks in chunks of at most chunk_size bytes, yielding
+	(address,data) as each batch of chunks is read.
+	"""
+	batch:list[tuple[int,int]]=[]
+	batch_size=0
+	for address,size in pages.split(blocks,chunk_size):
+		if batch and (batch_size+size>chunk_size or len(batch)==IOV_MAX):
+			yield from read_ranges(handle,batch).items()
+			batch=[]
+			batch_size=0
+		batch.append((address,size))
+		batch_size+=size
+	if batch:
+		yield from read_ranges(handle,batch).items()
+
+def write(data:bytes,handle:Process,address:int)->bool:
+	buffer=bytearray(data)
+	local=iovec(addressof((c_char*len(buffer)).from_buffer(buffer)),len(buffer))
+	remote=iovec(address,len(buffer))
+	x=process_vm_writev(handle.pid,local,1,remote,1,0)
+	if x==len(buffer):
+		return True
+	if x<0 and get_errno() not in (errno.EPERM,errno.ENOSYS,errno.EACCES):
+		PrintLastError("process_vm_writev")
+		return False
+	# Fall back to procfs, which can also write to read-only pages.
+	try:
+		f=handle.mem_file()
+		f.seek(address)
+		return f.write(data)==len(data)
+	except OSError as e:
+		print(f"Writing /proc/{handle.pid}/mem failed with error {errno.errorcode.get(e.errno or 0,e)}.")
+		return False
+
+def _read_regions_procfs(handle:Process,blocks:list[tuple[int,int]],buffers:list[bytearray|memoryview])->dict[int,bytearray|memoryview]:
+	result={}
+	try:
+		f=handle.mem_file()
+	except OSError as e:
+		print(f"Opening /proc/{handle.pid}/mem failed with error {errno.errorcode.get(e.errno or 0,e)}.")
+		return result
+	for (address,size),buffer in zip(blocks,buffers):
+		try:
+			f.seek(address)
+			if f.readinto(buffer)==size:
+				result[address]=buffer
+		except OSError as e:
+			METRICS.count("read_failures",error=errno.errorcode.get(e.errno or 0,e.errno))
+	return result
@@ -0,0 +1,56 @@
+import os
+from typing import BinaryIO
+
+
+class Process:
+	"""
+	Handle to a process opened through procfs.
+	The /proc/<pid>/mem file is only opened when process_vm_readv and
+	process_vm_writev are not allowed.
+	"""
+	def __init__(self,pid:int)->None:
+		self.pid=pid
+		self.mem:BinaryIO|None=None
+	def __repr__(self)->str:
+		return f"Process({self.pid})"
+	def close(self)->bool:
+		if self.mem:
+			self.mem.close()
+			self.mem=None
+		return True
+	def mem_file(self)->BinaryIO:
+		if not self.mem:
+			self.mem=open(f"/proc/{self.pid}/mem","r+b",buffering=0)
+		return self.mem
+
+def open_process(pid:int)->Process|None:
+	""" Return a handle or None if the process memory map can't be read. """
+	if not os.access(f"/proc/{pid}/maps",os.R_OK):
+		return None
+	return Process(pid)
+
+def process_name(pid:int)->str:
+	""" Return executable name or empty string if unavailable. """
+	try:
+		with open(f"/proc/{pid}/comm") as f:
+			return f.read().rstrip("\n")
+	except OSError:
+		return ""
+
+def process_starts()->dict[int,int]:
+	"""
+	Return start times of running processes by PID, in clock ticks since boot,
+	so that a PID reused by another process can be told apart. One pass over
+	/proc reading each stat file.
+	"""
+	result={}
+	for p in os.listdir("/proc"):
+		if not p.isdigit():
+			continue
+		try:
+			with open(f"/proc/{p}/stat") as f:
+				# Fields after the name, which may hold spaces and parentheses.
+				result[int(p)]=int(f.read().rpartition(")")[2].split()[19])
+		except OSError:
+			continue
+	return result
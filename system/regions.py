@@ -0,0 +1,75 @@
+"""
+Memory regions of a process, independent of the OS, and which ones to scan.
+"""
+from dataclasses import dataclass, field
+
+# Kinds of regions.
+IMAGE="image" # Executable or library.
+MAPPED="mapped" # Shared mapping of a file or section.
+PRIVATE="private" # Heap, stack and other memory of the process itself.
+KINDS=(IMAGE,MAPPED,PRIVATE)
+
+@dataclass
+class Region:
+	""" Readable region. Module is the file name a region maps, if any. """
+	address:int
+	size:int
+	kind:str
+	writable:bool
+	module:str=""
+	@property
+	def end(self)->int:
+		return self.address+self.size
+
+@dataclass
+class Module:
+	""" Executable or library loaded in a process. """
+	name:str
+	base:int
+	size:int
+	@property
+	def end(self)->int:
+		return self.base+self.size
+
+@dataclass
+class RegionFilter:
+	"""
+	Which regions to scan. Empty kinds or ranges mean all of them, ranges are
+	(low,high) addresses that regions get clipped to.
+	"""
+	kinds:set[str]=field(default_factory=set)
+	writable_only:bool=True
+	ranges:list[tuple[int,int]]=field(default_factory=list)
+	min_size:int=0
+	max_size:int=0
+	exclude_modules:set[str]=field(default_factory=set)
+
+	def __str__(self)->str:
+		s=f"types {', '.join(sorted(self.kinds)) or 'all'}, {'writable only' if self.writable_only else 'any protection'}"
+		if self.min_size or self.max_size:
+			s+=f", size {self.min_size} to {self.max_size or 'any'}"
+		if self.ranges:
+			s+=", ranges "+", ".join(f"{low:#x}-{high:#x}" for low,high in self.ranges)
+		if self.exclude_modules:
+			s+=", excluding "+", ".join(sorted(self.exclude_modules))
+		return s
+
+	def accepts(self,region:Region)->bool:
+		return (not self.kinds or region.kind in self.kinds)\
+			and (region.writable or not self.writable_only)\
+			and region.size>=self.min_size\
+			and (not self.max_size or region.size<=self.max_size)\
+			and region.module.lower() not in self.exclude_modules
+
+	def blocks(self,regions:list[Region])->list[tuple[int,int]]:
+		""" Return (address,size) blocks to read from accepted regions. """
+		accepted=[(r.address,r.end) for r in regions if self.accepts(r)]
+		if not self.ranges:
+			return [(a,b-a) for a,b in accepted]
+		result=[]
+		for a,b in accepted:
+			for low,high in self.ranges:
+				start,end=max(a,low),min(b,high)
+				if start<end:
+					result.append((start,end-start))
+		return sorted(set(result))
@@ -1,33 +1,131 @@
-from ctypes import byref, create_string_buffer, sizeof
-from ctypes.wintypes import HANDLE, LPCVOID
+import ntpath
+from ctypes import (byref, c_char, create_string_buffer,
+                    create_unicode_buffer, sizeof)
+from ctypes.wintypes import DWORD, HANDLE, HMODULE, LPCVOID
+from typing import Iterator
 
-from .win32 import (MEMORY_BASIC_INFORMATION, SIZE_T, PrintLastError,
-                    ReadProcessMemory, VirtualQueryEx, WriteProcessMemory)
+import numpy as np
 
+import pages
+from metrics import METRICS
 
-def scan_memory(handle:HANDLE)->dict[int,bytes]:
-	mem_info=MEMORY_BASIC_INFORMATION()
-	addr=0
+from ..arena import Arena
+from ..regions import IMAGE, MAPPED, PRIVATE, Module, Region
+from .win32 import (LIST_MODULES_ALL, MEM_IMAGE, MEM_MAPPED,
+                    MEMORY_BASIC_INFORMATION, MODULEINFO,
+                    SIZE_T, EnumProcessModulesEx, GetLastError,
+                    GetMappedFileName, GetModuleBaseName, GetModuleInformation,
+                    PrintLastError, ReadProcessMemory, VirtualQueryEx,
+                    WriteProcessMemory)
+
+
+
+def read_ranges(handle:HANDLE,ranges:list[tuple[int,int]])->dict[int,bytes]:
+	""" Read (address,size) ranges, leaving out those that can't be read. """
 	result={}
+	for address,size in ranges:
+		buffer=create_string_buffer(size)
+		size_read=SIZE_T()
+		if ReadProcessMemory(handle,address,byref(buffer),size,byref(size_read)):
+			result[address]=buffer.raw
+	return result
+
+def clear_soft_dirty(handle:HANDLE)->bool:
+	""" Windows only tracks writes of the calling process, GetWriteWatch can't be used. """
+	return False
+
+def layout_token(handle:HANDLE)->int:
+	"""
+	Return a value that changes when modules are loaded or unloaded: the
+	size of the module list. Windows has no cheap way to tell that other
+	regions changed, those are found again when a read fails or the map
+	gets old.
+	"""
+	needed=DWORD()
+	if not EnumProcessModulesEx(handle,None,0,byref(needed),LIST_MODULES_ALL):
+		return -1
+	return needed.value
+
+def mapped_file_name(handle:HANDLE,address:int)->str:
+	""" Return file name of an image or mapped region. """
+	name=create_unicode_buffer(1024)
+	if not GetMappedFileName(handle,address,name,len(name)):
+		return ""
+	return ntpath.basename(name.value)
+
+def modules(handle:HANDLE)->list[Module]:
+	""" Return loaded executable and libraries. """
+	needed=DWORD()
+	handles=(HMODULE*1024)()
+	while True:
+		if not EnumProcessModulesEx(handle,handles,sizeof(handles),byref(needed),LIST_MODULES_ALL):
+			PrintLastError("EnumProcessModulesEx")
+			return []
+		if needed.value<=sizeof(handles):
+			break
+		handles=(HMODULE*(needed.value//sizeof(HMODULE)))()
+	result=[]
+	for hmodule in handles[:needed.value//sizeof(HMODULE)]:
+		info=MODULEINFO()
+		name=create_unicode_buffer(260)
+		if GetModuleInformation(handle,hmodule,byref(info),sizeof(info)) and GetModuleBaseName(handle,hmodule,name,len(name)):
+			result.append(Module(name.value,info.lpBaseOfDll or 0,info.SizeOfImage))
+	return sorted(result,key=lambda x:x.base)
+
+def regions(handle:HANDLE,names:bool=True)->list[Region]:
+	""" Return readable regions, with the files they map only if names is set. """
+	result=[]
+	addr=0
 	while addr<0x7FFFFFFFFFF:
+		mem_info=MEMORY_BASIC_INFORMATION()
 		x=VirtualQueryEx(handle,addr,byref(mem_info),sizeof(mem_info))
 		if x>0:
 			addr=(mem_info.BaseAddress or 0)+mem_info.RegionSize
 			if mem_info.can_read():
-				buffer=create_string_buffer(mem_info.RegionSize)
-				size_read=SIZE_T()
-				x=ReadProcessMemory(handle,mem_info.BaseAddress,byref(buffer),mem_info.RegionSize,byref(size_read))
-				if x:
-					#print(f"Read {size_read.value} bytes.")
-					result[mem_info.BaseAddress]=buffer.raw
-				else:
-					PrintLastError("ReadProcessMemory")
+				kind=IMAGE if mem_info.Type==MEM_IMAGE else MAPPED if mem_info.Type==MEM_MAPPED else PRIVATE
+				module=mapped_file_name(handle,mem_info.BaseAddress) if names and kind!=PRIVATE else ""
+				result.append(Region(mem_info.BaseAddress,mem_info.RegionSize,kind,mem_info.is_writable(),module))
 		else:
 			PrintLastError("VirtualQueryEx")
 			break
 	return result
 
+def scan_memory(handle:HANDLE,blocks:list[tuple[int,int]],arena:Arena|None=None)->dict[int,bytes|memoryview]:
+	"""
+	Read (address,size) blocks.
+	With an arena, blocks are read into its next bank and the result holds
+	views into it.
+	"""
+	if arena:
+		arena.begin(sum(size for _,size in blocks))
+	result={}
+	for address,size in blocks:
+		size_read=SIZE_T()
+		if arena:
+			offset=arena.allocate(size)
+			buffer=(c_char*size).from_buffer(arena.banks[arena.bank],offset)
+		else:
+			buffer=create_string_buffer(size)
+		x=ReadProcessMemory(handle,address,byref(buffer),size,byref(size_read))
+		if x:
+			#print(f"Read {size_read.value} bytes.")
+			if arena:
+				result[address]=arena.view(offset,size)
+			else:
+				result[address]=buffer.raw
+		else:
+			METRICS.count("read_failures",error=GetLastError())
+			PrintLastError("ReadProcessMemory")
+	return result
+
+def soft_dirty_pages(handle:HANDLE,blocks:list[tuple[int,int]])->dict[int,np.ndarray]|None:
+	return None
+
+def stream_memory(handle:HANDLE,blocks:list[tuple[int,int]],chunk_size:int)->Iterator[tuple[int,bytes]]:
+	""" Read (address,size) blocks in chunks of at most chunk_size bytes. """
+	for address,size in pages.split(blocks,chunk_size):
+		yield from read_ranges(handle,[(address,size)]).items()
+
 def write(data:bytes,handle:HANDLE,address:LPCVOID|int)->bool:
 	size_written=SIZE_T()
 	return WriteProcessMemory(handle,address,data,len(data),size_written)
-
@@ -1,56 +1,83 @@
 import ctypes
 from ctypes import sizeof
-from ctypes.wintypes import DWORD, HANDLE, HMODULE, WCHAR
+from ctypes.wintypes import DWORD, FILETIME, HANDLE, HMODULE, WCHAR
 
-from .win32 import (CloseHandle, EnumProcesses, EnumProcessModulesEx,
-                    GetModuleBaseName, GetProcessImageFileNameA, OpenProcess,
+from .win32 import (PROCESS_QUERY_LIMITED_INFORMATION, CloseHandle,
+                    EnumProcesses, EnumProcessModulesEx, GetModuleBaseName,
+                    GetProcessImageFileNameA, GetProcessTimes, OpenProcess,
                     PrintLastError)
 
 
-def get_all_process_ids()->tuple[int]:
+def get_all_process_ids()->tuple[int,...]:
 	"""
 	Return list of running processes PIDs.
+	The buffer grows until EnumProcesses leaves some of it unused, since a
+	full buffer may have been cut short.
 	"""
-	buffer=(DWORD*1024)()
-	size_used=DWORD()
-	ok=EnumProcesses(buffer,len(buffer),size_used)
-	if not ok:
-		PrintLastError("EnumProcesses")
-		return tuple()
-	count=size_used.value//ctypes.sizeof(DWORD)
-	return tuple(buffer[:count])
+	count=1024
+	while True:
+		buffer=(DWORD*count)()
+		size_used=DWORD()
+		ok=EnumProcesses(buffer,sizeof(buffer),size_used)
+		if not ok:
+			PrintLastError("EnumProcesses")
+			return tuple()
+		if size_used.value<sizeof(buffer):
+			return tuple(buffer[:size_used.value//sizeof(DWORD)])
+		count*=2
+
+def process_start_time(pid:int)->int|None:
+	""" Return creation time of a process in 100 ns units, None if it can't be opened. """
+	hprocess=OpenProcess(PROCESS_QUERY_LIMITED_INFORMATION,False,pid)
+	if not hprocess:
+		return None
+	creation,exit_time,kernel,user=FILETIME(),FILETIME(),FILETIME(),FILETIME()
+	ok=GetProcessTimes(hprocess,creation,exit_time,kernel,user)
+	CloseHandle(hprocess)
+	return creation.dwHighDateTime<<32|creation.dwLowDateTime if ok else None
+
+def process_starts()->dict[int,int]:
+	"""
+	Return start times of running processes by PID, so that a PID reused by
+	another process can be told apart.
+	"""
+	result={}
+	for p in get_all_process_ids():
+		start=process_start_time(p)
+		if start is not None:
+			result[p]=start
+	return result
 
 # https://docs.microsoft.com/en-us/windows/win32/psapi/enumerating-all-processes
+def process_name(pid:int)->str:
+	""" Return executable name or empty string if unavailable. """
+	szprocessname=ctypes.create_unicode_buffer(256)
+	hprocess=OpenProcess(0x410,False,pid)
+	if hprocess:
+		hmod=HMODULE()
+		cbneeded=DWORD()
+		if EnumProcessModulesEx(hprocess,hmod,sizeof(hmod),cbneeded,0x00):
+			nsize=DWORD(sizeof(szprocessname)//sizeof(WCHAR))
+			returned_size=GetModuleBaseName(hprocess,hmod,szprocessname,nsize)
+			if returned_size==0:
+				PrintLastError("GetModuleBaseName")
+		else:
+			PrintLastError("EnumProcessModulesEx")
+		if not CloseHandle(hprocess):
+			PrintLastError("CloseHandle")
+	else:
+		# OpenProcess is expected to fail for some PIDs.
+		# PrintLastError("OpenProcess")
+		return ""
+	return szprocessname.value
+
 def processes()->dict[int,str]:
 	"""
 	Return running processes as a dictionary where keys are PIDs and values are
 	process names.
 	"""
-	def process_name(pid:int)->str:
-		szprocessname=ctypes.create_unicode_buffer(256)
-		hprocess=OpenProcess(0x410,False,pid)
-		if hprocess:
-			hmod=HMODULE()
-			cbneeded=DWORD()
-			if EnumProcessModulesEx(hprocess,hmod,sizeof(hmod),cbneeded,0x00):
-				nsize=DWORD(sizeof(szprocessname)//sizeof(WCHAR))
-				returned_size=GetModuleBaseName(hprocess,hmod,szprocessname,nsize)
-				if returned_size==0:
-					PrintLastError("GetModuleBaseName")
-			else:
-				PrintLastError("EnumProcessModulesEx")
-			if not CloseHandle(hprocess):
-				PrintLastError("CloseHandle")
-		else:
-			# OpenProcess is expected to fail for some PIDs.
-			# PrintLastError("OpenProcess")
-			return ""
-		return szprocessname.value
-	pids=get_all_process_ids()
-	if not pids:
-		return dict()
 	result={}
-	for p in pids:
+	for p in get_all_process_ids():
 		name=process_name(p)
 		if name:
 			result[p]=name
@@ -74,7 +101,7 @@ def print_processes()->None:
 	for k,v in sorted(processes().items()):
 		print(f"{k}: '{v}'")
 
-def process_name(handle:HANDLE)->str:
+def process_image_file_name(handle:HANDLE)->str:
 	name=ctypes.create_string_buffer(256)
 	string_length=GetProcessImageFileNameA(handle,name,256)
 	return name.value.decode('ansi')
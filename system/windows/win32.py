@@ -1,7 +1,7 @@
 from ctypes import (POINTER, WINFUNCTYPE, GetLastError, Structure, c_ulonglong,
                     c_void_p, windll)
-from ctypes.wintypes import (BOOL, DWORD, HANDLE, HMODULE, LPCVOID, LPDWORD,
-                             LPSTR, LPVOID, LPWSTR, WORD)
+from ctypes.wintypes import (BOOL, DWORD, FILETIME, HANDLE, HMODULE, LPCVOID,
+                             LPDWORD, LPSTR, LPVOID, LPWSTR, WORD)
 
 # Types
 # -----
@@ -41,10 +41,20 @@ class MEMORY_BASIC_INFORMATION(Structure):
 		return s
 
 	def can_read(self)->bool:
-		return self.AllocationProtect==0x04 and self.Protect!=0x01 and self.Protect!=0
+		""" Committed with a readable protection, not a guard page. """
+		return self.State==MEM_COMMIT and (self.Protect&0xFF) in PAGE_READABLE and not self.Protect&PAGE_GUARD
+	def is_writable(self)->bool:
+		return bool(self.Protect&(PAGE_READWRITE|PAGE_WRITECOPY|PAGE_EXECUTE_READWRITE|PAGE_EXECUTE_WRITECOPY))
 
 PMEMORY_BASIC_INFORMATION=POINTER(MEMORY_BASIC_INFORMATION)
 
+class MODULEINFO(Structure):
+	_fields_=[
+		("lpBaseOfDll",PVOID),
+		("SizeOfImage",DWORD),
+		("EntryPoint",PVOID)
+	]
+
 # Constants
 # ---------
 
@@ -77,6 +87,26 @@ def MemoryProtectionConstantString(value):
 			str(value)
 
 PROCESS_ALL_ACCESS=0x001F0FFF
+PROCESS_QUERY_LIMITED_INFORMATION=0x1000
+
+MEM_COMMIT=0x1000
+MEM_IMAGE=0x1000000
+MEM_MAPPED=0x40000
+MEM_PRIVATE=0x20000
+
+LIST_MODULES_ALL=0x03
+
+PAGE_NOACCESS=0x01
+PAGE_READONLY=0x02
+PAGE_READWRITE=0x04
+PAGE_WRITECOPY=0x08
+PAGE_EXECUTE=0x10
+PAGE_EXECUTE_READ=0x20
+PAGE_EXECUTE_READWRITE=0x40
+PAGE_EXECUTE_WRITECOPY=0x80
+PAGE_GUARD=0x100
+# Execute-only pages can't be read by ReadProcessMemory.
+PAGE_READABLE=(PAGE_READONLY,PAGE_READWRITE,PAGE_WRITECOPY,PAGE_EXECUTE_READ,PAGE_EXECUTE_READWRITE,PAGE_EXECUTE_WRITECOPY)
 
 # Functions
 # ---------
@@ -92,10 +122,16 @@ EnumProcesses=WINFUNCTYPE(DWORD,POINTER(DWORD),DWORD,LPDWORD)(("EnumProcesses",w
 ((1,"lpidProcess"),(1,"cb"),(1,"lpcbNeeded")))
 EnumProcessModulesEx=WINFUNCTYPE(BOOL,HANDLE,POINTER(HMODULE),DWORD,LPDWORD,DWORD)(("EnumProcessModulesEx",windll.psapi),
 ((1,"hProcess"),(1,"lphModule"),(1,"cb"),(1,"lpcbNeeded"),(1,"dwFilterFlag")))
+GetMappedFileName=WINFUNCTYPE(DWORD,HANDLE,LPVOID,LPWSTR,DWORD)(("GetMappedFileNameW",windll.psapi),
+((1,"hProcess"),(1,"lpv"),(1,"lpFilename"),(1,"nSize")))
+GetModuleInformation=WINFUNCTYPE(BOOL,HANDLE,HMODULE,POINTER(MODULEINFO),DWORD)(("GetModuleInformation",windll.psapi),
+((1,"hProcess"),(1,"hModule"),(1,"lpmodinfo"),(1,"cb")))
 GetModuleBaseName=WINFUNCTYPE(DWORD,HANDLE,HMODULE,LPWSTR,DWORD)(("GetModuleBaseNameW",windll.psapi),
 ((1,"hProcess"),(1,"hModule"),(1,"lpBaseName"),(1,"nSize")))
 GetProcessImageFileNameA=WINFUNCTYPE(DWORD,HANDLE,LPSTR,DWORD)(("GetProcessImageFileNameA",windll.psapi),
 ((1,"hProcess"),(1,"lpImageFileName"),(1,"nSize")))
+GetProcessTimes=WINFUNCTYPE(BOOL,HANDLE,POINTER(FILETIME),POINTER(FILETIME),POINTER(FILETIME),POINTER(FILETIME))(("GetProcessTimes",windll.kernel32),
+((1,"hProcess"),(1,"lpCreationTime"),(1,"lpExitTime"),(1,"lpKernelTime"),(1,"lpUserTime")))
 OpenProcess=WINFUNCTYPE(HANDLE,DWORD,BOOL,DWORD)(("OpenProcess",windll.kernel32),
 ((1,"dwDesiredAccess"),(1,"bInheritHandle"),(1,"dwProcessId")))
 ReadProcessMemory=WINFUNCTYPE(BOOL, HANDLE,LPCVOID,LPVOID,SIZE_T,POINTER(SIZE_T))(("ReadProcessMemory",windll.kernel32),
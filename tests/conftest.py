@@ -0,0 +1,81 @@
+"""
+Fixtures for tests against a child process, which holds a mapping of known
+Int32 values and writes more when asked.
+"""
+import os
+import subprocess
+import sys
+from typing import Iterator
+
+import pytest
+
+sys.path.insert(0,os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import system
+from interface import Interface
+
+# Child process: maps pages holding value i%1000 at element i, prints the
+# mapping address, then writes "offset value" lines as Int32 and answers ok.
+CHILD="""
+import array,ctypes,mmap,struct,sys
+size=int(sys.argv[1])
+m=mmap.mmap(-1,size)
+m[:]=array.array("i",(i%1000 for i in range(size//4))).tobytes()
+print(ctypes.addressof(ctypes.c_char.from_buffer(m)),flush=True)
+for line in sys.stdin:
+	offset,value=map(int,line.split())
+	struct.pack_into("<i",m,offset,value)
+	print("ok",flush=True)
+"""
+
+class Target:
+	""" A child process and a handle opened on it. """
+	SIZE=64*4096
+	def __init__(self)->None:
+		self.process=subprocess.Popen([sys.executable,"-c",CHILD,str(Target.SIZE)],stdin=subprocess.PIPE,stdout=subprocess.PIPE,text=True)
+		assert self.process.stdout
+		self.pid=self.process.pid
+		self.address=int(self.process.stdout.readline())
+		self.handle=system.process_open(self.pid)
+		assert self.handle,"Can't open the child process, is ptrace allowed?"
+	def close(self)->None:
+		system.process_close(self.handle)
+		self.process.kill()
+		self.process.wait()
+	def region_filter(self)->system.RegionFilter:
+		""" Filter that only lets the mapping of known values through. """
+		return system.RegionFilter(ranges=[(self.address,self.address+Target.SIZE)])
+	def region_map(self)->system.RegionMap:
+		return system.RegionMap(self.handle,self.region_filter())
+	def write(self,offset:int,value:int)->None:
+		""" Have the child write a value at an offset of the mapping. """
+		assert self.process.stdin and self.process.stdout
+		self.process.stdin.write(f"{offset} {value}\n")
+		self.process.stdin.flush()
+		assert self.process.stdout.readline().strip()=="ok"
+
+@pytest.fixture
+def target()->Iterator[Target]:
+	t=Target()
+	try:
+		yield t
+	finally:
+		t.close()
+
+@pytest.fixture
+def interface(target:Target)->Iterator[Interface]:
+	""" Console opened on the target, scanning its mapping only. """
+	i=Interface()
+	i.region_filter=target.region_filter()
+	i.handle=target.handle
+	i.procinfo=system.ProcessInfo("python",target.pid)
+	try:
+		yield i
+	finally:
+		i.watches.stop()
+		i.frozen.stop()
+		i.handle=None
+
+def run(interface:Interface,line:str)->None:
+	""" Run a console command. """
+	interface._command(line)
@@ -0,0 +1,35 @@
+import io
+import json
+
+import pytest
+
+import api
+from conftest import Target
+from scanner import Scanner
+
+def test_run_script(target:Target,monkeypatch:pytest.MonkeyPatch):
+	# Whole regions are read, and read ahead for each next search.
+	monkeypatch.setattr(Scanner,"SPARSE_READ_LIMIT",0)
+	out=io.StringIO()
+	session=api.Session(2,target.region_filter())
+	script=[f"open {target.pid}","start int","in 20 21","==","!=","matches"]
+	assert api.run_script(script,out,session)
+	results=[json.loads(line)["result"] for line in out.getvalue().splitlines()]
+	assert results[1]["count"]==Target.SIZE//4
+	assert results[2]["count"]==results[3]["count"]==2*len(range(20,Target.SIZE//4,1000))
+	assert results[4]["count"]==0
+
+def test_session(target:Target):
+	with api.Session(2,target.region_filter()) as s:
+		s.open(target.pid)
+		with pytest.raises(RuntimeError):
+			s.refine("eq",1)
+		s.start("int")
+		assert s.refine("eq",123).count==len(range(123,Target.SIZE//4,1000))
+		address=s.matches()[0].address
+		assert s.write(address,124)
+		assert s.read(address)==124
+		result=s.refine("+=",1)
+		assert [m.address for m in result.matches]==[address]
+		with pytest.raises(OverflowError):
+			s.write(address,1<<40)
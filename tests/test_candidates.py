@@ -0,0 +1,60 @@
+import numpy as np
+import pytest
+
+from candidates import Candidates, RegionCandidates, bytes_per_candidate
+
+def region(length:int,indices:list[int])->RegionCandidates:
+	return RegionCandidates.from_indices(length,np.array(indices,np.int64),np.array(indices,np.int32)*10)
+
+def test_sparse_and_dense():
+	sparse=region(1024,[3,500])
+	assert sparse.storage()[1] is False
+	assert sparse.nbytes()==2*4+2*4
+	dense=region(64,list(range(0,64,2)))
+	assert dense.storage()[1] is True
+	assert dense.nbytes()==64//8+32*4
+	assert list(dense.indices())==list(range(0,64,2))
+
+@pytest.mark.parametrize("mask_every",[1,3,97])
+def test_from_mask(mask_every:int):
+	data=np.arange(4096,dtype=np.int32)
+	mask=data%mask_every==0
+	c=RegionCandidates.from_mask(mask,data)
+	assert c.count==int(mask.sum())
+	assert (c.indices()==np.flatnonzero(mask)).all()
+	assert (c.values==data[mask]).all()
+
+def test_storage_round_trip():
+	for c in (region(1024,[3,500]),region(64,list(range(40)))):
+		storage,dense=c.storage()
+		back=RegionCandidates.from_storage(c.length,c.values,storage.copy(),dense)
+		assert list(back.indices())==list(c.indices())
+
+def test_refine_turns_sparse():
+	c=region(64,list(range(64)))
+	assert c.storage()[1]
+	keep=np.zeros(64,np.bool_)
+	keep[[5,60]]=True
+	refined=c.refine(keep,np.arange(64,dtype=np.int32))
+	assert refined.storage()[1] is False
+	assert list(refined.indices())==[5,60] and list(refined.values)==[5,60]
+
+@pytest.mark.parametrize("dense_parts",[(True,True),(True,False),(False,False)])
+def test_merge(dense_parts:tuple[bool,bool]):
+	# Chunks of 64 elements, dense ones hold every other index.
+	parts=[region(64,list(range(0,64,2)) if dense else [1]) for dense in dense_parts]
+	merged=RegionCandidates.merge(parts)
+	expected=[i+64*k for k,p in enumerate(parts) for i in p.indices()]
+	assert merged.length==128 and merged.count==len(expected)
+	assert list(merged.indices())==expected
+	assert list(merged.values)==[v for p in parts for v in p.values]
+
+def test_candidates():
+	lanes=[Candidates(),Candidates()]
+	lanes[0].add(0x1000,region(1024,[1,2]))
+	lanes[0].add(0x2000,region(1024,[]))
+	lanes[1].add(0x1000,region(1024,[7]))
+	assert list(lanes[0])==[0x1000] and 0x2000 not in lanes[0]
+	assert lanes[0].count()==2 and len(lanes[1])==1
+	assert bytes_per_candidate(lanes)==8.0
+	assert bytes_per_candidate([Candidates()])==0.0
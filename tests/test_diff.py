@@ -0,0 +1,58 @@
+import json
+import pathlib
+
+import numpy as np
+import pytest
+
+import diff
+from conftest import Target, run
+from interface import Interface
+
+def reference(before:bytes,after:bytes,gap:int)->tuple[int,list[list[int]]]:
+	""" Changed bytes and runs found one byte at a time. """
+	n=max(len(before),len(after))
+	changed=[i for i in range(n) if i>=len(before) or i>=len(after) or before[i]!=after[i]]
+	runs:list[list[int]]=[]
+	for i in changed:
+		if runs and i-(runs[-1][0]+runs[-1][1])<=gap:
+			runs[-1][1]=i+1-runs[-1][0]
+		else:
+			runs.append([i,1])
+	return len(changed),runs
+
+@pytest.mark.parametrize("density",[0.001,0.3])
+@pytest.mark.parametrize("gap",[0,5])
+@pytest.mark.parametrize("sizes",[(1003,1003),(1000,1021),(1021,997)])
+def test_changed_ranges(monkeypatch:pytest.MonkeyPatch,density:float,gap:int,sizes:tuple[int,int]):
+	# Small chunks, so that runs cross chunk boundaries.
+	monkeypatch.setattr(diff,"CHUNK_SIZE",64)
+	rng=np.random.default_rng(int(density*1000)+gap)
+	before=rng.integers(0,256,sizes[0],np.uint8)
+	after=np.resize(before,sizes[1])
+	after[len(before):]=rng.integers(0,256,max(0,sizes[1]-len(before)),np.uint8)
+	flips=rng.random(len(after))<density
+	after[flips]^=np.uint8(0xFF)
+	changed,ranges=diff.changed_ranges(before.tobytes(),after.tobytes(),gap)
+	assert (changed,ranges.tolist())==reference(before.tobytes(),after.tobytes(),gap)
+
+def test_unchanged():
+	changed,ranges=diff.changed_ranges(b"abcdefgh"*4,b"abcdefgh"*4)
+	assert changed==0 and ranges.shape==(0,2)
+
+def test_compare():
+	before={0x1000:b"aaaa",0x2000:b"bbbb",0x3000:b"cc"}
+	after={0x1000:b"aaaa",0x2000:b"bxxb",0x4000:b"ddd"}
+	result=list(diff.compare(before,after,workers=2))
+	assert [(r.base,r.status,r.changed,r.ranges.tolist()) for r in result]==[
+		(0x2000,"changed",2,[[1,2]]),(0x3000,"removed",2,[[0,2]]),(0x4000,"added",3,[[0,3]])]
+	assert json.loads(result[0].to_json())=={"base":0x2000,"size":4,"status":"changed","changed":2,"ranges":[[1,2]]}
+
+def test_diff_keeps_start_snapshot(target:Target,interface:Interface,tmp_path:pathlib.Path):
+	run(interface,"start int")
+	run(interface,"diff mark")
+	target.write(70*4,1000)
+	run(interface,f"diff > {tmp_path/'changes.json'}")
+	(line,)=(tmp_path/"changes.json").read_text().splitlines()
+	assert json.loads(line)=={"base":target.address,"size":Target.SIZE,"status":"changed","changed":2,"ranges":[[70*4,2]]}
+	run(interface,"gt")
+	assert [m.address for m in interface.scanner.get_matches()]==[target.address+70*4]
@@ -0,0 +1,46 @@
+import numpy as np
+import pytest
+
+import system
+from conftest import Target
+from scanner import Scanner
+
+def test_dirty_pages(target:Target,monkeypatch:pytest.MonkeyPatch):
+	cleared=[]
+	monkeypatch.setattr(system.memory,"clear_soft_dirty",lambda handle:cleared.append(handle) or True)
+	monkeypatch.setattr(system.memory,"soft_dirty_pages",lambda handle,blocks:{a:np.ones(size//4096,np.bool_) for a,size in blocks})
+	dirty=system.DirtyPages(target.handle)
+	blocks=[(target.address,2*4096)]
+	# Nothing is known until writes are tracked.
+	assert dirty.changes(blocks) is None
+	changes=dirty.changes(blocks)
+	assert changes is not None and list(changes[target.address])==[True,True]
+	assert cleared==[target.handle]*2
+
+def test_dirty_pages_unavailable(target:Target,monkeypatch:pytest.MonkeyPatch):
+	monkeypatch.setattr(system.memory,"clear_soft_dirty",lambda handle:False)
+	dirty=system.DirtyPages(target.handle)
+	assert dirty.changes([(target.address,4096)]) is None
+	assert dirty.changes([(target.address,4096)]) is None
+
+def test_dirty_region_without_written_pages():
+	s=Scanner(workers=1)
+	mem={4096:np.ones(2048,np.int32).tobytes(),65536:np.ones(1024,np.int32).tobytes()}
+	s.start(mem,Scanner.Int32)
+	s.continue_search_equal(mem,1)
+	# Only the page of the second region was written, and only it is read.
+	s.dirty={4096:np.array([False,False]),65536:np.array([True])}
+	s.continue_search_unchanged({65536:mem[65536]})
+	assert s.get_matches_count()==3072
+
+def test_dirty_kept_for_changed_pages_read():
+	s=Scanner(workers=1)
+	values=np.zeros(2048,np.int32)
+	values[[1,2,1500]]=1
+	mem={4096:values.tobytes()}
+	s.start(mem,Scanner.Int32)
+	s.continue_search_equal(mem,1)
+	# Most candidates are in the written page, the only one read.
+	s.dirty={4096:np.array([True,False])}
+	s.continue_search_unchanged({4096:mem[4096][:4096]})
+	assert [int(a) for a in s.get_candidate_addresses()]==[4100,4104,4096+1500*4]
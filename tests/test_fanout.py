@@ -0,0 +1,24 @@
+import numpy as np
+
+import fanout
+from conftest import Target
+
+def test_search_targets(target:Target):
+	other=Target()
+	try:
+		with fanout.FanOut([target.pid,other.pid,0x3FFFFFFF]) as f:
+			assert sorted(f.targets)==sorted([target.pid,other.pid])
+			assert list(f.failed)==[0x3FFFFFFF]
+			f.start("int32")
+			target.write(4*7,123456789)
+			other.write(4*9,123456789)
+			results=f.refine("eq",123456789)
+			assert all(not isinstance(r,BaseException) for r in results.values())
+			addresses=f.addresses()
+			assert target.address+4*7 in addresses[target.pid]
+			assert other.address+4*9 in addresses[other.pid]
+			common=f.common_addresses()
+			assert np.isin(common,addresses[target.pid]).all() and np.isin(common,addresses[other.pid]).all()
+			assert isinstance(f.refine("eq",1,2)[target.pid],ValueError)
+	finally:
+		other.close()
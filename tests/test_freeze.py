@@ -0,0 +1,58 @@
+import time
+
+import numpy as np
+import pytest
+
+import freeze
+import system
+from conftest import Target, run
+from interface import Interface
+from scanner import Scanner
+
+def read(target:Target)->np.ndarray:
+	return np.frombuffer(system.process_scan_memory(target.handle,None,target.region_map())[target.address],np.int32)
+
+def entry(address:int,value:int,stype:type[Scanner.Type]=Scanner.Int32)->freeze.Entry:
+	return freeze.Entry(address,stype,np.array(value,stype.numpy_type).tobytes())
+
+def test_group():
+	entries=[entry(0,1),entry(4,2),entry(8,3,Scanner.Int16),entry(16,4)]
+	assert freeze.FreezeList.group(entries)==[(0,entry(0,1).data+entry(4,2).data+entry(8,3,Scanner.Int16).data),(16,entry(16,4).data)]
+
+def test_add_checks_range():
+	frozen=freeze.FreezeList(lambda addresses,size:{},lambda address,data:True)
+	with pytest.raises(OverflowError):
+		frozen.add(0,Scanner.Int8,300)
+	assert frozen.add(0,Scanner.Float32,0.1).value==np.float32(0.1)
+	assert len(frozen)==1 and 0 in frozen
+
+def test_poll_writes_stale(target:Target,interface:Interface):
+	frozen=interface.frozen
+	frozen.add(target.address+4*10,Scanner.Int32,10)
+	frozen.add(target.address+4*11,Scanner.Int32,-1)
+	frozen.add(target.address+4*12,Scanner.Int32,-2)
+	# Entry 10 holds its value, 11 and 12 follow each other: one write.
+	assert frozen.poll()==1
+	assert frozen.skipped==1
+	assert frozen.poll()==0
+	assert frozen.skipped==4
+	target.write(4*12,7)
+	assert frozen.poll()==1
+	assert list(read(target)[10:13])==[10,-1,-2]
+
+def test_freeze_command(target:Target,interface:Interface,capsys:pytest.CaptureFixture):
+	run(interface,"freeze rate 200")
+	run(interface,f"freeze {target.address+4*30}")
+	assert interface.frozen.is_running()
+	assert [e.value for e in interface.frozen.entries()]==[30]
+	target.write(4*30,-5)
+	deadline=time.monotonic()+5
+	while interface.frozen.writes==0 and time.monotonic()<deadline:
+		time.sleep(0.01)
+	assert read(target)[30]==30
+	run(interface,"freeze stop")
+	assert not interface.frozen.is_running()
+	run(interface,"freeze")
+	assert f"[{target.address+4*30}] Int32=30" in capsys.readouterr().out
+	run(interface,"unfreeze all")
+	assert len(interface.frozen)==0
@@ -0,0 +1,48 @@
+from typing import Callable
+
+import numpy as np
+import pytest
+
+from conftest import Target, run
+from interface import Interface
+
+def test_search_and_poke(target:Target,interface:Interface):
+	run(interface,"start int")
+	run(interface,"= 321")
+	assert interface.scanner.get_matches_count()==len(range(321,Target.SIZE//4,1000))
+	run(interface,"poke a 5")
+	run(interface,"gt")
+	assert interface.scanner.get_matches_count()==0
+	run(interface,"undo")
+	run(interface,"poke b 400")
+	run(interface,"gt")
+	assert [m.address for m in interface.scanner.get_matches()]==[target.address+1321*4]
+
+@pytest.mark.parametrize("line,expected",[
+	("eq 7",lambda i:i%1000==7),
+	("range 998 999 extra",lambda i:i%1000>=998),
+	("incby 0",lambda i:True),
+	("!=",lambda i:False),
+	("approx 5.0004",lambda i:i==5),
+	("~ 1005.2 0.5",lambda i:i==1005),
+	])
+def test_criteria(target:Target,interface:Interface,line:str,expected:Callable[[int],bool]):
+	floats="." in line
+	run(interface,"start float" if floats else "start int32")
+	if floats:
+		for i in (5,1005,2005):
+			target.write(i*4,int(np.float32(i).view(np.int32)))
+	run(interface,line)
+	found={int(m-target.address)//4 for m in interface.scanner.get_candidate_addresses()}
+	assert found=={i for i in range(Target.SIZE//4) if expected(i)}
+
+def test_poke_address_after_start_all(target:Target,interface:Interface):
+	run(interface,"start all")
+	run(interface,f"poke {target.address+4*20} 70000")
+	run(interface,f"poke {hex(target.address+4*21)} -2")
+	run(interface,"start int32")
+	run(interface,"eq 70000")
+	assert list(interface.scanner.get_candidate_addresses())==[target.address+4*20]
+	run(interface,"start int32")
+	run(interface,"eq -2")
+	assert list(interface.scanner.get_candidate_addresses())==[target.address+4*21]
@@ -0,0 +1,52 @@
+import io
+import json
+
+import pytest
+
+from conftest import Target, run
+from interface import Interface
+from metrics import METRICS, Metrics
+from scanner import Scanner
+
+@pytest.fixture(autouse=True)
+def reset_metrics():
+	METRICS.reset()
+	yield
+	METRICS.reset()
+
+def test_counters_and_histograms():
+	m=Metrics()
+	m.count("reads",kind="full")
+	m.count("reads",2,kind="full")
+	m.observe("seconds",0.5,(0.1,1.0))
+	m.observe("seconds",5.0,(0.1,1.0))
+	d=m.to_dict()
+	assert d["counters"]["reads"]=={'{kind="full"}':3}
+	assert d["histograms"]["seconds"][""]=={"buckets":{"0.1":0,"1.0":1,"+Inf":1},"sum":5.5,"count":2}
+	text=m.prometheus()
+	assert 'memoryscanner_reads_total{kind="full"} 3' in text
+	assert 'memoryscanner_seconds_bucket{le="1.0"} 1' in text
+	assert 'memoryscanner_seconds_bucket{le="+Inf"} 2' in text
+	f=io.StringIO()
+	m.write_json(f)
+	assert json.loads(f.getvalue())["counters"]["reads"]=={'{kind="full"}':3}
+
+def test_search_logged(interface:Interface):
+	log=io.StringIO()
+	METRICS.log=log
+	try:
+		run(interface,"start")
+		run(interface,"eq 7")
+	finally:
+		METRICS.log=None
+	assert any(json.loads(line)["event"]=="search" for line in log.getvalue().splitlines())
+	assert METRICS.to_dict()["histograms"]["read_seconds"]
+
+def test_polling_kept_apart(target:Target,interface:Interface):
+	interface.watches.add(target.address,Scanner.Int32)
+	interface.frozen.add(target.address+4,Scanner.Int32,1)
+	interface.watches.poll()
+	interface.frozen.poll()
+	reads=METRICS.to_dict()["histograms"]["read_seconds"]
+	assert set(reads)=={'{kind="watch"}','{kind="freeze"}'}
+	assert set(METRICS.to_dict()["counters"]["blocks_read"])=={'{kind="watch"}','{kind="freeze"}'}
@@ -0,0 +1,47 @@
+import numpy as np
+import pytest
+
+import pages
+
+P=pages.PAGE_SIZE
+
+@pytest.mark.parametrize("addresses,size,gap,expected",[
+	([],4,P,[]),
+	([0x10008],4,P,[(0x10000,P)]),
+	# A value across a page boundary takes both pages.
+	([0x10FFE],4,P,[(0x10000,2*P)]),
+	# A one-page hole is read rather than making a second call.
+	([0x10000,0x12000],4,P,[(0x10000,3*P)]),
+	([0x10000,0x13000],4,P,[(0x10000,P),(0x13000,P)]),
+	([0x10000,0x12000],4,0,[(0x10000,P),(0x12000,P)]),
+	# Many values on the same pages.
+	(list(range(0x20000,0x22000,4)),4,P,[(0x20000,2*P)]),
+	# A large value reaching past later ones.
+	([0x30000,0x30010],3*P,0,[(0x30000,4*P)]),
+	])
+def test_coalesce(addresses:list[int],size:int,gap:int,expected:list[tuple[int,int]]):
+	assert pages.coalesce(np.array(addresses,np.uint64),size,gap)==expected
+
+def test_coalesce_covers_values():
+	rng=np.random.default_rng(1)
+	addresses=np.unique(rng.integers(0,1<<30,1000,np.uint64)//np.uint64(8)*np.uint64(8))
+	ranges=pages.coalesce(addresses,8)
+	starts=np.array([a for a,_ in ranges],np.uint64)
+	i=np.searchsorted(starts,addresses,"right")-1
+	ends=np.array([a+n for a,n in ranges],np.uint64)
+	assert (addresses+np.uint64(8)<=ends[i]).all()
+	assert all(a%P==0 and n%P==0 for a,n in ranges)
+	assert all(ranges[k][0]+ranges[k][1]<ranges[k+1][0] for k in range(len(ranges)-1))
+
+def test_checksums():
+	data=bytearray(2*P+100)
+	before=pages.checksums(bytes(data))
+	assert len(before)==3
+	data[P+8]=1
+	after=pages.checksums(bytes(data))
+	assert list(before!=after)==[False,True,False]
+
+def test_runs_and_split():
+	assert pages.runs(np.array([3,4,5,9,11,12]))==[(3,3),(9,1),(11,2)]
+	assert pages.runs(np.array([],np.int64))==[]
+	assert pages.split([(0,10),(100,4)],4)==[(0,4),(4,4),(8,2),(100,4)]
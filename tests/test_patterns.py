@@ -0,0 +1,64 @@
+import re
+
+import numpy as np
+import pytest
+
+import patterns
+from conftest import Target, run
+from interface import Interface
+from patterns import Pattern
+
+def test_from_signature():
+	p=Pattern.from_signature("48 8b ?? ? 05")
+	assert p.data==bytes([0x48,0x8B,0,0,5]) and p.mask==bytes([1,1,0,0,1])
+	assert p.name=="48 8B ?? ?? 05"
+	assert Pattern.from_signature("488B").data==bytes([0x48,0x8B])
+	for bad in ("","?? ??","123","4G","48 8B0"):
+		with pytest.raises(ValueError):
+			Pattern.from_signature(bad)
+
+def test_from_string():
+	assert Pattern.from_string("ab").data==b"ab"
+	assert Pattern.from_string("ab","utf-16").data==b"a\0b\0"
+
+def test_anchor_skips_common_bytes():
+	p=Pattern(b"\0\xff\x41\0")
+	assert p.anchor==2 and p.checks==[(0,0),(1,0xFF),(3,0)]
+
+def test_find():
+	raw=b"xxABCxABDxAB"
+	found=patterns.find(raw,[Pattern(b"ABC"),Pattern.from_signature("41 42 ??")])
+	assert sorted((o,p.name) for o,p in found)==[(2,"41 42 43"),(2,"41 42 ??"),(6,"41 42 ??")]
+	# Matches that end before start were found already.
+	assert [o for o,_ in patterns.find(raw,[Pattern(b"AB")],start=7)]==[6,10]
+
+def test_search_across_blocks():
+	mem={0x1000:b"....AB",0x1006:b"CD..",0x2000:b"ABCD"}
+	found=patterns.search(mem,[Pattern(b"ABCD")])
+	assert [m.address for m in found]==[0x1004,0x2000]
+	# Blocks that don't follow each other don't join.
+	assert patterns.search({0x1000:b"AB",0x1003:b"CD"},[Pattern(b"ABCD")])==[]
+	assert [m.address for m in patterns.search(iter(sorted(mem.items())),[Pattern(b"ABCD")])]==[0x1004,0x2000]
+	assert patterns.search(mem,[])==[]
+
+@pytest.mark.parametrize("command",["aob 41 42","text abc"])
+def test_find_patterns_keeps_start_snapshot(target:Target,interface:Interface,command:str):
+	run(interface,"start int")
+	run(interface,command)
+	target.write(50*4,1000)
+	run(interface,"gt")
+	assert [m.address for m in interface.scanner.get_matches()]==[target.address+50*4]
+
+@pytest.mark.parametrize("signature",["00000001","0100","00 00 00 01","0a 00 ?? 00"])
+def test_aob_leading_zeros(interface:Interface,capsys:pytest.CaptureFixture,signature:str):
+	data=(np.arange(Target.SIZE//4,dtype=np.int32)%1000).tobytes()
+	pattern=patterns.Pattern.from_signature(signature)
+	regex=b"".join(re.escape(bytes([d])) if m else b"." for d,m in zip(pattern.data,pattern.mask))
+	expected=len(re.findall(b"(?="+regex+b")",data,re.S))
+	run(interface,f"aob {signature}")
+	assert f"{expected} matches in" in capsys.readouterr().out
+
+def test_text_digits(target:Target,interface:Interface,capsys:pytest.CaptureFixture):
+	target.write(400*4,int.from_bytes(b"007\0","little"))
+	run(interface,"text 007")
+	assert "1 matches in" in capsys.readouterr().out
@@ -0,0 +1,48 @@
+import pytest
+
+import pointers
+import system
+from conftest import Target, run
+from interface import Interface
+from system.regions import Module
+
+def memory(words:dict[int,int])->dict[int,bytes]:
+	""" Pages holding 8-byte words by address, zero elsewhere. """
+	mem:dict[int,bytearray]={}
+	for address,value in words.items():
+		page=mem.setdefault(address&~0xFFF,bytearray(0x1000))
+		page[address&0xFFF:(address&0xFFF)+8]=value.to_bytes(8,"little")
+	return {k:bytes(v) for k,v in mem.items()}
+
+def test_scan_and_resolve():
+	mem=memory({0x10010:0x20000,0x20018:0x30000,0x30000:0})
+	modules=[Module("game",0x10000,0x1000)]
+	index=pointers.PointerIndex.build(mem)
+	assert len(index)==2
+	paths=pointers.scan(index,0x30040,modules,depth=3,max_offset=0x100)
+	assert paths==[pointers.PointerPath("game",0x10,(0x18,0x40))]
+	assert str(paths[0])=='"game"+0x10 -> 0x18 -> 0x40'
+	def read_pointer(address:int)->int|None:
+		page=mem.get(address&~0xFFF)
+		return int.from_bytes(page[address&0xFFF:(address&0xFFF)+8],"little") if page else None
+	assert pointers.resolve(paths[0],modules,read_pointer)==0x30040
+	# The same layout loaded elsewhere, as after a restart.
+	moved=[Module("game",0x50000,0x1000)]
+	assert pointers.resolve(paths[0],moved,read_pointer) is None
+	assert pointers.resolve(paths[0],[],read_pointer) is None
+	assert pointers.scan(index,0x30040,modules,depth=3,max_offset=0x10)==[]
+
+def test_pointers_keep_start_snapshot(target:Target,interface:Interface):
+	run(interface,"start int")
+	run(interface,f"pointers {target.address} 1 8")
+	target.write(80*4,1000)
+	run(interface,"gt")
+	assert [m.address for m in interface.scanner.get_matches()]==[target.address+80*4]
+
+def test_resolve_command(target:Target,interface:Interface,capsys:pytest.CaptureFixture):
+	run(interface,"pointers resolve")
+	assert "No paths" in capsys.readouterr().out
+	module=system.process_modules(target.handle)[0]
+	interface.pointer_paths=[pointers.PointerPath(module.name,0x10,()),pointers.PointerPath("nothing loaded",0,(8,))]
+	run(interface,"ptr resolve")
+	assert capsys.readouterr().out.splitlines()==[f'"{module.name}"+0x10 = {module.base+0x10:x}','"nothing loaded"+0x0 -> 0x8 can\'t be followed']
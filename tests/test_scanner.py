@@ -0,0 +1,96 @@
+import numpy as np
+import pytest
+
+import system
+from conftest import Target
+from scanner import Scanner
+
+def read(target:Target,s:Scanner)->dict:
+	""" Read memory like the console does: pages of candidates only when few are left. """
+	if s.can_read_sparse():
+		return system.process_read_addresses(target.handle,s.get_candidate_addresses(),s.get_value_size())
+	return system.process_scan_memory(target.handle,system.Arena(),target.region_map())
+
+@pytest.fixture
+def started(target:Target)->Scanner:
+	s=Scanner(workers=2)
+	s.start(read(target,s),Scanner.Int32)
+	return s
+
+def addresses(s:Scanner)->list[int]:
+	return [int(a) for a in s.get_candidate_addresses()]
+
+def test_gather():
+	mem={1000:np.arange(10,dtype=np.int32).tobytes(),5000:np.arange(100,110,dtype=np.int32).tobytes()}
+	starts=np.array(sorted(mem),np.uint64)
+	values,found=Scanner.gather(mem,starts,np.array([0,1004,1036,1040,5008],np.uint64),Scanner.Int32)
+	assert found.tolist()==[False,True,True,False,True]
+	assert values[found].tolist()==[1,9,102]
+
+def test_eq(target:Target,started:Scanner):
+	started.continue_search_equal(read(target,started),999)
+	assert addresses(started)==[target.address+4*i for i in range(999,Target.SIZE//4,1000)]
+
+def test_refine_sparse(target:Target,started:Scanner):
+	started.continue_search_equal(read(target,started),7)
+	assert started.can_read_sparse()
+	target.write(7*4,8)
+	target.write(4007*4,6)
+	started.continue_search_greater(read(target,started))
+	assert addresses(started)==[target.address+7*4]
+	target.write(7*4,20)
+	started.continue_search_increased_by(read(target,started),12)
+	assert started.get_matches()[0].value==20
+
+def test_refine_whole(target:Target,started:Scanner,monkeypatch:pytest.MonkeyPatch):
+	monkeypatch.setattr(Scanner,"SPARSE_READ_LIMIT",0)
+	started.continue_search_range(read(target,started),10,11)
+	target.write(10*4,-1)
+	target.write(1011*4,500)
+	started.continue_search_changed(read(target,started))
+	assert addresses(started)==[target.address+10*4,target.address+1011*4]
+	target.write(10*4,-2)
+	started.continue_search_unchanged(read(target,started))
+	assert addresses(started)==[target.address+1011*4]
+
+def test_first_search_changed(target:Target,started:Scanner):
+	target.write(123*4,1)
+	target.write(60000*4,1)
+	started.continue_search_changed(read(target,started))
+	assert addresses(started)==[target.address+123*4,target.address+60000*4]
+
+def test_unknown_skips_unchanged_pages(target:Target):
+	s=Scanner(workers=2)
+	s.start(read(target,s),Scanner.Int32,unknown=True)
+	target.write(5000*4,100000)
+	s.continue_search_greater(read(target,s))
+	assert addresses(s)==[target.address+5000*4]
+
+def test_undo(target:Target,started:Scanner):
+	started.continue_search_equal(read(target,started),5)
+	started.continue_search_equal(read(target,started),6)
+	assert started.get_matches_count()==0
+	assert started.undo()
+	assert started.get_matches_count()==len(range(5,Target.SIZE//4,1000))
+	assert not started.undo()
+
+def test_unaligned(target:Target):
+	s=Scanner(workers=2)
+	s.start(read(target,s),Scanner.Int32,unaligned=True)
+	target.write(4*4,0x12345678)
+	target.write(5*4,0x7F)
+	s.continue_search_equal(read(target,s),0x7F123456)
+	assert addresses(s)==[target.address+4*4+1]
+
+def test_gather_no_addresses():
+	values,found=Scanner.gather({0:bytes(16)},np.array([0],np.uint64),np.empty(0,np.uint64),Scanner.Int32)
+	assert len(values)==len(found)==0
+
+def test_search_result():
+	s=Scanner(workers=1)
+	started=s.start({0:bytes(8),64:bytes(8)},Scanner.Int32)
+	assert started.nbytes==16
+	searched=s.continue_search_equal({0:bytes(8),64:bytes(12)},0)
+	assert (searched.count,searched.resized)==(2,(64,))
+	assert searched.candidate_bytes==s.get_candidates_nbytes()
+	assert searched.bytes_per_candidate==searched.candidate_bytes/2
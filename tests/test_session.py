@@ -0,0 +1,73 @@
+import json
+import pathlib
+import zipfile
+
+import numpy as np
+import pytest
+
+import session
+from conftest import Target, run
+from interface import Interface
+from scanner import Scanner
+from system.regions import PRIVATE, Region
+
+def candidates(scanner:Scanner)->list[tuple[int,int,int]]:
+	""" Address, lane and value of every candidate. """
+	result=[]
+	for i,lane in enumerate(scanner.lanes):
+		for base,region in lane.candidates.items():
+			result+=[(base+int(k)*lane.type.size,i,int(v)) for k,v in zip(region.indices(),region.values)]
+	return sorted(result)
+
+def test_round_trip(target:Target,interface:Interface,tmp_path:pathlib.Path):
+	path=str(tmp_path/"session.npz")
+	run(interface,"start int16")
+	# Dense, then sparse candidates.
+	run(interface,"range 0 500")
+	run(interface,"eq 7")
+	steps=[(s.description,s.count) for s in interface.scanner.steps]
+	before=candidates(interface.scanner)
+	regions=[Region(target.address,Target.SIZE,PRIVATE,True,"")]
+	session.save(path,interface.scanner,regions)
+	resumed=Scanner(1)
+	assert session.load(path,resumed)==regions
+	assert resumed.type is Scanner.Int16
+	assert [(s.description,s.count) for s in resumed.steps]==steps
+	assert candidates(resumed)==before
+	assert resumed.undo()
+	assert resumed.get_matches_count()==steps[0][1]
+
+def test_bad_files(tmp_path:pathlib.Path):
+	path=tmp_path/"session.npz"
+	path.write_bytes(b"not a session")
+	with pytest.raises(ValueError):
+		session.load(str(path),Scanner(1))
+	with zipfile.ZipFile(path,"w") as f:
+		f.writestr("other.npy",b"")
+	with pytest.raises(ValueError):
+		session.load(str(path),Scanner(1))
+	np.savez(path,meta=np.frombuffer(json.dumps({"version":session.VERSION+1}).encode(),np.uint8))
+	with pytest.raises(ValueError,match="unsupported version"):
+		session.load(str(path),Scanner(1))
+
+def test_session_command(target:Target,interface:Interface,tmp_path:pathlib.Path,capsys:pytest.CaptureFixture):
+	path=tmp_path/"session.npz"
+	run(interface,f"session save {path}")
+	assert "Nothing to save" in capsys.readouterr().out
+	run(interface,"start all")
+	run(interface,"eq 321")
+	before=candidates(interface.scanner)
+	run(interface,f"session save {path}")
+	run(interface,"start int")
+	run(interface,f"session load {path}")
+	assert "Resumed All search" in capsys.readouterr().out
+	assert candidates(interface.scanner)==before
+	target.write(321*4,322)
+	run(interface,"incby 1")
+	assert list(interface.scanner.get_candidate_addresses())==[target.address+321*4]
+
+def test_session_save_error(interface:Interface,capsys:pytest.CaptureFixture):
+	run(interface,"start int")
+	run(interface,"= 5")
+	run(interface,"session save /nonexistent/session.npz")
+	assert "Can't save session" in capsys.readouterr().out
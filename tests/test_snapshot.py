@@ -0,0 +1,69 @@
+import pathlib
+
+import numpy as np
+import pytest
+
+import snapshot
+from conftest import Target, run
+from interface import Interface
+
+REGIONS={0x10000:bytes(8192),0x30000:np.random.default_rng(0).bytes(4096),0x50000:b"abc"}
+
+@pytest.mark.parametrize("compress",[False,True])
+def test_round_trip(tmp_path:pathlib.Path,compress:bool):
+	snap=snapshot.save(str(tmp_path/"snap"),REGIONS.items(),compress)
+	assert list(snap)==list(REGIONS)
+	assert {k:bytes(v) for k,v in snap.items()}==REGIONS
+	assert snap.nbytes()==sum(len(v) for v in REGIONS.values())
+	assert snap.region_size(0x30000)==4096
+	flags={base:entry[3] for base,entry in snap.index.items()}
+	# Random data doesn't compress and stays mapped.
+	assert flags=={0x10000:snapshot.COMPRESSED if compress else 0,0x30000:0,0x50000:0}
+	snap.close()
+
+def test_bad_files(tmp_path:pathlib.Path):
+	path=tmp_path/"snap"
+	path.write_bytes(b"not a snapshot")
+	with pytest.raises(ValueError):
+		snapshot.Snapshot(str(path))
+	snapshot.save(str(path),REGIONS.items()).close()
+	path.write_bytes(path.read_bytes()[:-4])
+	with pytest.raises(ValueError):
+		snapshot.Snapshot(str(path))
+
+def test_empty(tmp_path:pathlib.Path):
+	snap=snapshot.save(str(tmp_path/"snap"),[])
+	assert len(snap)==0 and snap.nbytes()==0
+
+def test_spill_compressed(target:Target,interface:Interface,tmp_path:pathlib.Path):
+	path=tmp_path/"spill"
+	run(interface,f"spill {path} compress")
+	run(interface,"start int32")
+	assert interface.scanner.snapshot is not None
+	assert all(flags&snapshot.COMPRESSED for _,_,_,flags in interface.scanner.snapshot.index.values())
+	target.write(4*12,5000)
+	run(interface,"gt")
+	assert list(interface.scanner.get_candidate_addresses())==[target.address+4*12]
+	run(interface,"spill off")
+	assert interface.spill_path is None and not interface.spill_compress
+
+def test_save_errors(target:Target,interface:Interface,tmp_path:pathlib.Path):
+	run(interface,"spill /nonexistent/spill.bin")
+	run(interface,"start int")
+	assert not interface.scanner.is_started()
+	run(interface,f"spill {tmp_path/'spill.bin'}")
+	run(interface,"start int")
+	run(interface,"save /nonexistent/start.bin")
+	run(interface,f"save {tmp_path/'spill.bin'}")
+	target.write(90*4,1000)
+	run(interface,"gt")
+	assert [m.address for m in interface.scanner.get_matches()]==[target.address+90*4]
+
+def test_save_and_load(target:Target,interface:Interface,tmp_path:pathlib.Path):
+	path=tmp_path/"start.bin"
+	run(interface,"start int")
+	run(interface,f"save {path}")
+	target.write(91*4,5000)
+	run(interface,f"load {path} int")
+	run(interface,"gt")
+	assert list(interface.scanner.get_candidate_addresses())==[target.address+91*4]
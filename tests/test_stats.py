@@ -0,0 +1,66 @@
+import numpy as np
+import pytest
+
+import stats
+from conftest import Target, run
+from interface import Interface
+from scanner import Scanner
+
+N=4096
+
+def started(stype:type[Scanner.Type]|tuple[type[Scanner.Type],...]=Scanner.Int32,data:np.ndarray|None=None)->Scanner:
+	s=Scanner(2)
+	data=data if data is not None else np.arange(N,dtype=np.int32)%1000
+	s.start({0x10000:data.tobytes()},stype)
+	return s
+
+def test_distribution():
+	d=stats.distributions(started(),0)[Scanner.Int32]
+	assert d.total==d.read==d.count==N
+	assert (d.minimum(),d.maximum())==(0,999)
+	# 0 to 95 appear 5 times, the others 4.
+	assert all(c==5 and v<96 for v,c in d.top(3))
+	assert d.estimate(Scanner.cmp_eq,7)==5
+	assert d.estimate(Scanner.cmp_range,(0,9))==50
+	assert d.estimate(Scanner.cmp_approx,(500.4,0.5))==4
+	counts,edges=d.histogram(4)
+	assert counts.sum()==N and edges[0]==0 and edges[-1]==999
+	assert d.regions==[stats.RegionRange(0x10000,N,0,999)]
+	with pytest.raises(AssertionError):
+		d.estimate(Scanner.cmp_gt,0)
+
+def test_sample():
+	d=stats.distributions(started(),1024)[Scanner.Int32]
+	assert d.total==N and d.read==1024
+	assert d.estimate(Scanner.cmp_range,(0,999))==N
+
+def test_small_types_and_lanes():
+	found=stats.distributions(started((Scanner.Int16,Scanner.UInt8)),0)
+	# Every other int16 is the zero high half of an int32.
+	assert dict(found[Scanner.Int16].top(1))=={0:N+5}
+	assert found[Scanner.UInt8].total==4*N
+	assert found[Scanner.UInt8].maximum()==255
+
+def test_floats_not_finite():
+	data=np.array([1.5,np.nan,np.inf,-2.0],np.float32)
+	d=stats.distributions(started(Scanner.Float32,data),0)[Scanner.Float32]
+	assert d.total==d.read==4 and d.count==2
+	assert (d.minimum(),d.maximum())==(-2.0,1.5)
+
+def test_after_search():
+	s=started()
+	s.search({0x10000:(np.arange(N,dtype=np.int32)%1000).tobytes()},(10,19),Scanner.cmp_range)
+	d=stats.distributions(s,0)[Scanner.Int32]
+	assert d.total==d.count==50 and (d.minimum(),d.maximum())==(10,19)
+
+def test_stats_command(interface:Interface,capsys:pytest.CaptureFixture):
+	run(interface,"stats")
+	assert "Use 'start' first." in capsys.readouterr().out
+	run(interface,"start int")
+	run(interface,"stats full")
+	out=capsys.readouterr().out
+	assert f"Int32: {Target.SIZE//4} values, {Target.SIZE//4} read, from 0 to 999." in out
+	run(interface,"stats = 7")
+	assert f"= 7 would keep about {len(range(7,Target.SIZE//4,1000))} of {Target.SIZE//4} values." in capsys.readouterr().out
+	run(interface,"stats gt")
+	assert "Only eq, approx and range" in capsys.readouterr().out
@@ -0,0 +1,68 @@
+import numpy as np
+import pytest
+
+import structs
+from conftest import Target, run
+from interface import Interface
+from scanner import Scanner
+from structs import Field, Struct
+
+# Records of 12 bytes start at multiples of 12.
+BASE=0xC000
+
+def records(n:int)->bytes:
+	""" n records of an int32 id, an int32 flag and a float32 x. """
+	data=np.zeros(n,[("id","<i4"),("flag","<i4"),("x","<f4")])
+	data["id"]=np.arange(n)
+	data["flag"]=np.arange(n)%3
+	data["x"]=np.arange(n)*0.5
+	return data.tobytes()
+
+def test_struct():
+	s=Struct([Field(0,Scanner.Int32,Scanner.cmp_eq,5),Field(8,Scanner.Float32)])
+	assert len(s)==12 and s.alignment==4
+	assert s.count(100)==23 and s.count(100,96)==0
+	assert s.checks==[s.fields[0]]
+	with pytest.raises(ValueError):
+		Struct([Field(0,Scanner.Int32)])
+
+def test_search():
+	s=Struct([Field(0,Scanner.Int32,Scanner.cmp_range,(10,20)),Field(4,Scanner.Int32,Scanner.cmp_eq,1),Field(8,Scanner.Float32)],12)
+	found=structs.search({BASE:records(100)},s,2)
+	ids=[i for i in range(10,21) if i%3==1]
+	assert list(found.addresses)==[BASE+12*i for i in ids]
+	assert [list(v) for v in found.values]==[ids,[1]*len(ids),[i*0.5 for i in ids]]
+
+def test_search_across_blocks():
+	raw=records(10)
+	s=Struct([Field(0,Scanner.Int32,Scanner.cmp_eq,4),Field(8,Scanner.Float32,Scanner.cmp_approx,(2.0,1e-3))],12)
+	# Record 4 spans the two blocks.
+	mem={BASE:raw[:52],BASE+52:raw[52:]}
+	assert list(structs.search(mem,s).addresses)==[BASE+48]
+	assert list(structs.search(iter(sorted(mem.items())),s).addresses)==[BASE+48]
+	# Blocks that don't follow each other don't join.
+	assert len(structs.search({BASE:raw[:52],BASE+0x1000:raw[52:]},s).addresses)==0
+
+def test_chunks(monkeypatch:pytest.MonkeyPatch):
+	monkeypatch.setattr(structs,"CHUNK_RECORDS",7)
+	s=Struct([Field(4,Scanner.Int32,Scanner.cmp_eq,2)],12)
+	found=structs.search({BASE:records(100)},s,4)
+	assert list(found.addresses)==[BASE+12*i for i in range(100) if i%3==2]
+
+def test_struct_command(target:Target,interface:Interface,capsys:pytest.CaptureFixture):
+	target.write(4*100,-100)
+	target.write(4*102,-102)
+	run(interface,"struct int = -100 @8 int in -200 -101")
+	out=capsys.readouterr().out
+	assert "1 matches in" in out and f"[{target.address+400}] -100, -102" in out
+	run(interface,"struct @4 int")
+	assert "Struct has no field with a value." in capsys.readouterr().out
+	run(interface,"struct int = x")
+	assert "Expected 1 number(s) after int =." in capsys.readouterr().out
+
+def test_struct_keeps_start_snapshot(target:Target,interface:Interface):
+	run(interface,"start int")
+	run(interface,"struct int = 5 int = 6")
+	target.write(60*4,1000)
+	run(interface,"gt")
+	assert [m.address for m in interface.scanner.get_matches()]==[target.address+60*4]
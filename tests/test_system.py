@@ -0,0 +1,91 @@
+import numpy as np
+import pytest
+
+import system
+from conftest import Target
+from system.linux import memory as linux_memory
+
+def test_process_listed(target:Target):
+	procs=system.get_process_list()
+	assert target.pid in system.pids_by_name(procs[target.pid].name.upper(),procs)
+
+def test_scan_memory(target:Target):
+	mem=system.process_scan_memory(target.handle,system.Arena(),target.region_map())
+	assert list(mem)==[target.address]
+	values=np.frombuffer(mem[target.address],np.int32)
+	assert len(values)==Target.SIZE//4
+	assert (values==np.arange(len(values))%1000).all()
+
+def test_write(target:Target):
+	address=target.address+400
+	assert system.memory_write(target.handle,address,np.int32(-5).tobytes())
+	mem=system.process_read_addresses(target.handle,np.array([address],np.uint64),4)
+	(base,raw),=mem.items()
+	assert base<=address<base+len(raw)
+	assert np.frombuffer(raw,np.int32,1,address-base)[0]==-5
+
+def test_read_addresses(target:Target):
+	# Pages 0, 1 and 10: the first two are read together.
+	addresses=np.array([target.address+8,target.address+4096+12,target.address+10*4096],np.uint64)
+	mem=system.process_read_addresses(target.handle,addresses,4)
+	assert sorted(mem)==[target.address,target.address+10*4096]
+	assert len(mem[target.address])==2*4096
+	assert len(mem[target.address+10*4096])==4096
+
+def test_stream_memory(target:Target):
+	chunks=list(system.process_stream_memory(target.handle,16*4096,target.region_map()))
+	assert [a for a,_ in chunks]==[target.address+i*16*4096 for i in range(4)]
+	assert b"".join(chunks[i][1] for i in range(4))==bytes(system.process_scan_memory(target.handle,None,target.region_map())[target.address])
+
+def test_short_reads(target:Target,monkeypatch:pytest.MonkeyPatch):
+	# Transfers stop after a few pages, like they do at the kernel's limit.
+	read=linux_memory.process_vm_readv
+	calls=[]
+	def short_read(pid,local,local_count,remote,remote_count,flags):
+		budget=3*4096+100
+		for k in range(remote_count):
+			local[k].iov_len=remote[k].iov_len=min(remote[k].iov_len,budget)
+			budget-=remote[k].iov_len
+		calls.append(remote_count)
+		return read(pid,local,local_count,remote,remote_count,flags)
+	monkeypatch.setattr(linux_memory,"process_vm_readv",short_read)
+	blocks=[(target.address,5*4096),(target.address+5*4096,4096),(target.address+6*4096,2*4096)]
+	mem=linux_memory.read_regions(target.handle,blocks,[bytearray(size) for _,size in blocks])
+	assert sorted(mem)==[address for address,_ in blocks]
+	values=np.frombuffer(b"".join(mem[address] for address,_ in blocks),np.int32)
+	assert (values==np.arange(len(values))%1000).all()
+	assert len(calls)>1
+
+def test_reads_capped(target:Target,monkeypatch:pytest.MonkeyPatch):
+	monkeypatch.setattr(linux_memory,"MAX_RW_COUNT",3*4096)
+	mem=system.process_scan_memory(target.handle,system.Arena(),target.region_map())
+	values=np.frombuffer(mem[target.address],np.int32)
+	assert (values==np.arange(len(values))%1000).all()
+
+def test_region_names_queried_once(target:Target,monkeypatch:pytest.MonkeyPatch):
+	calls=[]
+	regions=system.memory.regions
+	monkeypatch.setattr(system.memory,"regions",lambda handle,names:calls.append(names) or regions(handle,names))
+	region_map=system.RegionMap(target.handle)
+	region_map.regions()
+	region_map.regions()
+	region_map.regions(names=True)
+	region_map.regions()
+	region_map.filter.exclude_modules={"libc.so.6"}
+	region_map.regions()
+	assert calls==[False,True]
+
+def test_process_table(monkeypatch:pytest.MonkeyPatch):
+	starts={1:100,2:200,3:300}
+	looked_up=[]
+	monkeypatch.setattr(system.processes,"process_starts",lambda:dict(starts))
+	monkeypatch.setattr(system.processes,"process_name",lambda pid:looked_up.append(pid) or ("" if pid==2 else f"p{pid}"))
+	table=system.ProcessTable()
+	assert {pid:p.name for pid,p in table.refresh().items()}=={1:"p1",3:"p3"}
+	assert sorted(looked_up)==sorted(starts)
+	looked_up.clear()
+	# PID 1 reused by another process, PID 2 gone, PID 4 new.
+	starts.update({1:150,4:400})
+	del starts[2]
+	assert sorted(table.refresh())==[1,3,4]
+	assert sorted(looked_up)==[1,4]
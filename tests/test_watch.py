@@ -0,0 +1,64 @@
+import time
+from typing import Callable
+
+import numpy as np
+import pytest
+
+import watch
+from conftest import Target, run
+from interface import Interface
+from scanner import Scanner
+
+def wait(condition:Callable[[],bool])->None:
+	deadline=time.monotonic()+5
+	while not condition() and time.monotonic()<deadline:
+		time.sleep(0.01)
+
+def test_history_ring():
+	w=watch.Watch(0,Scanner.Int32,4)
+	assert w.value is None and len(w.history())==0
+	for v in range(6):
+		w.record(v)
+	assert list(w.history())==[2,3,4,5]
+	assert w.value==5
+
+def test_poll_changes(target:Target,interface:Interface):
+	watches=interface.watches
+	watches.add(target.address+4*3,Scanner.Int32)
+	watches.add(target.address+4*4,Scanner.Int16)
+	assert watches.poll()==[]
+	target.write(4*3,-7)
+	changes=watches.poll()
+	assert [(c.address,c.old,c.new,c.type) for c in changes]==[(target.address+4*3,3,-7,Scanner.Int32)]
+	assert watches.poll()==[]
+	assert [list(w.history()) for w in watches.watches()]==[[3,-7],[4]]
+	assert list(watches.events)==changes
+
+def test_watch_command(target:Target,interface:Interface,capsys:pytest.CaptureFixture):
+	run(interface,"watch rate 200")
+	run(interface,f"watch {target.address+4*8}")
+	assert interface.watches.is_running()
+	wait(lambda:interface.watches.polls>0)
+	target.write(4*8,88)
+	wait(lambda:len(interface.watches.events)>0)
+	run(interface,"watch")
+	assert "changed 1 times: 8, 88" in capsys.readouterr().out
+	run(interface,"unwatch all")
+	assert not interface.watches.is_running()
+
+def test_poll_error_stops(capsys:pytest.CaptureFixture):
+	def read(addresses:np.ndarray,size:int):
+		raise OSError("gone")
+	watches=watch.WatchList(read,rate=1000)
+	watches.add(0x1000,Scanner.Int32)
+	watches.start()
+	wait(lambda:not watches.is_running())
+	assert not watches.is_running()
+	assert isinstance(watches.error,OSError)
+	assert "WatchList stopped: OSError('gone')" in capsys.readouterr().err
+	watches.stop()
+	# Starting again clears the error.
+	watches.read=lambda addresses,size:{}
+	watches.start()
+	assert watches.error is None and watches.is_running()
+	watches.stop()
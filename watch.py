@@ -0,0 +1,181 @@
+"""
+Watch list: values at fixed addresses polled in the background.
+
+All watches are read at once each poll, through a function that reads the
+pages holding sorted addresses, so hundreds of them cost about one read
+call per poll.
+"""
+import collections
+import sys
+import threading
+import time
+from typing import Any, Callable, NamedTuple, TypeAlias
+
+import numpy as np
+
+from scanner import Memory, Scanner
+
+NumpyArray:TypeAlias=np.ndarray
+
+# Reads the pages holding values of a given size at sorted addresses.
+Reader:TypeAlias=Callable[[NumpyArray,int],Memory]
+
+class Change(NamedTuple):
+	time:float
+	address:int
+	old:Scanner.SupportedType
+	new:Scanner.SupportedType
+	type:type[Scanner.Type]
+
+class Watch:
+	""" Watched address and a ring buffer of the values it had. """
+	def __init__(self,address:int,stype:type[Scanner.Type],history:int)->None:
+		self.address=address
+		self.type=stype
+		self.changes=0
+		self._values=np.zeros(history,stype.numpy_type)
+		self._count=0
+	def __repr__(self)->str:
+		return f"Watch({self.address},{self.type.name})"
+	def history(self)->NumpyArray:
+		""" Values seen, oldest first, each one differing from the previous. """
+		n=len(self._values)
+		if self._count<=n:
+			return self._values[:self._count].copy()
+		head=self._count%n
+		return np.concatenate((self._values[head:],self._values[:head]))
+	@property
+	def value(self)->Scanner.SupportedType|None:
+		return self._values[(self._count-1)%len(self._values)] if self._count else None
+	def record(self,value:Scanner.SupportedType)->None:
+		self._values[self._count%len(self._values)]=value
+		self._count+=1
+
+class Poller:
+	"""
+	Calls poll rate times per second from a background thread once started.
+	Deadlines that pass while polling are counted as missed and skipped.
+	An exception raised by poll stops polling and is kept in error.
+	"""
+	def __init__(self,rate:float)->None:
+		self.rate=rate
+		self.polls=0
+		self.missed=0
+		self.max_late=0.0
+		self.error:Exception|None=None
+		self._stop=threading.Event()
+		self._thread:threading.Thread|None=None
+
+	def is_running(self)->bool:
+		return self._thread is not None
+
+	def poll(self)->Any:
+		pass
+
+	def start(self)->None:
+		""" Poll from a background thread until stop. """
+		if self._thread:
+			return
+		self.error=None
+		self._stop.clear()
+		self._thread=threading.Thread(target=self._run,daemon=True)
+		self._thread.start()
+
+	def stop(self)->None:
+		thread=self._thread
+		if not thread:
+			return
+		self._stop.set()
+		thread.join()
+		self._thread=None
+
+	def _run(self)->None:
+		next_time=time.monotonic()
+		while not self._stop.is_set():
+			try:
+				self.poll()
+			except Exception as e:
+				self.error=e
+				print(f"{type(self).__name__} stopped: {e!r}",file=sys.stderr)
+				self._thread=None
+				return
+			self.polls+=1
+			next_time+=1/self.rate
+			late=time.monotonic()-next_time
+			if late>0:
+				missed=int(late*self.rate)+1
+				self.missed+=missed
+				self.max_late=max(self.max_late,late)
+				next_time+=missed/self.rate
+			self._stop.wait(max(0.0,next_time-time.monotonic()))
+
+class WatchList(Poller):
+	"""
+	Addresses polled at rate per second once started. Changes go to
+	on_change, from the polling thread, and to a bounded event log.
+	"""
+	HISTORY=64
+	EVENTS=1024
+	def __init__(self,read:Reader,rate:float=10.0,on_change:Callable[[Change],None]|None=None)->None:
+		super().__init__(rate)
+		self.read=read
+		self.on_change=on_change
+		self.events:collections.deque[Change]=collections.deque(maxlen=WatchList.EVENTS)
+		self._watches:dict[int,Watch]={}
+		self._lock=threading.Lock()
+
+	def __contains__(self,address:int)->bool:
+		return address in self._watches
+
+	def __len__(self)->int:
+		return len(self._watches)
+
+	def add(self,address:int,stype:type[Scanner.Type])->Watch:
+		""" Watch address, or change its type if already watched. """
+		watch=Watch(address,stype,WatchList.HISTORY)
+		with self._lock:
+			self._watches[address]=watch
+		return watch
+
+	def clear(self)->None:
+		with self._lock:
+			self._watches.clear()
+
+	def poll(self)->list[Change]:
+		""" Read all watches once and record the ones that changed. """
+		with self._lock:
+			watches=sorted(self._watches.values(),key=lambda w:w.address)
+		if not watches:
+			return []
+		addresses=np.array([w.address for w in watches],np.uint64)
+		mem=self.read(addresses,max(w.type.size for w in watches))
+		starts=np.array(sorted(mem),np.uint64)
+		now=time.time()
+		changes=[]
+		for stype in {w.type for w in watches}:
+			group=[w for w in watches if w.type is stype]
+			values,found=Scanner.gather(mem,starts,np.array([w.address for w in group],np.uint64),stype)
+			for w,value,ok in zip(group,values,found):
+				if not ok:
+					continue
+				old=w.value
+				# Compare bits so that a NaN that stays NaN isn't a change.
+				if old is not None and value.tobytes()==old.tobytes():
+					continue
+				w.record(value)
+				if old is not None:
+					w.changes+=1
+					changes.append(Change(now,w.address,old,value,stype))
+		for change in changes:
+			self.events.append(change)
+			if self.on_change:
+				self.on_change(change)
+		return changes
+
+	def remove(self,address:int)->bool:
+		with self._lock:
+			return self._watches.pop(address,None) is not None
+
+	def watches(self)->list[Watch]:
+		with self._lock:
+			return sorted(self._watches.values(),key=lambda w:w.address)